@@ -20,12 +20,56 @@ DATA_DIR.mkdir(exist_ok=True)
 TELEGRAM_CONFIG = {
     'group_name': os.getenv('TELEGRAM_GROUP_NAME', 'mi_grupo'),
     'check_interval': int(os.getenv('CHECK_INTERVAL', 300)),
-    'last_check_file': os.getenv('LAST_CHECK_FILE', str(DATA_DIR / 'last_check.txt'))
+    'last_check_file': os.getenv('LAST_CHECK_FILE', str(DATA_DIR / 'last_check.txt')),
+    # Último id de mensaje procesado por diálogo (lectura incremental)
+    'cursor_file': os.getenv('MESSAGE_CURSOR_FILE', str(DATA_DIR / 'message_cursors.json')),
+    # Mensajes por página de tg_dialog y máximo de páginas por verificación
+    'page_size': int(os.getenv('MESSAGE_PAGE_SIZE', 50)),
+    'max_pages': int(os.getenv('MESSAGE_MAX_PAGES', 20)),
+    # Diálogos vigilados separados por comas: nombre[:intervalo[:prioridad]] (vacío = group_name)
+    'dialogs': os.getenv('TELEGRAM_DIALOGS', ''),
+    # Diálogos leídos a la vez como máximo y variación aleatoria (±) de cada intervalo
+    'max_concurrent_dialogs': int(os.getenv('TELEGRAM_MAX_CONCURRENT_DIALOGS', 4)),
+    'poll_jitter': float(os.getenv('TELEGRAM_POLL_JITTER', 0.2)),
+    # Consulta previa de actividad con tg_dialogs: 'unread', 'all' u 'off'
+    'change_detection': os.getenv('TELEGRAM_CHANGE_DETECTION', 'unread'),
+    # Turnos seguidos sin actividad tras los que se lee el historial igualmente
+    'force_fetch_every': int(os.getenv('TELEGRAM_FORCE_FETCH_EVERY', 12)),
+    # Métricas por diálogo escritas por el agente y servidas en /api/agent/metrics
+    'metrics_file': os.getenv('AGENT_METRICS_FILE', str(DATA_DIR / 'agent_metrics.json'))
+}
+
+# Servidor Telegram MCP supervisado (un único proceso compartido entre verificaciones)
+MCP_CONFIG = {
+    'command': os.getenv('MCP_SERVER_COMMAND', 'npx -y @chaindead/telegram-mcp'),
+    'protocol_version': os.getenv('MCP_PROTOCOL_VERSION', '2024-11-05'),
+    # Tiempo máximo para arrancar y completar el handshake initialize
+    'startup_timeout': float(os.getenv('MCP_STARTUP_TIMEOUT', 60)),
+    'request_timeout': float(os.getenv('MCP_REQUEST_TIMEOUT', 30)),
+    # Intervalo entre pings de salud; si no responde se reinicia
+    'health_interval': float(os.getenv('MCP_HEALTH_INTERVAL', 60)),
+    # Backoff entre arranques fallidos consecutivos
+    'restart_backoff_base': float(os.getenv('MCP_RESTART_BACKOFF', 1)),
+    'restart_backoff_max': float(os.getenv('MCP_RESTART_BACKOFF_MAX', 300))
 }
 
 # Configuración de Base de Datos
 DATABASE_CONFIG = {
-    'path': os.getenv('DATABASE_PATH', str(DATA_DIR / 'posts.db'))
+    'path': os.getenv('DATABASE_PATH', str(DATA_DIR / 'posts.db')),
+    # Conexiones reutilizadas (se mantienen abiertas como máximo pool_size)
+    'pool_size': int(os.getenv('DATABASE_POOL_SIZE', 8)),
+    # WAL: las lecturas no se bloquean mientras el agente escribe
+    'journal_mode': os.getenv('DATABASE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('DATABASE_SYNCHRONOUS', 'NORMAL'),
+    # Espera máxima (ms) cuando otra conexión tiene el bloqueo de escritura
+    'busy_timeout': int(os.getenv('DATABASE_BUSY_TIMEOUT', 5000)),
+    # Caché de páginas por conexión (KiB) y tamaño del mapeo en memoria (bytes)
+    'cache_size_kb': int(os.getenv('DATABASE_CACHE_SIZE_KB', 16 * 1024)),
+    'mmap_size': int(os.getenv('DATABASE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # Posts por página cuando se pagina con cursor sin indicar limit
+    'page_size': int(os.getenv('POSTS_PAGE_SIZE', 50)),
+    # No reescribir un post repetido si sus campos no cambiaron (content_hash)
+    'skip_unchanged': os.getenv('DATABASE_SKIP_UNCHANGED', 'True').lower() == 'true'
 }
 
 # Configuración del Backend Flask
@@ -46,7 +90,142 @@ IMAGE_API_CONFIG = {
 SCRAPING_CONFIG = {
     'timeout': int(os.getenv('REQUEST_TIMEOUT', 10)),
     'user_agent': os.getenv('USER_AGENT', 
-                            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
+                            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'),
+    # Descargas concurrentes: hilos totales y máximo de peticiones simultáneas por host
+    'max_workers': int(os.getenv('SCRAPING_MAX_WORKERS', 8)),
+    'per_host_limit': int(os.getenv('SCRAPING_PER_HOST_LIMIT', 2)),
+    # Descarga en streaming: parar tras </head> si ya están los metadatos necesarios
+    'head_only': os.getenv('SCRAPING_HEAD_ONLY', 'True').lower() == 'true',
+    # Límite duro de bytes descargados por página
+    'max_bytes': int(os.getenv('SCRAPING_MAX_BYTES', 2 * 1024 * 1024)),
+    'chunk_size': int(os.getenv('SCRAPING_CHUNK_SIZE', 16 * 1024)),
+    # Extractor de metadatos: 'fast' (una sola pasada) o 'soup' (BeautifulSoup completo)
+    'extractor': os.getenv('SCRAPING_EXTRACTOR', 'fast')
+}
+
+# Límites de descarga por dominio (cortesía con los sitios de noticias)
+POLITENESS_CONFIG = {
+    # Ritmo sostenido y ráfaga máxima de peticiones por dominio
+    'requests_per_second': float(os.getenv('DOMAIN_RATE_LIMIT', 1.0)),
+    'burst': int(os.getenv('DOMAIN_BURST', 3)),
+    # Descargas simultáneas en total (todos los dominios)
+    'max_concurrency': int(os.getenv('FETCH_MAX_CONCURRENCY', 16)),
+    # Espera máxima por turno; si un dominio está bloqueado más tiempo se pospone la URL
+    'max_wait': float(os.getenv('FETCH_MAX_WAIT', 30)),
+    'max_retry_after': int(os.getenv('FETCH_MAX_RETRY_AFTER', 3600)),
+    'respect_robots': os.getenv('RESPECT_ROBOTS_TXT', 'True').lower() == 'true',
+    'robots_ttl': int(os.getenv('ROBOTS_CACHE_TTL', 24 * 3600))
+}
+
+# Caché negativa de URLs que fallan (backoff exponencial)
+FAILURE_CONFIG = {
+    # Espera tras el primer fallo; se duplica con cada intento
+    'base_delay': int(os.getenv('FAILURE_BASE_DELAY', 300)),
+    'max_delay': int(os.getenv('FAILURE_MAX_DELAY', 7 * 24 * 3600)),
+    # A partir de estos intentos la URL se considera envenenada
+    'max_attempts': int(os.getenv('FAILURE_MAX_ATTEMPTS', 6)),
+    # URLs elegibles que el agente reintenta como máximo en cada verificación
+    'retry_batch': int(os.getenv('FAILURE_RETRY_BATCH', 20))
+}
+
+# Reglas de canonicalización de URLs (deduplicación antes de descargar)
+URL_CONFIG = {
+    'strip_www': os.getenv('URL_STRIP_WWW', 'True').lower() == 'true',
+    'strip_fragment': os.getenv('URL_STRIP_FRAGMENT', 'True').lower() == 'true',
+    'strip_trailing_slash': os.getenv('URL_STRIP_TRAILING_SLASH', 'True').lower() == 'true',
+    'sort_query': os.getenv('URL_SORT_QUERY', 'True').lower() == 'true',
+    # Parámetros de tracking que se eliminan (prefijos y nombres exactos, separados por comas)
+    'tracking_prefixes': [p for p in os.getenv('URL_TRACKING_PREFIXES', 'utm_').split(',') if p],
+    'tracking_params': [p for p in os.getenv(
+        'URL_TRACKING_PARAMS',
+        'fbclid,gclid,dclid,msclkid,mc_cid,mc_eid,igshid,yclid,_hsenc,_hsmi,ref_src,ref_url,si,spm'
+    ).split(',') if p]
+}
+
+# Configuración del cliente HTTP compartido (pool de conexiones y reintentos)
+HTTP_CONFIG = {
+    # Número de hosts distintos cuyo pool de conexiones se mantiene abierto
+    'pool_connections': int(os.getenv('HTTP_POOL_CONNECTIONS', 32)),
+    # Conexiones keep-alive reutilizables por host
+    'pool_maxsize': int(os.getenv('HTTP_POOL_MAXSIZE', 10)),
+    'max_retries': int(os.getenv('HTTP_MAX_RETRIES', 2)),
+    'backoff_factor': float(os.getenv('HTTP_BACKOFF_FACTOR', 0.5))
+}
+
+# Caché persistente de respuestas HTTP (peticiones condicionales ETag/Last-Modified)
+CACHE_CONFIG = {
+    'path': os.getenv('CACHE_DB_PATH', str(DATA_DIR / 'cache.db')),
+    'enabled': os.getenv('HTTP_CACHE_ENABLED', 'True').lower() == 'true',
+    # Tiempo de vida de una entrada en segundos (por defecto 7 días)
+    'ttl': int(os.getenv('HTTP_CACHE_TTL', 7 * 24 * 3600)),
+    # Número máximo de entradas; se expulsan las menos usadas recientemente
+    'max_entries': int(os.getenv('HTTP_CACHE_MAX_ENTRIES', 5000))
+}
+
+# Resolución de acortadores de URLs (t.co, bit.ly, ...) con caché persistente
+REDIRECT_CONFIG = {
+    # Tiempo de vida de una resolución en segundos (por defecto 30 días)
+    'ttl': int(os.getenv('REDIRECT_CACHE_TTL', 30 * 24 * 3600)),
+    'shorteners': [d for d in os.getenv(
+        'URL_SHORTENERS',
+        't.co,bit.ly,lnkd.in,tinyurl.com,goo.gl,ow.ly,buff.ly,dlvr.it,is.gd,t.ly,'
+        'rebrand.ly,trib.al,cutt.ly,shorturl.at,tiny.cc,bl.ink,s.id,amzn.to,fb.me,ift.tt'
+    ).split(',') if d]
+}
+
+# Generación de imágenes en segundo plano (cola persistente en data/cache.db)
+IMAGE_QUEUE_CONFIG = {
+    # Si está desactivada las imágenes se generan antes de guardar el post
+    'enabled': os.getenv('IMAGE_QUEUE_ENABLED', 'True').lower() == 'true',
+    'workers': int(os.getenv('IMAGE_QUEUE_WORKERS', 2)),
+    # Trabajos pendientes máximos; por encima se guardan los posts sin imagen
+    'max_pending': int(os.getenv('IMAGE_QUEUE_MAX_PENDING', 500)),
+    'max_attempts': int(os.getenv('IMAGE_QUEUE_MAX_ATTEMPTS', 3)),
+    # Espera antes del primer reintento; se duplica con cada intento
+    'retry_delay': int(os.getenv('IMAGE_QUEUE_RETRY_DELAY', 120)),
+    'poll_interval': float(os.getenv('IMAGE_QUEUE_POLL_INTERVAL', 5)),
+    # Días que se conservan los trabajos fallidos (0 = sin límite)
+    'failed_retention_days': float(os.getenv('IMAGE_QUEUE_FAILED_RETENTION_DAYS', 7))
+}
+
+# Proveedores de generación de imágenes (orden inicial, circuit breaker y estadísticas)
+IMAGE_PROVIDER_CONFIG = {
+    # Orden de prueba mientras no hay estadísticas: gemini, dalle, pollinations, rest
+    'order': [p for p in os.getenv('IMAGE_PROVIDER_ORDER', 'gemini,dalle,pollinations,rest').split(',') if p],
+    'timeout': int(os.getenv('IMAGE_PROVIDER_TIMEOUT', 30)),
+    # Fallos seguidos que abren el circuito y segundos hasta la petición de prueba
+    'failure_threshold': int(os.getenv('IMAGE_PROVIDER_FAILURE_THRESHOLD', 3)),
+    'reset_timeout': int(os.getenv('IMAGE_PROVIDER_RESET_TIMEOUT', 300)),
+    # Llamadas recientes usadas para calcular latencia y tasa de éxito
+    'stats_window': int(os.getenv('IMAGE_PROVIDER_STATS_WINDOW', 20)),
+    # Muestras necesarias antes de reordenar un proveedor y segundos que dura cada muestra
+    'stats_min_samples': int(os.getenv('IMAGE_PROVIDER_STATS_MIN_SAMPLES', 5)),
+    'stats_max_age': int(os.getenv('IMAGE_PROVIDER_STATS_MAX_AGE', 3600))
+}
+
+# Almacén de imágenes generadas (nombre = hash del contenido, índice en data/cache.db)
+IMAGE_STORE_CONFIG = {
+    'dir': os.getenv('GENERATED_IMAGES_DIR', str(DATA_DIR / 'generated')),
+    # Tamaño máximo del directorio; se expulsan las imágenes menos usadas (0 = sin límite)
+    'max_bytes': int(os.getenv('IMAGE_STORE_MAX_MB', 500)) * 1024 * 1024
+}
+
+# Copia local de imágenes remotas (og:image) hecha en segundo plano por la cola de imágenes
+IMAGE_MIRROR_CONFIG = {
+    'enabled': os.getenv('IMAGE_MIRROR_ENABLED', 'False').lower() == 'true',
+    # Tamaño máximo descargado por imagen y lado máximo de la copia guardada
+    'max_bytes': int(os.getenv('IMAGE_MIRROR_MAX_BYTES', 5 * 1024 * 1024)),
+    'max_dimension': int(os.getenv('IMAGE_MIRROR_MAX_DIMENSION', 1200)),
+    'quality': int(os.getenv('IMAGE_MIRROR_QUALITY', 85))
+}
+
+# Miniaturas de las imágenes para las tarjetas del dashboard (requiere Pillow)
+IMAGE_DERIVATIVE_CONFIG = {
+    'dir': os.getenv('THUMBNAILS_DIR', str(DATA_DIR / 'thumbnails')),
+    # Tamaño de la tarjeta (200px de alto) al doble de resolución para pantallas HiDPI
+    'width': int(os.getenv('THUMBNAIL_WIDTH', 640)),
+    'height': int(os.getenv('THUMBNAIL_HEIGHT', 400)),
+    'quality': int(os.getenv('THUMBNAIL_QUALITY', 75))
 }
 
 # Configuración de Tipos de Contenido
@@ -105,7 +105,7 @@ def setup_telegram_mcp():
         
         logger.info("Autenticación completada exitosamente")
         
-        # El servidor MCP se inicia por cada llamada del cliente, no necesita background
+        # El servidor MCP lo arranca y supervisa el agente (un único proceso compartido)
         logger.info("=" * 60)
         logger.info("Telegram MCP Server configurado correctamente")
         logger.info("=" * 60)
@@ -0,0 +1,126 @@
+"""
+Benchmark de los extractores de metadatos (BeautifulSoup vs una sola pasada)
+
+Uso:
+    python scripts/benchmark_extractors.py                 # páginas sintéticas
+    python scripts/benchmark_extractors.py pagina.html ... # ficheros HTML
+    python scripts/benchmark_extractors.py https://...     # URLs (descarga completa)
+
+Mide el tiempo de CPU de parseo por página de cada extractor y comprueba
+que ambos devuelven exactamente los mismos metadatos.
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.agent.content_processor import ContentProcessor
+from src.agent.extractors import SoupExtractor, FastExtractor
+
+ITERATIONS = 20
+
+
+def synthetic_pages():
+    """Páginas de prueba que cubren las distintas reglas de prioridad"""
+    filler = ''.join(
+        f'<div class="item"><a href="/n/{i}">Enlace {i}</a><span>Texto de relleno {i}</span></div>'
+        for i in range(400)
+    )
+    long_paragraph = 'Contenido del artículo con suficiente longitud para ser resumen. ' * 4
+    script = '<script>var data = {"items": [' + ','.join(str(i) for i in range(2000)) + ']};</script>'
+
+    return {
+        'og_completo': (
+            '<html><head><title>Título HTML</title>'
+            '<meta property="og:title" content="Título OG">'
+            '<meta property="og:description" content="Descripción OG">'
+            '<meta property="og:image" content="https://example.com/og.jpg">'
+            '<meta property="og:type" content="article">'
+            f'{script}</head><body>{filler}<p>{long_paragraph}</p></body></html>'
+        ),
+        'twitter_card': (
+            '<html><head><meta name="twitter:title" content="Título Twitter">'
+            '<meta name="twitter:description" content="Descripción Twitter">'
+            '<meta name="twitter:image" content="https://example.com/tw.jpg">'
+            f'</head><body>{filler}</body></html>'
+        ),
+        'sin_meta': (
+            '<html><head><title>  Título &amp; entidades  </title>'
+            f'{script}</head><body>{filler}<h1>Cabecera</h1>'
+            '<img src="/static/logo.png" width="600"><img src="/a.jpg" width="50%">'
+            '<img src="/hero.jpg" width="800" height="400">'
+            f'<p>Corto</p><p>{long_paragraph}<b>negrita</b></p>{filler}</body></html>'
+        ),
+        'html_roto': (
+            '<html><head><meta name="description" content="  Meta descripción  ">'
+            '</head><body><div><p>Párrafo sin cerrar<div>'
+            f'{long_paragraph}</div></div><h1>Sin título <i>en head</i></h1>{filler}'
+        ),
+    }
+
+
+def load_pages(args):
+    """Carga las páginas indicadas por línea de comandos"""
+    if not args:
+        return synthetic_pages()
+
+    processor = ContentProcessor()
+    processor.head_only = False
+    pages = {}
+    for arg in args:
+        if arg.startswith(('http://', 'https://')):
+            html = processor.fetch_url_content(arg)
+            if html:
+                pages[arg] = html
+        else:
+            pages[arg] = Path(arg).read_text(encoding='utf-8', errors='replace')
+    return pages
+
+
+def measure(extractor, html):
+    """Devuelve (tiempo de CPU medio en ms, resultado)"""
+    result = extractor.extract(html)
+    start = time.process_time()
+    for _ in range(ITERATIONS):
+        extractor.extract(html)
+    elapsed = time.process_time() - start
+    return elapsed / ITERATIONS * 1000, result
+
+
+def main():
+    processor = ContentProcessor()
+    soup_extractor = SoupExtractor(processor)
+    fast_extractor = FastExtractor(processor)
+    pages = load_pages(sys.argv[1:])
+
+    print('=' * 78)
+    print(f"{'Página':<30}{'KB':>8}{'soup (ms)':>12}{'fast (ms)':>12}{'x':>8}{'iguales':>8}")
+    print('-' * 78)
+
+    total_soup = total_fast = 0.0
+    mismatches = 0
+    for name, html in pages.items():
+        soup_ms, soup_result = measure(soup_extractor, html)
+        fast_ms, fast_result = measure(fast_extractor, html)
+        total_soup += soup_ms
+        total_fast += fast_ms
+        same = soup_result == fast_result
+        if not same:
+            mismatches += 1
+        speedup = soup_ms / fast_ms if fast_ms else float('inf')
+        print(f"{name[:29]:<30}{len(html) / 1024:>8.1f}{soup_ms:>12.2f}{fast_ms:>12.2f}"
+              f"{speedup:>7.1f}x{'sí' if same else 'NO':>8}")
+        if not same:
+            print(f"    soup: {soup_result}")
+            print(f"    fast: {fast_result}")
+
+    print('-' * 78)
+    count = len(pages) or 1
+    print(f"Media por página: soup {total_soup / count:.2f} ms, fast {total_fast / count:.2f} ms")
+    print(f"Páginas con resultados distintos: {mismatches}")
+    print('=' * 78)
+
+
+if __name__ == '__main__':
+    main()
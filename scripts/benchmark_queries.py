@@ -0,0 +1,168 @@
+"""
+Benchmark de las consultas de /api/posts con distintos conjuntos de índices
+
+Uso:
+    python scripts/benchmark_queries.py            # 100.000 posts sintéticos
+    python scripts/benchmark_queries.py 500000     # número de posts
+
+Crea una base de datos temporal con el esquema de Database, prueba cada
+combinación de filtros (proveedor, tipo, fechas, búsqueda y páginas
+profundas por cursor) con cada conjunto de índices candidato y muestra la
+mediana de tiempo por consulta y el plan de SQLite.
+"""
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import DATABASE_CONFIG
+
+ITERATIONS = 15
+PAGE_SIZE = 30
+DEFAULT_POSTS = 100000
+
+PROVIDERS = [f'proveedor{i}.com' for i in range(60)]
+TYPES = ['Artículo de Blog', 'Noticia', 'Video', 'Investigación', 'Tutorial', 'Documentación']
+WORDS = ('economía mercado inteligencia artificial modelo lenguaje datos seguridad red '
+         'gobierno elecciones energía clima ciencia salud tecnología móvil nube').split()
+
+# Índices de filtro candidatos (además de idx_created_at, común a todos)
+INDEX_SETS = {
+    'simples': {
+        'idx_release_date': 'posts(release_date DESC)',
+        'idx_provider': 'posts(provider)',
+        'idx_type': 'posts(type)',
+    },
+    'compuestos': {
+        'idx_release_date': 'posts(release_date DESC)',
+        'idx_provider_created': 'posts(provider, created_at DESC, id DESC)',
+        'idx_type_created': 'posts(type, created_at DESC, id DESC)',
+    },
+    'compuestos+proveedor_tipo': {
+        'idx_release_date': 'posts(release_date DESC)',
+        'idx_provider_created': 'posts(provider, created_at DESC, id DESC)',
+        'idx_type_created': 'posts(type, created_at DESC, id DESC)',
+        'idx_provider_type_created': 'posts(provider, type, created_at DESC, id DESC)',
+    },
+}
+
+SCENARIOS = {
+    'todos': {},
+    'proveedor': {'provider': PROVIDERS[3]},
+    'proveedor_raro': {'provider': PROVIDERS[-1]},
+    'tipo': {'content_type': 'Video'},
+    'proveedor+tipo': {'provider': PROVIDERS[3], 'content_type': 'Video'},
+    'tipo+fechas': {'content_type': 'Noticia', 'date_from': '2025-03-01', 'date_to': '2025-03-31'},
+    'proveedor+fechas': {'provider': PROVIDERS[3], 'date_from': '2025-03-01', 'date_to': '2025-03-31'},
+    'busqueda+proveedor': {'search': 'energía clima', 'provider': PROVIDERS[3]},
+}
+
+# Páginas recorridas con cursor en el escenario de paginación profunda
+DEEP_PAGES = 20
+
+
+def populate(db, count):
+    """Inserta `count` posts con proveedores sesgados y fechas repartidas en dos años"""
+    rng = random.Random(42)
+    start = datetime(2024, 6, 1)
+    weights = [1 / (i + 1) for i in range(len(PROVIDERS))]
+    rows = []
+    for i in range(count):
+        released = start + timedelta(seconds=i * 600 + rng.randint(0, 599))
+        created = released + timedelta(seconds=rng.randint(0, 3600))
+        rows.append((
+            ' '.join(rng.choices(WORDS, k=6)),
+            ' '.join(rng.choices(WORDS, k=30)),
+            f'https://example.com/post/{i}',
+            released.strftime('%Y-%m-%d %H:%M:%S'),
+            rng.choices(PROVIDERS, weights)[0],
+            rng.choice(TYPES),
+            created.strftime('%Y-%m-%d %H:%M:%S'),
+        ))
+    with db.get_connection() as conn, conn:
+        conn.executemany('''
+            INSERT INTO posts (title, summary, source_url, release_date, provider, type, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+
+def use_index_set(db, indexes):
+    """Deja en la tabla sólo idx_created_at y los índices del conjunto"""
+    with db.get_connection() as conn, conn:
+        existing = [row['name'] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'posts' "
+            "AND name LIKE 'idx_%' AND name != 'idx_created_at'")]
+        for name in existing:
+            conn.execute(f'DROP INDEX {name}')
+        for name, columns in indexes.items():
+            conn.execute(f'CREATE INDEX {name} ON {columns}')
+        conn.execute('ANALYZE')
+
+
+def timed(fn):
+    """Mediana en milisegundos de ITERATIONS ejecuciones"""
+    samples = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def query_plan(db, filters):
+    from src.backend.post_query import PostQuery
+    query = (PostQuery(db.fts_enabled).search(filters.get('search'))
+             .provider(filters.get('provider')).content_type(filters.get('content_type'))
+             .released_between(filters.get('date_from'), filters.get('date_to')).page(PAGE_SIZE))
+    sql, params = query.build()
+    with db.get_connection() as conn:
+        return [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def deep_pages(db, filters):
+    cursor = None
+    for _ in range(DEEP_PAGES):
+        posts = db.query_posts(limit=PAGE_SIZE, cursor=cursor, **filters)
+        cursor = db.next_cursor(posts, PAGE_SIZE)
+        if not cursor:
+            break
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_POSTS
+    with tempfile.TemporaryDirectory() as tmp:
+        DATABASE_CONFIG['path'] = Path(tmp) / 'benchmark.db'
+        from src.backend.database import Database
+        db = Database()
+
+        started = time.perf_counter()
+        populate(db, count)
+        print(f"[INFO] {count} posts insertados en {time.perf_counter() - started:.1f} s\n")
+
+        results = {}
+        for set_name, indexes in INDEX_SETS.items():
+            use_index_set(db, indexes)
+            print(f"=== Índices: {set_name} ({', '.join(indexes)})")
+            for scenario, filters in SCENARIOS.items():
+                elapsed = timed(lambda: db.query_posts(limit=PAGE_SIZE, **filters))
+                results.setdefault(scenario, {})[set_name] = elapsed
+                print(f"  {scenario:<22} {elapsed:8.2f} ms   {' | '.join(query_plan(db, filters))}")
+            for scenario in ('proveedor', 'tipo+fechas'):
+                name = f'{scenario} x{DEEP_PAGES} págs.'
+                elapsed = timed(lambda: deep_pages(db, SCENARIOS[scenario]))
+                results.setdefault(name, {})[set_name] = elapsed
+                print(f"  {name:<22} {elapsed:8.2f} ms")
+            print()
+
+        print(f"{'escenario':<24}" + ''.join(f'{name:>28}' for name in INDEX_SETS))
+        for scenario, timings in results.items():
+            print(f"{scenario:<24}" + ''.join(f'{timings[name]:>25.2f} ms' for name in INDEX_SETS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Detección barata de actividad en los diálogos antes de leer su historial
+Ruta: src/agent/change_detector.py
+"""
+import threading
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import TELEGRAM_CONFIG
+
+
+def normalize_dialog_name(name):
+    """Clave de comparación de un diálogo ('@Canal' y 'canal' son el mismo)"""
+    return str(name).strip().lstrip('@').lower() if name is not None else ''
+
+
+def read_int(entry, *keys):
+    """Primer valor entero presente en alguna de las claves del dict"""
+    for key in keys:
+        value = entry.get(key)
+        if isinstance(value, dict):
+            value = value.get('id')
+        try:
+            if value is not None:
+                return int(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class DialogChangeDetector:
+    """
+    Decide qué diálogos vencidos tienen mensajes nuevos con una sola llamada a tg_dialogs
+
+    - mode 'unread': sólo se piden los diálogos con mensajes sin leer; un
+      diálogo ausente de la lista no tiene actividad
+    - mode 'all': se piden todos los diálogos (más datos, pero detecta
+      también mensajes que la cuenta ya leyó desde otro dispositivo)
+    - mode 'off': se lee siempre el historial de todos los diálogos vencidos
+
+    Hay actividad si el último id del diálogo supera su cursor o, cuando el
+    servidor no da ese id, si su número de no leídos cambió desde la última
+    lectura. Tras `force_every` turnos omitidos seguidos se lee el historial
+    de todos modos, por si la lista de diálogos no refleja algún cambio.
+    """
+
+    MODES = ('unread', 'all', 'off')
+
+    def __init__(self, mode=None, force_every=None):
+        mode = (mode or TELEGRAM_CONFIG['change_detection']).lower()
+        if mode not in self.MODES:
+            print(f"[WARNING] Modo de detección de cambios desconocido '{mode}', se usa 'unread'")
+            mode = 'unread'
+        self.mode = mode
+        self.force_every = max(1, force_every or TELEGRAM_CONFIG['force_fetch_every'])
+        self.lock = threading.Lock()
+        # No leídos vistos en la última lectura de cada diálogo y turnos omitidos seguidos
+        self.seen_unread = {}
+        self.scanned_unread = {}
+        self.skips = {}
+        self.counters = {'scans': 0, 'scan_failures': 0, 'fetched': 0, 'skipped': 0, 'forced': 0}
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    @staticmethod
+    def index_activity(dialogs):
+        """Actividad de cada diálogo indexada por todos sus nombres posibles"""
+        index = {}
+        for entry in dialogs:
+            if not isinstance(entry, dict):
+                continue
+            activity = {
+                'unread': read_int(entry, 'unread', 'unread_count', 'unreadCount') or 0,
+                'last_message_id': read_int(entry, 'last_message_id', 'lastMessageId', 'top_message',
+                                            'last_message', 'lastMessage')
+            }
+            for key in ('name', 'username', 'id', 'dialogId', 'title'):
+                if entry.get(key) is not None:
+                    index.setdefault(normalize_dialog_name(entry[key]), activity)
+        return index
+
+    def has_activity(self, dialog_id, activity, cursor):
+        if activity is None:
+            # En modo 'unread' no aparecer significa no tener mensajes sin leer
+            return self.mode == 'all'
+        if activity['last_message_id'] is not None:
+            return activity['last_message_id'] > cursor
+        return activity['unread'] > 0 and activity['unread'] != self.seen_unread.get(dialog_id)
+
+    def select(self, mcp, due, cursors):
+        """
+        Filtra los diálogos vencidos dejando sólo los que tienen actividad
+
+        Los diálogos sin cursor o con mensajes pendientes de una lectura
+        incompleta se leen siempre; si la consulta de diálogos
+        falla se leen todos los vencidos.
+        """
+        if not self.enabled or not due:
+            return list(due)
+        known = [dialog_id for dialog_id in due if cursors.get(dialog_id) is not None]
+        if not known:
+            return list(due)
+
+        try:
+            dialogs = mcp.list_dialogs(unread_only=self.mode == 'unread')
+        except Exception as e:
+            with self.lock:
+                self.counters['scan_failures'] += 1
+            print(f"[WARNING] No se pudo consultar la actividad de los diálogos, se leen todos: {e}")
+            return list(due)
+        index = self.index_activity(dialogs)
+
+        selected = []
+        with self.lock:
+            self.counters['scans'] += 1
+            for dialog_id in due:
+                cursor = cursors.get(dialog_id)
+                activity = index.get(normalize_dialog_name(dialog_id))
+                self.scanned_unread[dialog_id] = activity['unread'] if activity else 0
+                # Con tramos pendientes de una lectura anterior se lee aunque no haya actividad
+                if cursor is None or cursors.get_gaps(dialog_id) or self.has_activity(dialog_id, activity, cursor):
+                    selected.append(dialog_id)
+                elif self.skips.get(dialog_id, 0) + 1 >= self.force_every:
+                    print(f"[INFO] {dialog_id}: sin actividad en {self.force_every} turnos, se lee de todos modos")
+                    self.counters['forced'] += 1
+                    selected.append(dialog_id)
+                else:
+                    self.skips[dialog_id] = self.skips.get(dialog_id, 0) + 1
+                    self.counters['skipped'] += 1
+
+        skipped = len(due) - len(selected)
+        if skipped:
+            print(f"[INFO] Omitidos {skipped} diálogo(s) sin actividad")
+        return selected
+
+    def mark_fetched(self, dialog_id):
+        """Registra que el historial del diálogo se leyó correctamente"""
+        with self.lock:
+            self.counters['fetched'] += 1
+            self.skips[dialog_id] = 0
+            if dialog_id in self.scanned_unread:
+                self.seen_unread[dialog_id] = self.scanned_unread.pop(dialog_id)
+
+    def stats(self):
+        """Lecturas de historial hechas y ahorradas"""
+        with self.lock:
+            stats = dict(self.counters, mode=self.mode)
+        polls = stats['fetched'] + stats['skipped']
+        stats['skip_ratio'] = round(stats['skipped'] / polls, 3) if polls else 0
+        return stats
@@ -2,22 +2,55 @@
 Procesador de contenido para extraer información de URLs
 Ruta: src/agent/content_processor.py
 """
-import requests
-from bs4 import BeautifulSoup
+import re
 from datetime import datetime
-from urllib.parse import urlparse
+from urllib.parse import urlparse, unquote
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from config import SCRAPING_CONFIG, IMAGE_API_CONFIG, CONTENT_TYPES
+from config import SCRAPING_CONFIG, CONTENT_TYPES, CACHE_CONFIG
+from src.agent.http_client import get_session
+from src.agent.extractors import get_extractor
+from src.agent.response_cache import ResponseCache
+from src.agent.url_utils import canonicalize_url
+from src.agent.fetch_scheduler import FetchScheduler, FetchThrottled
+from src.agent.failure_store import FailureStore
+from src.agent.image_store import ImageStore
+from src.agent.image_providers import ImageProviderRouter
+from src.agent.image_mirror import ImageMirror
+from src.backend.image_derivatives import ImageDerivatives
 
 
 class ContentProcessor:
     """Procesa URLs para extraer título, resumen, imágenes y metadatos"""
     
-    def __init__(self):
+    # Patrones sobre bytes para decidir cuándo cortar la descarga en streaming
+    HEAD_END_PATTERN = re.compile(rb'</head\s*>', re.IGNORECASE)
+    META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?([a-zA-Z0-9_.:-]+)', re.IGNORECASE)
+    HEAD_TITLE_PATTERN = re.compile(
+        rb'(?:property|name)=["\'](?:og|twitter):title["\']|<title[\s>]', re.IGNORECASE)
+    HEAD_DESCRIPTION_PATTERN = re.compile(
+        rb'(?:property|name)=["\'](?:(?:og|twitter):)?description["\']', re.IGNORECASE)
+    HEAD_IMAGE_PATTERN = re.compile(
+        rb'(?:property|name)=["\'](?:og|twitter):image["\']', re.IGNORECASE)
+    
+    # Tipos MIME de recursos que no se parsean como HTML: tipo de post asociado
+    RESOURCE_TYPES = {
+        'application/pdf': 'Investigación',
+        'image/': 'Otro',
+        'video/': 'Video',
+        'audio/': 'Otro'
+    }
+    
+    def __init__(self, db=None):
+        """
+        Args:
+            db: Database opcional; si se indica, la expulsión de imágenes respeta
+                las que usan los posts y limpia los posts cuya imagen se borra
+        """
+        self.db = db
         self.timeout = SCRAPING_CONFIG['timeout']
         self.user_agent = SCRAPING_CONFIG['user_agent']
         self.headers = {
@@ -25,16 +58,224 @@ class ContentProcessor:
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8'
         }
+        # Sesión compartida: reutiliza conexiones keep-alive por host
+        self.session = get_session()
+        self.head_only = SCRAPING_CONFIG['head_only']
+        self.max_bytes = SCRAPING_CONFIG['max_bytes']
+        self.chunk_size = SCRAPING_CONFIG['chunk_size']
+        self.extractor = get_extractor(SCRAPING_CONFIG['extractor'], self)
+        # Límites por dominio, Retry-After y robots.txt
+        self.scheduler = FetchScheduler()
+        # Caché de respuestas para revalidar con If-None-Match / If-Modified-Since
+        self.response_cache = ResponseCache() if CACHE_CONFIG['enabled'] else None
+        # URLs que fallan: se aplazan con backoff exponencial
+        self.failure_store = FailureStore()
+        # Si es True no se genera la imagen aquí: el post queda con image_status 'pending'
+        # y la genera la cola de imágenes en segundo plano
+        self.defer_images = False
+        # Imágenes generadas: reutilización por prompt, deduplicación y expulsión LRU
+        self.image_derivatives = ImageDerivatives()
+        self.image_store = ImageStore(on_evict=self.image_evicted,
+                                      in_use=db.images_in_use if db else None)
+        # Proveedores de imágenes ordenados por latencia/éxito, con circuit breaker
+        self.image_providers = ImageProviderRouter(session=self.session)
+        # Copias locales de imágenes remotas (modo espejo)
+        self.image_mirror = ImageMirror(self.image_store, session=self.session, scheduler=self.scheduler)
     
-    def fetch_url_content(self, url):
-        """Obtiene el contenido HTML de una URL"""
+    def head_has_metadata(self, head):
+        """Comprueba si el <head> ya trae título, descripción e imagen en meta tags"""
+        return bool(
+            self.HEAD_TITLE_PATTERN.search(head)
+            and self.HEAD_DESCRIPTION_PATTERN.search(head)
+            and self.HEAD_IMAGE_PATTERN.search(head)
+        )
+    
+    def read_html(self, response):
+        """
+        Lee el cuerpo de una respuesta en streaming
+        
+        Se detiene al ver </head> si el head ya contiene los metadatos que usan
+        los extractores; si falta la descripción o la imagen sigue leyendo el
+        body (párrafos e imágenes) hasta el final o hasta max_bytes.
+        
+        Returns:
+            Tupla (bytes leídos, True si la lectura se cortó antes del final)
+        """
+        buffer = bytearray()
+        head_checked = not self.head_only
+        truncated = False
+        
         try:
-            response = requests.get(url, headers=self.headers, timeout=self.timeout)
-            response.raise_for_status()
-            return response.text
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if not chunk:
+                    continue
+                search_from = max(0, len(buffer) - 16)
+                buffer.extend(chunk)
+                
+                if len(buffer) >= self.max_bytes:
+                    del buffer[self.max_bytes:]
+                    truncated = True
+                    print(f"[WARNING] Página truncada a {self.max_bytes} bytes: {response.url}")
+                    break
+                
+                if not head_checked:
+                    head_end = self.HEAD_END_PATTERN.search(buffer, search_from)
+                    if head_end:
+                        head_checked = True
+                        if self.head_has_metadata(buffer[:head_end.end()]):
+                            truncated = True
+                            break
+        finally:
+            response.close()
+        
+        return bytes(buffer), truncated
+    
+    def decode_html(self, response, raw):
+        """Decodifica el HTML usando el charset de la cabecera, del meta o UTF-8"""
+        encoding = None
+        content_type = response.headers.get('Content-Type', '')
+        if 'charset=' in content_type.lower():
+            encoding = response.encoding
+        else:
+            match = self.META_CHARSET_PATTERN.search(raw[:4096])
+            if match:
+                encoding = match.group(1).decode('ascii', 'ignore')
+        
+        try:
+            return raw.decode(encoding or 'utf-8', errors='replace')
+        except LookupError:
+            return raw.decode('utf-8', errors='replace')
+    
+    def fetch_page(self, url, extra_headers=None):
+        """
+        Descarga una página en streaming
+        
+        Returns:
+            Dict con la URL final, status, cabeceras y html (None si falla)
+        """
+        headers = dict(self.headers)
+        if extra_headers:
+            headers.update(extra_headers)
+        
+        page = {'url': url, 'status': None, 'headers': {}, 'html': None, 'truncated': False,
+                'media_type': '', 'content_length': None, 'resource': False, 'error': None}
+        try:
+            self.scheduler.check_allowed(url)
+            with self.scheduler.slot(url):
+                response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+                page['url'] = response.url
+                page['status'] = response.status_code
+                page['headers'] = response.headers
+                self.scheduler.register_response(url, response)
+                
+                if response.status_code >= 400 or response.status_code == 304:
+                    response.close()
+                response.raise_for_status()
+                if response.status_code == 304:
+                    return page
+                
+                # Pre-flight: con las cabeceras basta para descartar PDFs, vídeos, ZIPs...
+                page['media_type'] = self.get_media_type(response)
+                page['content_length'] = self.get_content_length(response)
+                if not self.is_html_media_type(page['media_type']):
+                    response.close()
+                    page['resource'] = True
+                    return page
+                
+                raw, page['truncated'] = self.read_html(response)
+                page['html'] = self.decode_html(response, raw)
         except Exception as e:
-            print(f"[ERROR] Error obteniendo contenido de {url}: {str(e)}")
+            page['error'] = e
+        
+        return page
+    
+    @staticmethod
+    def get_media_type(response):
+        """Tipo MIME de la respuesta sin parámetros (charset, boundary...)"""
+        return response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    
+    @staticmethod
+    def get_content_length(response):
+        """Tamaño anunciado por Content-Length o None"""
+        try:
+            return int(response.headers.get('Content-Length'))
+        except (TypeError, ValueError):
+            return None
+    
+    @staticmethod
+    def is_html_media_type(media_type):
+        """True si el recurso se puede parsear como HTML (o no declara tipo)"""
+        if not media_type:
+            return True
+        return media_type.startswith('text/') or 'html' in media_type or 'xml' in media_type
+    
+    @staticmethod
+    def format_size(size):
+        """Formatea un tamaño en bytes para mostrarlo en el resumen"""
+        if not size:
+            return 'tamaño desconocido'
+        for unit in ('B', 'KB', 'MB'):
+            if size < 1024:
+                return f"{size:.0f} {unit}"
+            size /= 1024
+        return f"{size:.1f} GB"
+    
+    def title_from_filename(self, url):
+        """Construye un título legible a partir del nombre de fichero de la URL"""
+        filename = unquote(urlparse(url).path.rstrip('/').rsplit('/', 1)[-1])
+        stem = filename.rsplit('.', 1)[0] if '.' in filename else filename
+        title = re.sub(r'[-_+.\s]+', ' ', stem).strip()
+        if not title:
+            return self.determine_provider(url)
+        return title[0].upper() + title[1:]
+    
+    def describe_resource(self, url, page):
+        """
+        Metadatos de un recurso no HTML sin descargar su contenido
+        
+        - PDF: post de tipo Investigación con título del nombre de fichero
+        - Imagen: la propia URL se usa como image_url
+        - Vídeo/audio/otros: título del nombre de fichero y tamaño en el resumen
+        """
+        media_type = page['media_type']
+        size = self.format_size(page['content_length'])
+        source = self.determine_provider(url)
+        title = self.title_from_filename(url)
+        image_url = None
+        
+        if media_type == 'application/pdf':
+            description = f"Documento PDF ({size}) publicado en {source}."
+        elif media_type.startswith('image/'):
+            description = f"Imagen compartida desde {source} ({size})."
+            image_url = url
+        elif media_type.startswith('video/'):
+            description = f"Vídeo compartido desde {source} ({size})."
+        else:
+            extension = media_type.split('/')[-1].upper()
+            description = f"Archivo {extension} ({size}) compartido desde {source}."
+        
+        content_type = 'Otro'
+        for prefix, resource_type in self.RESOURCE_TYPES.items():
+            if media_type.startswith(prefix):
+                content_type = resource_type
+                break
+        
+        print(f"[INFO] Recurso no HTML ({media_type}, {size}), se omite la descarga: {url}")
+        return {
+            'og_data': {},
+            'title': title,
+            'description': description,
+            'image_url': image_url,
+            'type': content_type
+        }
+    
+    def fetch_url_content(self, url):
+        """Obtiene el contenido HTML de una URL"""
+        page = self.fetch_page(url)
+        if page['error'] is not None:
+            print(f"[ERROR] Error obteniendo contenido de {url}: {str(page['error'])}")
             return None
+        return page['html']
     
     def extract_open_graph_data(self, soup):
         """Extrae metadatos Open Graph de la página"""
@@ -186,201 +427,161 @@ class ContentProcessor:
     
     def generate_image(self, title, summary):
         """Genera una imagen usando una API de generación de imágenes"""
-        # Preferir servicio configurado en IMAGE_API_CONFIG o fallback a vars alternativas
-        service = IMAGE_API_CONFIG.get('service') or 'gemini'
-
-        # Prefer configured key; also accept legacy IMAGE_API_KEY2 env var
-        api_key = IMAGE_API_CONFIG.get('api_key') or ''
-        if not api_key:
-            import os
-            api_key = os.getenv('IMAGE_API_KEY2', '') or os.getenv('IMAGE_API_KEY', '') or os.getenv('IMAGE_API_KEY_2', '')
-
-        api_url = IMAGE_API_CONFIG.get('api_url') or ''
-
         prompt = f"Create a professional blog post header image for the article titled '{title}'. Content summary: {summary[:250]}. Make it visually appealing and relevant to the topic."
 
-        # Nombre del archivo y carpeta destino
-        out_dir = Path('data') / 'generated'
-        out_dir.mkdir(parents=True, exist_ok=True)
-        # filename seguro
-        import re
-        safe_title = re.sub(r"[^a-zA-Z0-9-_]", "-", title)[:50].strip("-") or 'image'
-        out_path = out_dir / f"{safe_title}.jpg"
-
-        # Intentar usar la librería oficial google.genai si está disponible y el servicio es gemini
-        if service.lower() in ('gemini', 'google', 'google-genai') or api_key.startswith('AIza'):
-            try:
-                try:
-                    from google import genai
-                    from google.genai import types
-                except Exception:
-                    genai = None
-
-                if genai:
-                    # Prefer explicit API key if provided to avoid ADC issues
-                    api_key_env = IMAGE_API_CONFIG.get('api_key') or ''
-                    if not api_key_env:
-                        import os
-                        api_key_env = os.getenv('IMAGE_API_KEY') or os.getenv('IMAGE_API_KEY2', '') or os.getenv('IMAGE_API_KEY_2', '')
-
-                    if api_key_env:
-                        client = genai.Client(api_key=api_key_env)
-                    else:
-                        client = genai.Client()
-
-                    # Generar imagen con modelo de imagen
-                    response = client.models.generate_content(
-                        model="gemini-2.5-flash-image",
-                        contents=[prompt],
-                        config=types.GenerateContentConfig(
-                            response_modalities=['Image']
-                        )
-                    )
-
-                    # Extraer bytes de la primera imagen retornada
-                    if response and getattr(response, 'candidates', None):
-                        for part in response.candidates[0].content.parts:
-                            if part.inline_data is not None:
-                                img_bytes = part.inline_data.data
-                                with open(out_path, 'wb') as f:
-                                    f.write(img_bytes)
-                                print(f"[INFO] Imagen generada y guardada en {out_path}")
-                                # Devolver la URL pública que sirve Flask: /generated/<filename>
-                                return f"/generated/{out_path.name}"
-
-            except Exception as e:
-                print(f"[ERROR] Error generando imagen con Gemini SDK: {e}")
-
-        # Fallback: OpenAI DALL-E si hay clave
-        openai_key = os.getenv('IMAGE_API_KEY_1', '') or os.getenv('OPENAI_API_KEY', '')
-        if openai_key:
-            try:
-                dalle_url = "https://api.openai.com/v1/images/generations"
-                headers = {
-                    'Authorization': f'Bearer {openai_key}',
-                    'Content-Type': 'application/json'
-                }
-                payload = {
-                    'prompt': prompt,
-                    'model': 'dall-e-3',
-                    'size': '1024x1024',
-                    'quality': 'standard',
-                    'n': 1
-                }
-                resp = requests.post(dalle_url, json=payload, headers=headers, timeout=30)
-                resp.raise_for_status()
-                j = resp.json()
-                if 'data' in j and j['data']:
-                    img_url = j['data'][0]['url']
-                    # Descargar la imagen
-                    img_resp = requests.get(img_url, timeout=30)
-                    img_resp.raise_for_status()
-                    with open(out_path, 'wb') as f:
-                        f.write(img_resp.content)
-                    print(f"[INFO] Imagen generada con DALL-E y guardada en {out_path}")
-                    return f"/generated/{out_path.name}"
-            except Exception as e:
-                print(f"[ERROR] Error generando imagen con DALL-E: {e}")
-
-        # Fallback: Pollinations.ai (gratuito, sin API key)
-        try:
-            # Usar la API de Pollinations: https://image.pollinations.ai/prompt/{encoded_prompt}
-            encoded_prompt = requests.utils.quote(prompt)
-            pollinations_url = f"https://image.pollinations.ai/prompt/{encoded_prompt}"
-            # Parámetros opcionales: width=1024&height=1024&model=flux&seed=42
-            pollinations_url += "?width=1024&height=1024&model=flux"
-            
-            resp = requests.get(pollinations_url, timeout=30)  # Timeout razonable
-            resp.raise_for_status()
-            
-            with open(out_path, 'wb') as f:
-                f.write(resp.content)
-            print(f"[INFO] Imagen generada con Pollinations.ai y guardada en {out_path}")
-            return f"/generated/{out_path.name}"
-        except Exception as e:
-            print(f"[ERROR] Error generando imagen con Pollinations.ai: {e}")
-        if api_url:
-            try:
-                headers = {'Content-Type': 'application/json'}
-                if api_key:
-                    headers['Authorization'] = f"Bearer {api_key}"
+        # Reutilizar la imagen si este prompt ya se generó con cualquier proveedor
+        cached_url = self.image_store.lookup(prompt)
+        if cached_url:
+            print(f"[INFO] Imagen reutilizada del almacén: {cached_url}")
+            return cached_url
 
-                payload = {
-                    'prompt': prompt,
-                    'model': 'gemini-2.5-flash-image',
-                    'response_modalities': ['Image']
-                }
-
-                resp = requests.post(api_url, json=payload, headers=headers, timeout=30)
-                resp.raise_for_status()
-
-                # Asumir que la respuesta trae imagen en bytes en base64 o binario directo
-                content_type = resp.headers.get('Content-Type', '')
-                if 'application/json' in content_type:
-                    j = resp.json()
-                    # Buscar base64 encoded image en campos comunes
-                    b64 = None
-                    if isinstance(j, dict):
-                        # Distintos proveedores usan distintos campos
-                        b64 = j.get('image') or j.get('data') or j.get('result')
-                    if b64:
-                        import base64
-                        img_bytes = base64.b64decode(b64)
-                        with open(out_path, 'wb') as f:
-                            f.write(img_bytes)
-                        print(f"[INFO] Imagen generada (REST) y guardada en {out_path}")
-                        return f"/generated/{out_path.name}"
-                else:
-                    # Si es binario directo
-                    with open(out_path, 'wb') as f:
-                        f.write(resp.content)
-                    print(f"[INFO] Imagen generada (REST binario) y guardada en {out_path}")
-                    return f"/generated/{out_path.name}"
-
-            except Exception as e:
-                print(f"[ERROR] Error generando imagen via REST: {e}")
+        # Probar los proveedores por coste esperado, omitiendo los que tienen el circuito abierto
+        result = self.image_providers.generate(prompt)
+        if result:
+            provider, img_bytes = result
+            # Devolver la URL pública que sirve Flask: /generated/<filename>
+            image_url = self.image_store.save(prompt, provider, img_bytes)
+            print(f"[INFO] Imagen generada con {provider} y guardada en {image_url}")
+            # Crear ya las miniaturas para que la primera visita al dashboard no espere
+            self.image_derivatives.create(ImageStore.filename_of(image_url))
+            return image_url
 
         print("[WARNING] API de generación de imágenes no configurada o falló la generación")
         return None
     
+    def image_evicted(self, filename):
+        """
+        Borra las miniaturas de una imagen expulsada y la quita de los posts que la usaban
+        
+        Los posts con una copia local de una imagen remota vuelven a la URL original.
+        """
+        self.image_derivatives.remove(filename)
+        if self.db:
+            released = self.db.release_image(self.image_store.public_url(filename))
+            if released:
+                print(f"[WARNING] Imagen {filename} expulsada del almacén: retirada de {released} post(s)")
+    
+    def mirror_image(self, image_url):
+        """Copia una imagen remota al almacén local y devuelve su URL /generated/..."""
+        local_url = self.image_mirror.mirror(image_url)
+        self.image_derivatives.create(ImageStore.filename_of(local_url))
+        return local_url
+    
+    def resolve_image(self, page_image_url, title, summary, source_url):
+        """
+        Imagen del post y su estado: (image_url, image_status)
+        
+        Sin imagen en la página se conserva la que ya tenga el post guardado
+        (p. ej. la que generó la cola), y sólo si no hay ninguna se genera
+        ahora o se deja pendiente para la cola.
+        """
+        if page_image_url:
+            return page_image_url, 'ready'
+        existing = self.db.get_post_by_source_url(source_url) if self.db else None
+        if existing and existing['image_url'] and existing['image_status'] == 'ready':
+            return existing['image_url'], 'ready'
+        if self.defer_images:
+            return '', 'pending'
+        image_url = self.generate_image(title, summary)
+        return image_url or '', 'ready' if image_url else 'failed'
+    
     def process_url(self, url, message_date):
-        """Procesa una URL y extrae toda la información necesaria"""
+        """
+        Procesa una URL y extrae toda la información necesaria
+        
+        Devuelve None si falla (el fallo queda en la caché negativa para
+        reintentarlo) y lanza FetchThrottled si el dominio está limitado.
+        """
         print(f"[INFO] Procesando URL: {url}")
         
-        # Obtener contenido HTML
-        html_content = self.fetch_url_content(url)
-        if not html_content:
+        # Revalidar contra la caché si ya procesamos esta URL antes
+        cached = self.response_cache.get(url) if self.response_cache else None
+        page = self.fetch_page(url, ResponseCache.conditional_headers(cached))
+        
+        if page['error'] is not None:
+            # El límite local de peticiones no es un fallo de la URL: no se registra,
+            # se relanza para que el agente la aplace a la próxima verificación
+            if isinstance(page['error'], FetchThrottled):
+                raise page['error']
+            print(f"[ERROR] Error obteniendo contenido de {url}: {str(page['error'])}")
+            self.failure_store.record(url, page['error'], message_date)
             return None
+        self.failure_store.clear(url)
+        
+        # Se descarga la URL original (o la final tras redirecciones); la forma
+        # canónica sólo se usa como source_url, la clave de deduplicación
+        final_url = page['url'] or url
+        source_url = canonicalize_url(final_url)
+        
+        if page['status'] == 304 and cached:
+            print(f"[INFO] Sin cambios (304), usando extracción cacheada: {url}")
+            self.response_cache.record_hit()
+            self.response_cache.touch(url)
+            # La caché guarda la imagen de la página, no la generada después en segundo plano
+            post_data = dict(cached['metadata'])
+            page_image_url = post_data.pop('page_image_url', None)
+            if page_image_url is None:
+                # Entrada anterior a page_image_url: sólo una imagen remota es de la página
+                page_image_url = post_data.get('image_url', '') if post_data.get('image_url', '').startswith('http') else ''
+            post_data['image_url'], post_data['image_status'] = self.resolve_image(
+                page_image_url, post_data['title'], post_data['summary'], source_url)
+            post_data['source_url'] = source_url
+            post_data['fetched_url'] = final_url
+            post_data['release_date'] = message_date
+            return post_data
         
-        # Parsear HTML
-        soup = BeautifulSoup(html_content, 'html.parser')
+        if self.response_cache:
+            self.response_cache.record_miss()
         
-        # Extraer metadatos
-        og_data = self.extract_open_graph_data(soup)
-        twitter_data = self.extract_twitter_card_data(soup)
+        # Si la página redirigió, seguir con la URL final
+        requested_url = url
+        if final_url != url:
+            print(f"[INFO] Redirección detectada: {url} -> {final_url}")
+            url = final_url
         
-        # Extraer información
-        title = self.extract_title(soup, og_data, twitter_data)
-        summary = self.extract_description(soup, og_data, twitter_data)
-        image_url = self.extract_image_url(soup, og_data, twitter_data)
+        if page['resource']:
+            # PDF, imagen, vídeo...: metadatos a partir de cabeceras y nombre de fichero
+            metadata = self.describe_resource(url, page)
+            content_type = metadata['type']
+        else:
+            # Obtener contenido HTML
+            html_content = page['html']
+            if not html_content:
+                # Se registra con la URL pedida, la misma que consultan clear() e ineligible_urls()
+                self.failure_store.record(requested_url, ValueError('Respuesta sin contenido HTML'), message_date)
+                return None
+            
+            # Extraer metadatos e información con el extractor configurado
+            metadata = self.extractor.extract(html_content)
+            content_type = self.determine_content_type(None, metadata['og_data'], url)
+        
+        title = metadata['title']
+        summary = metadata['description']
         
-        # Si no hay imagen, intentar generar una
-        if not image_url:
-            image_url = self.generate_image(title, summary)
+        # Si no hay imagen, reutilizar la del post, generarla ahora o dejarla pendiente para la cola
+        image_url, image_status = self.resolve_image(metadata['image_url'], title, summary, source_url)
         
-        # Determinar proveedor y tipo de contenido
+        # Determinar proveedor
         provider = self.determine_provider(url)
-        content_type = self.determine_content_type(soup, og_data, url)
         
         # Construir objeto de datos del post
         post_data = {
             'title': title,
             'summary': summary[:500],  # Limitar resumen a 500 caracteres
-            'source_url': url,
+            'source_url': source_url,
             'image_url': image_url or '',
             'release_date': message_date,
             'provider': provider,
-            'type': content_type
+            'type': content_type,
+            'image_status': image_status
         }
         
+        if self.response_cache:
+            cached_fields = {key: value for key, value in post_data.items()
+                             if key not in ('source_url', 'release_date', 'image_url', 'image_status')}
+            cached_fields['page_image_url'] = metadata['image_url'] or ''
+            self.response_cache.store(requested_url, page['headers'], cached_fields)
+        
+        # URL realmente descargada (el agente la quita antes de guardar el post)
+        post_data['fetched_url'] = url
         return post_data
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""
+Planificador de lecturas de varios diálogos de Telegram con métricas por diálogo
+Ruta: src/agent/dialog_scheduler.py
+"""
+import random
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import TELEGRAM_CONFIG
+
+
+def parse_dialogs(spec, default_interval):
+    """
+    Lee la lista de diálogos 'nombre[:intervalo[:prioridad]]' separada por comas
+
+    Returns:
+        Lista de dicts {name, interval, priority} sin nombres repetidos
+    """
+    dialogs = []
+    seen = set()
+    for entry in (spec or '').split(','):
+        parts = [part.strip() for part in entry.split(':')]
+        name = parts[0]
+        if not name or name in seen:
+            continue
+        try:
+            interval = float(parts[1]) if len(parts) > 1 and parts[1] else default_interval
+            priority = int(parts[2]) if len(parts) > 2 and parts[2] else 0
+        except ValueError:
+            print(f"[WARNING] Diálogo mal configurado, se usan los valores por defecto: {entry}")
+            interval, priority = default_interval, 0
+        seen.add(name)
+        dialogs.append({'name': name, 'interval': max(1.0, interval), 'priority': priority})
+    return dialogs
+
+
+class DialogState:
+    """Programación y contadores de un diálogo vigilado"""
+
+    def __init__(self, name, interval, priority):
+        self.name = name
+        self.interval = interval
+        self.priority = priority
+        self.next_poll_at = 0.0
+        self.polling = False
+        self.started_at = time.time()
+        self.polls = 0
+        self.skipped = 0
+        self.errors = 0
+        self.messages = 0
+        self.urls = 0
+        self.lag_total = 0.0
+        self.lag_count = 0
+        self.last_lag = None
+        self.last_poll_at = None
+        self.last_poll_seconds = None
+        self.last_error = None
+
+
+class DialogScheduler:
+    """
+    Decide qué diálogos toca leer en cada momento
+
+    Cada diálogo tiene su intervalo y prioridad. Tras cada lectura el
+    siguiente turno se programa con una variación aleatoria (±poll_jitter)
+    para que los diálogos con el mismo intervalo no coincidan siempre; los
+    diálogos vencidos se devuelven por prioridad (mayor primero) y nunca
+    más de max_concurrent a la vez. Con varios diálogos el primer turno de
+    cada uno se sortea dentro de su intervalo, para que el arranque no los
+    lea todos a la vez.
+    """
+
+    def __init__(self, dialogs, max_concurrent=None, jitter=None):
+        self.max_concurrent = max(1, max_concurrent or TELEGRAM_CONFIG['max_concurrent_dialogs'])
+        self.jitter = TELEGRAM_CONFIG['poll_jitter'] if jitter is None else jitter
+        self.lock = threading.Lock()
+        self.states = {dialog['name']: DialogState(dialog['name'], dialog['interval'], dialog['priority'])
+                       for dialog in dialogs}
+        if len(self.states) > 1:
+            now = time.monotonic()
+            for state in self.states.values():
+                state.next_poll_at = now + random.uniform(0, state.interval)
+
+    @property
+    def names(self):
+        return list(self.states)
+
+    def jittered(self, interval):
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def due(self, now=None):
+        """Marca como en curso y devuelve los diálogos vencidos (máx. max_concurrent)"""
+        now = now or time.monotonic()
+        with self.lock:
+            busy = sum(1 for state in self.states.values() if state.polling)
+            ready = [state for state in self.states.values()
+                     if not state.polling and state.next_poll_at <= now]
+            ready.sort(key=lambda state: (-state.priority, state.next_poll_at))
+            selected = ready[:max(0, self.max_concurrent - busy)]
+            for state in selected:
+                state.polling = True
+        return [state.name for state in selected]
+
+    def seconds_until_next(self):
+        """Segundos hasta que venza el próximo diálogo"""
+        with self.lock:
+            pending = [state.next_poll_at for state in self.states.values() if not state.polling]
+        if not pending:
+            return None
+        return max(0.0, min(pending) - time.monotonic())
+
+    def record_poll(self, name, seconds, messages=0, urls=0, message_dates=(), error=None, skipped=False):
+        """Registra el resultado de una lectura (u omisión por falta de actividad) y programa la siguiente"""
+        now = datetime.now()
+        with self.lock:
+            state = self.states[name]
+            state.polling = False
+            state.next_poll_at = time.monotonic() + self.jittered(state.interval)
+            state.polls += 1
+            state.last_poll_at = time.time()
+            state.last_poll_seconds = round(seconds, 3)
+            if skipped:
+                state.skipped += 1
+                return
+            if error is not None:
+                state.errors += 1
+                state.last_error = str(error)[:300]
+                return
+            state.messages += messages
+            state.urls += urls
+
+            # Retraso entre la publicación de cada mensaje y su ingesta
+            lags = []
+            for message_date in message_dates:
+                try:
+                    lags.append((now - datetime.strptime(message_date, '%Y-%m-%d %H:%M:%S')).total_seconds())
+                except (TypeError, ValueError):
+                    continue
+            if lags:
+                state.lag_total += sum(lags)
+                state.lag_count += len(lags)
+                state.last_lag = round(max(lags), 1)
+
+    def release(self, names, seconds, error):
+        """Registra `error` en los diálogos de `names` que sigan en curso (p. ej. tras una excepción)"""
+        with self.lock:
+            pending = [name for name in names if self.states[name].polling]
+        for name in pending:
+            self.record_poll(name, seconds, error=error)
+        return pending
+
+    def stats(self):
+        """Métricas por diálogo: rendimiento, retraso y próxima lectura"""
+        now = time.time()
+        monotonic = time.monotonic()
+        stats = {}
+        with self.lock:
+            for state in self.states.values():
+                minutes = max((now - state.started_at) / 60, 1.0)
+                stats[state.name] = {
+                    'interval': state.interval,
+                    'priority': state.priority,
+                    'polls': state.polls,
+                    'skipped': state.skipped,
+                    'errors': state.errors,
+                    'messages': state.messages,
+                    'urls': state.urls,
+                    'messages_per_minute': round(state.messages / minutes, 2),
+                    'avg_lag_seconds': round(state.lag_total / state.lag_count, 1) if state.lag_count else None,
+                    'last_lag_seconds': state.last_lag,
+                    'last_poll_at': state.last_poll_at,
+                    'last_poll_seconds': state.last_poll_seconds,
+                    'next_poll_in': round(max(0.0, state.next_poll_at - monotonic), 1),
+                    'last_error': state.last_error
+                }
+        return stats
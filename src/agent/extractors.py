@@ -0,0 +1,314 @@
+"""
+Extractores de metadatos HTML intercambiables
+Ruta: src/agent/extractors.py
+
+Todos los extractores devuelven el mismo diccionario:
+    {
+        'og_data': {...},        # metadatos Open Graph
+        'twitter_data': {...},   # metadatos Twitter Card
+        'title': str,
+        'description': str,
+        'image_url': str | None
+    }
+y aplican las mismas reglas de prioridad que ContentProcessor.
+"""
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup
+
+
+OG_TAGS = {
+    'og:title': 'title',
+    'og:description': 'description',
+    'og:image': 'image',
+    'og:type': 'type',
+    'og:site_name': 'site_name'
+}
+
+TWITTER_TAGS = {
+    'twitter:title': 'title',
+    'twitter:description': 'description',
+    'twitter:image': 'image'
+}
+
+# Fragmentos de src que delatan logos, iconos o píxeles de tracking
+IMAGE_SKIP_PATTERNS = ['logo', 'icon', 'avatar', 'pixel', '1x1']
+
+# Elementos HTML sin etiqueta de cierre
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+}
+
+# Contenido que get_text() de BeautifulSoup no devuelve como texto
+NON_TEXT_ELEMENTS = {'script', 'style', 'template'}
+
+
+class BaseExtractor:
+    """Interfaz común de los extractores de metadatos"""
+
+    name = 'base'
+
+    def extract(self, html):
+        """Extrae los metadatos de un documento HTML"""
+        raise NotImplementedError
+
+
+class SoupExtractor(BaseExtractor):
+    """Extractor original: árbol completo de BeautifulSoup y búsquedas sucesivas"""
+
+    name = 'soup'
+
+    def __init__(self, processor):
+        self.processor = processor
+
+    def extract(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
+        og_data = self.processor.extract_open_graph_data(soup)
+        twitter_data = self.processor.extract_twitter_card_data(soup)
+        return {
+            'og_data': og_data,
+            'twitter_data': twitter_data,
+            'title': self.processor.extract_title(soup, og_data, twitter_data),
+            'description': self.processor.extract_description(soup, og_data, twitter_data),
+            'image_url': self.processor.extract_image_url(soup, og_data, twitter_data)
+        }
+
+
+class _StopParsing(Exception):
+    """Señal interna para cortar el parseo cuando ya no hace falta seguir"""
+
+
+class _MetadataParser(HTMLParser):
+    """
+    Tokenizador que recoge en una sola pasada todos los datos que usan las
+    reglas de extracción: meta tags, <title>, primer <h1>, primer <p> largo
+    e imagen candidata.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        # Primer <meta> de cada clave, con su content (puede ser vacío)
+        self.og_meta = {}
+        self.twitter_meta = {}
+        self.meta_description = None
+        self.title = None
+        self.h1 = None
+        self.paragraph = None
+        self.image_url = None
+        self.head_closed = False
+
+        # Pila de elementos abiertos para cerrar como lo hace BeautifulSoup
+        self.stack = []
+        # Capturas de texto activas: (posición en la pila, fragmentos)
+        self.title_capture = None
+        self.h1_capture = None
+        # <p> abiertos y cerrados pendientes: (orden de apertura, profundidad, fragmentos)
+        self.paragraph_captures = []
+        self.closed_paragraphs = []
+        self.paragraph_count = 0
+        self.skip_depth = 0
+
+    # ---- utilidades ----
+
+    def _collecting_paragraphs(self):
+        return self.paragraph is None
+
+    def _metadata_complete(self):
+        """True si título, descripción e imagen ya salen de meta tags o <title>"""
+        has_title = (self.og_meta.get('title') or self.twitter_meta.get('title')
+                     or self.title is not None)
+        has_description = (self.og_meta.get('description') or self.twitter_meta.get('description')
+                           or self.meta_description)
+        has_image = self.og_meta.get('image') or self.twitter_meta.get('image')
+        return bool(has_title and has_description and has_image)
+
+    # ---- eventos del tokenizador ----
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {key: (value or '') for key, value in attrs}
+
+        if tag == 'meta':
+            self._handle_meta(attrs)
+        elif tag == 'img':
+            if self.image_url is None and is_candidate_image(attrs):
+                self.image_url = attrs['src']
+
+        if tag in VOID_ELEMENTS:
+            return
+
+        depth = len(self.stack)
+        self.stack.append(tag)
+
+        if tag in NON_TEXT_ELEMENTS:
+            self.skip_depth += 1
+        elif tag == 'title' and self.title is None and self.title_capture is None:
+            self.title_capture = (depth, [])
+        elif tag == 'h1' and self.h1 is None and self.h1_capture is None:
+            self.h1_capture = (depth, [])
+        elif tag == 'p' and self._collecting_paragraphs():
+            self.paragraph_captures.append((self.paragraph_count, depth, []))
+            self.paragraph_count += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.head_closed = True
+        if tag not in self.stack:
+            # Cierre sin apertura: BeautifulSoup lo ignora
+            return
+
+        # Cerrar todos los elementos hasta el último <tag> abierto
+        while self.stack:
+            depth = len(self.stack) - 1
+            closed = self.stack.pop()
+            self._close_element(closed, depth)
+            if closed == tag:
+                break
+
+        if self.head_closed and self._metadata_complete():
+            raise _StopParsing()
+
+    def _close_element(self, tag, depth):
+        if tag in NON_TEXT_ELEMENTS:
+            self.skip_depth -= 1
+        elif tag == 'title' and self.title_capture and self.title_capture[0] == depth:
+            self.title = ''.join(self.title_capture[1]).strip()
+            self.title_capture = None
+        elif tag == 'h1' and self.h1_capture and self.h1_capture[0] == depth:
+            self.h1 = ''.join(self.h1_capture[1]).strip()
+            self.h1_capture = None
+        elif tag == 'p' and self.paragraph_captures and self.paragraph_captures[-1][1] == depth:
+            self._close_paragraph()
+
+    def _close_paragraph(self):
+        """Cierra el <p> más interno y decide si ya tenemos el primer párrafo largo"""
+        order, _, fragments = self.paragraph_captures.pop()
+        self.closed_paragraphs.append((order, ''.join(fragments).strip()))
+        if self.paragraph_captures:
+            # Hay un <p> exterior abierto: va antes en el documento, esperar a que cierre
+            return
+        for _, candidate in sorted(self.closed_paragraphs):
+            if len(candidate) > 100:
+                self.paragraph = candidate
+                break
+        self.closed_paragraphs = []
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if self.title_capture:
+            self.title_capture[1].append(data)
+        if self.h1_capture:
+            self.h1_capture[1].append(data)
+        for _, _, fragments in self.paragraph_captures:
+            fragments.append(data)
+
+    def _handle_meta(self, attrs):
+        prop = attrs.get('property')
+        if prop in OG_TAGS and OG_TAGS[prop] not in self.og_meta:
+            self.og_meta[OG_TAGS[prop]] = attrs.get('content', '')
+
+        name = attrs.get('name')
+        if name in TWITTER_TAGS and TWITTER_TAGS[name] not in self.twitter_meta:
+            self.twitter_meta[TWITTER_TAGS[name]] = attrs.get('content', '')
+        elif name == 'description' and self.meta_description is None:
+            self.meta_description = attrs.get('content', '')
+
+    # ---- fin del documento ----
+
+    def finish(self):
+        """Cierra los elementos que queden abiertos al final del documento"""
+        while self.stack:
+            depth = len(self.stack) - 1
+            self._close_element(self.stack.pop(), depth)
+
+
+def is_candidate_image(attrs):
+    """Reglas de extract_image_url para una <img> dada como dict de atributos"""
+    src = attrs.get('src', '')
+    if src and not any(x in src.lower() for x in IMAGE_SKIP_PATTERNS):
+        if attrs.get('width', 0) or attrs.get('height', 0):
+            try:
+                width = int(attrs.get('width', 0))
+                height = int(attrs.get('height', 0))
+                if width >= 300 or height >= 300:
+                    return True
+            except (TypeError, ValueError):
+                pass
+    return False
+
+
+class FastExtractor(BaseExtractor):
+    """
+    Extractor de una sola pasada basado en el tokenizador de html.parser
+
+    No construye árbol: recoge los datos en eventos y se detiene en cuanto
+    el <head> cerrado ya resuelve título, descripción e imagen.
+    """
+
+    name = 'fast'
+
+    def __init__(self, processor=None):
+        self.processor = processor
+
+    def extract(self, html):
+        parser = _MetadataParser()
+        try:
+            parser.feed(html)
+            parser.close()
+        except _StopParsing:
+            pass
+        parser.finish()
+
+        og_data = {key: value for key, value in parser.og_meta.items() if value}
+        twitter_data = {key: value for key, value in parser.twitter_meta.items() if value}
+
+        # Prioridad: Open Graph > Twitter Card > Title tag > H1
+        title = og_data.get('title') or twitter_data.get('title')
+        if not title:
+            if parser.title is not None:
+                title = parser.title
+            elif parser.h1 is not None:
+                title = parser.h1
+            else:
+                title = "Sin título"
+
+        # Prioridad: Open Graph > Twitter Card > Meta description > Primer párrafo
+        description = og_data.get('description') or twitter_data.get('description')
+        if not description:
+            if parser.meta_description:
+                description = parser.meta_description.strip()
+            elif parser.paragraph:
+                description = parser.paragraph[:300] + "..."
+            else:
+                description = "Sin descripción disponible"
+
+        # Prioridad: Open Graph > Twitter Card > Primera imagen relevante
+        image_url = og_data.get('image') or twitter_data.get('image') or parser.image_url
+
+        return {
+            'og_data': og_data,
+            'twitter_data': twitter_data,
+            'title': title,
+            'description': description,
+            'image_url': image_url
+        }
+
+
+EXTRACTORS = {
+    SoupExtractor.name: SoupExtractor,
+    FastExtractor.name: FastExtractor
+}
+
+
+def get_extractor(name, processor):
+    """Devuelve una instancia del extractor configurado (por defecto 'fast')"""
+    extractor_class = EXTRACTORS.get((name or '').lower())
+    if extractor_class is None:
+        print(f"[WARNING] Extractor desconocido '{name}', usando 'fast'")
+        extractor_class = FastExtractor
+    return extractor_class(processor)
@@ -0,0 +1,327 @@
+"""
+Caché negativa de URLs que fallan, con backoff exponencial
+Ruta: src/agent/failure_store.py
+
+Uso desde línea de comandos:
+    python src/agent/failure_store.py list [--poisoned] [--domain DOMINIO]
+    python src/agent/failure_store.py clear (--url URL | --domain DOMINIO | --poisoned | --all)
+"""
+import argparse
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+import requests
+from urllib3.exceptions import MaxRetryError, TimeoutError as Urllib3Timeout, SSLError as Urllib3SSLError
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import CACHE_CONFIG, FAILURE_CONFIG
+from src.agent.fetch_scheduler import FetchThrottled, RobotsDisallowed
+
+
+def root_cause(error):
+    """Causa original de un ConnectionError de requests que envuelve un MaxRetryError de urllib3"""
+    reason = error.args[0] if isinstance(error, requests.exceptions.ConnectionError) and error.args else None
+    if isinstance(reason, MaxRetryError) and reason.reason is not None:
+        return reason.reason
+    return error
+
+
+def classify_error(error):
+    """Clase de error legible para una excepción de descarga"""
+    if isinstance(error, FetchThrottled):
+        return 'throttled'
+    if isinstance(error, RobotsDisallowed):
+        return 'robots'
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return f"http_{error.response.status_code}"
+    # Los timeouts van antes que ConnectionError: tras agotar reintentos urllib3
+    # entrega un ReadTimeoutError/ConnectTimeoutError dentro de un ConnectionError
+    cause = root_cause(error)
+    if isinstance(error, requests.exceptions.Timeout) or isinstance(cause, Urllib3Timeout):
+        return 'timeout'
+    if isinstance(error, requests.exceptions.SSLError) or isinstance(cause, Urllib3SSLError):
+        return 'ssl'
+    if isinstance(error, requests.exceptions.ConnectionError):
+        if 'resolve' in str(error).lower() or 'name or service' in str(error).lower():
+            return 'dns'
+        return 'connection'
+    return type(error).__name__
+
+
+# Clases de error que no se arreglan reintentando: la URL se envenena al primer fallo
+PERMANENT_ERRORS = ('robots',)
+
+
+class FailureStore:
+    """
+    Registro persistente de fallos de descarga por URL
+
+    La clave es la URL tal como se pidió (la publicada o la resuelta de un
+    acortador), no su forma canónica.
+
+    Cada fallo incrementa el contador de intentos y aplaza la URL
+    base_delay * 2^(intentos-1) segundos (hasta max_delay). El agente omite
+    las URLs que todavía no son elegibles en lugar de volver a pagar el
+    timeout completo en cada verificación, y vuelve a procesar por su
+    cuenta las que ya lo son (`due_for_retry`, con la fecha del mensaje
+    original) hasta que funcionan o agotan max_attempts (envenenadas).
+    Los errores permanentes (PERMANENT_ERRORS, p. ej. robots.txt) envenenan
+    la URL al primer fallo.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or CACHE_CONFIG['path']
+        self.base_delay = FAILURE_CONFIG['base_delay']
+        self.max_delay = FAILURE_CONFIG['max_delay']
+        self.max_attempts = FAILURE_CONFIG['max_attempts']
+        self.retry_batch = FAILURE_CONFIG['retry_batch']
+        # URLs con fallos registrados: evita abrir la base de datos tras cada descarga correcta
+        self.failed_urls = set()
+        self.failed_lock = threading.Lock()
+        self.init_database()
+        self.load_failed_urls()
+
+    def get_connection(self):
+        """Crea una conexión a la base de datos de caché"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Crea la tabla de fallos si no existe"""
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self.get_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS fetch_failures (
+                url TEXT PRIMARY KEY,
+                domain TEXT NOT NULL,
+                error_class TEXT NOT NULL,
+                last_error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                first_failed_at REAL NOT NULL,
+                last_failed_at REAL NOT NULL,
+                next_eligible_at REAL NOT NULL,
+                release_date TEXT
+            )
+        ''')
+        # Migrar tablas anteriores a la columna release_date (fecha del mensaje para reintentar)
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(fetch_failures)')}
+        if 'release_date' not in columns:
+            conn.execute('ALTER TABLE fetch_failures ADD COLUMN release_date TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_fetch_failures_domain ON fetch_failures(domain)')
+        conn.commit()
+        conn.close()
+
+    def load_failed_urls(self):
+        """Carga en memoria las URLs que tienen fallos registrados"""
+        conn = self.get_connection()
+        try:
+            urls = {row['url'] for row in conn.execute('SELECT url FROM fetch_failures')}
+        finally:
+            conn.close()
+        with self.failed_lock:
+            self.failed_urls = urls
+
+    @staticmethod
+    def domain_of(url):
+        host = (urlsplit(url).hostname or '').lower()
+        return host[4:] if host.startswith('www.') else host
+
+    def backoff(self, attempts):
+        """Segundos de espera tras `attempts` fallos consecutivos"""
+        return min(self.max_delay, self.base_delay * (2 ** max(0, attempts - 1)))
+
+    def record(self, url, error, release_date=None):
+        """
+        Registra un fallo y calcula cuándo vuelve a ser elegible la URL
+
+        `release_date` es la fecha del mensaje donde apareció la URL, para
+        que el reintento cree el post con la misma fecha.
+        """
+        now = time.time()
+        error_class = classify_error(error)
+        conn = self.get_connection()
+        try:
+            row = conn.execute('SELECT attempts, first_failed_at, release_date FROM fetch_failures WHERE url = ?',
+                               (url,)).fetchone()
+            attempts = (row['attempts'] if row else 0) + 1
+            if error_class in PERMANENT_ERRORS:
+                attempts = max(attempts, self.max_attempts)
+            first_failed_at = row['first_failed_at'] if row else now
+            release_date = release_date or (row['release_date'] if row else None)
+            delay = self.max_delay if attempts >= self.max_attempts else self.backoff(attempts)
+
+            conn.execute('''
+                INSERT OR REPLACE INTO fetch_failures
+                    (url, domain, error_class, last_error, attempts, first_failed_at, last_failed_at,
+                     next_eligible_at, release_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (url, self.domain_of(url), error_class, str(error)[:500], attempts,
+                  first_failed_at, now, now + delay, release_date))
+            conn.commit()
+        finally:
+            conn.close()
+        with self.failed_lock:
+            self.failed_urls.add(url)
+
+        if attempts >= self.max_attempts:
+            print(f"[INFO] Fallo {attempts} ({error_class}) para {url}; no se reintentará")
+        else:
+            print(f"[INFO] Fallo {attempts} ({error_class}) para {url}; "
+                  f"reintento en {delay / 60:.0f} min")
+        return attempts
+
+    def clear(self, url):
+        """Olvida los fallos de una URL (tras una descarga correcta); sin fallos no toca la base de datos"""
+        with self.failed_lock:
+            if url not in self.failed_urls:
+                return 0
+            self.failed_urls.discard(url)
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute('DELETE FROM fetch_failures WHERE url = ?', (url,))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def ineligible_urls(self, urls):
+        """Subconjunto de `urls` que todavía está en periodo de espera"""
+        with self.failed_lock:
+            urls = [url for url in urls if url in self.failed_urls]
+        if not urls:
+            return set()
+        placeholders = ','.join('?' * len(urls))
+        conn = self.get_connection()
+        try:
+            rows = conn.execute(
+                f'SELECT url FROM fetch_failures WHERE next_eligible_at > ? AND url IN ({placeholders})',
+                [time.time()] + urls
+            ).fetchall()
+        finally:
+            conn.close()
+        return {row['url'] for row in rows}
+
+    def due_for_retry(self, limit=None):
+        """
+        URLs cuyo periodo de espera terminó y que aún no están envenenadas
+
+        Returns:
+            Lista de (url, release_date) por orden de elegibilidad
+        """
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT url, release_date FROM fetch_failures
+                WHERE next_eligible_at <= ? AND attempts < ?
+                ORDER BY next_eligible_at
+                LIMIT ?
+            ''', (time.time(), self.max_attempts, limit or self.retry_batch)).fetchall()
+        finally:
+            conn.close()
+        return [(row['url'], row['release_date']) for row in rows]
+
+    def is_eligible(self, url):
+        """True si la URL puede volver a descargarse"""
+        return url not in self.ineligible_urls([url])
+
+    def list_failures(self, poisoned_only=False, domain=None):
+        """Lista los fallos registrados (los envenenados son los que agotaron intentos)"""
+        query = 'SELECT * FROM fetch_failures WHERE 1 = 1'
+        params = []
+        if poisoned_only:
+            query += ' AND attempts >= ?'
+            params.append(self.max_attempts)
+        if domain:
+            query += ' AND domain = ?'
+            params.append(domain)
+        query += ' ORDER BY last_failed_at DESC'
+
+        conn = self.get_connection()
+        try:
+            rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+        finally:
+            conn.close()
+        for row in rows:
+            row['poisoned'] = row['attempts'] >= self.max_attempts
+        return rows
+
+    def clear_failures(self, url=None, domain=None, poisoned_only=False, clear_all=False):
+        """Elimina entradas por URL, dominio, envenenadas o todas"""
+        if url:
+            query, params = 'DELETE FROM fetch_failures WHERE url = ?', [url]
+        elif domain:
+            query, params = 'DELETE FROM fetch_failures WHERE domain = ?', [domain]
+        elif poisoned_only:
+            query, params = 'DELETE FROM fetch_failures WHERE attempts >= ?', [self.max_attempts]
+        elif clear_all:
+            query, params = 'DELETE FROM fetch_failures', []
+        else:
+            return 0
+
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute(query, params)
+            conn.commit()
+            removed = cursor.rowcount
+        finally:
+            conn.close()
+        self.load_failed_urls()
+        return removed
+
+    def stats(self):
+        """Número de URLs en espera y envenenadas"""
+        conn = self.get_connection()
+        try:
+            row = conn.execute('''
+                SELECT COUNT(*) AS total,
+                       SUM(CASE WHEN next_eligible_at > ? THEN 1 ELSE 0 END) AS waiting,
+                       SUM(CASE WHEN attempts >= ? THEN 1 ELSE 0 END) AS poisoned
+                FROM fetch_failures
+            ''', (time.time(), self.max_attempts)).fetchone()
+        finally:
+            conn.close()
+        return {key: row[key] or 0 for key in ('total', 'waiting', 'poisoned')}
+
+
+def main():
+    """CLI para inspeccionar y limpiar la caché negativa"""
+    parser = argparse.ArgumentParser(description='Gestiona las URLs que fallan al descargarse')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help='Lista las URLs con fallos')
+    list_parser.add_argument('--poisoned', action='store_true', help='Sólo las que agotaron intentos')
+    list_parser.add_argument('--domain', help='Filtrar por dominio')
+
+    clear_parser = subparsers.add_parser('clear', help='Elimina entradas para reintentarlas ya')
+    group = clear_parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--url', help='URL concreta tal como se publicó (la que muestra "list")')
+    group.add_argument('--domain', help='Todas las URLs de un dominio')
+    group.add_argument('--poisoned', action='store_true', help='Todas las envenenadas')
+    group.add_argument('--all', action='store_true', help='Todas las entradas')
+
+    args = parser.parse_args()
+    store = FailureStore()
+
+    if args.command == 'list':
+        failures = store.list_failures(poisoned_only=args.poisoned, domain=args.domain)
+        for failure in failures:
+            next_try = datetime.fromtimestamp(failure['next_eligible_at']).strftime('%Y-%m-%d %H:%M')
+            flag = ' [ENVENENADA]' if failure['poisoned'] else ''
+            print(f"{failure['url']}{flag}")
+            print(f"    {failure['error_class']} x{failure['attempts']}, próximo intento {next_try}: "
+                  f"{failure['last_error']}")
+        print(f"Total: {len(failures)}")
+    else:
+        removed = store.clear_failures(url=args.url, domain=args.domain,
+                                       poisoned_only=args.poisoned, clear_all=args.all)
+        print(f"Eliminadas {removed} entradas")
+
+
+if __name__ == '__main__':
+    main()
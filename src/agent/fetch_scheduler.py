@@ -0,0 +1,226 @@
+"""
+Planificador de descargas respetuoso con cada dominio
+Ruta: src/agent/fetch_scheduler.py
+"""
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import POLITENESS_CONFIG, SCRAPING_CONFIG
+from src.agent.http_client import get_session
+
+
+class FetchThrottled(Exception):
+    """El dominio está limitado (Retry-After) más tiempo del que se puede esperar"""
+
+
+class RobotsDisallowed(Exception):
+    """robots.txt no permite descargar la URL"""
+
+
+class TokenBucket:
+    """Cubo de tokens: `rate` peticiones por segundo con ráfagas de hasta `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, now):
+        """Segundos hasta que haya un token disponible"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class FetchScheduler:
+    """
+    Controla cuándo se puede descargar una URL
+
+    - Un cubo de tokens por dominio (ajustado al Crawl-delay de robots.txt)
+    - Un límite global de descargas simultáneas
+    - Bloqueo temporal del dominio tras un 429/503 con Retry-After
+    - Reglas de robots.txt cacheadas por dominio
+
+    Los dominios son independientes: mientras uno espera su turno el resto
+    sigue descargando.
+    """
+
+    def __init__(self, rate=None, burst=None, max_concurrency=None):
+        self.rate = rate or POLITENESS_CONFIG['requests_per_second']
+        self.burst = burst or POLITENESS_CONFIG['burst']
+        self.max_wait = POLITENESS_CONFIG['max_wait']
+        self.max_retry_after = POLITENESS_CONFIG['max_retry_after']
+        self.respect_robots = POLITENESS_CONFIG['respect_robots']
+        self.robots_ttl = POLITENESS_CONFIG['robots_ttl']
+        self.user_agent = SCRAPING_CONFIG['user_agent']
+        self.timeout = SCRAPING_CONFIG['timeout']
+        self.session = get_session()
+
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_concurrency or POLITENESS_CONFIG['max_concurrency'])
+        self.buckets = {}
+        self.blocked_until = {}
+        self.robots = {}
+        self.robots_locks = {}
+        self.counters = {'throttled': 0, 'retry_after': 0, 'robots_blocked': 0}
+
+    @staticmethod
+    def domain_of(url):
+        """Dominio de una URL sin 'www.' (clave de los límites)"""
+        host = (urlsplit(url).hostname or '').lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        return host
+
+    def _bucket(self, domain):
+        bucket = self.buckets.get(domain)
+        if bucket is None:
+            bucket = self.buckets[domain] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def _wait_time(self, domain, now):
+        """Segundos que faltan para poder descargar de un dominio (requiere self.lock)"""
+        blocked = self.blocked_until.get(domain, 0) - now
+        return max(blocked, self._bucket(domain).delay(now), 0.0)
+
+    def ready_in(self, url):
+        """
+        Segundos hasta que el dominio de la URL admita otra petición
+
+        Devuelve 0 si el dominio está bloqueado más de max_wait: la descarga
+        se rechazará enseguida con FetchThrottled, no tiene sentido esperar.
+        """
+        domain = self.domain_of(url)
+        with self.lock:
+            wait = self._wait_time(domain, time.monotonic())
+        return 0.0 if wait > self.max_wait else wait
+
+    @contextmanager
+    def slot(self, url):
+        """Espera turno para el dominio y un hueco global antes de descargar"""
+        domain = self.domain_of(url)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait = self._wait_time(domain, now)
+                if wait <= 0:
+                    self._bucket(domain).consume(now)
+                    break
+                if wait > self.max_wait:
+                    self.counters['throttled'] += 1
+                    raise FetchThrottled(f"{domain} limitado durante {wait:.0f}s más")
+            time.sleep(wait)
+
+        with self.slots:
+            yield
+
+    def parse_retry_after(self, value):
+        """Convierte la cabecera Retry-After (segundos o fecha HTTP) a segundos"""
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return int(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def register_response(self, url, response):
+        """Aplica Retry-After si la respuesta indica limitación (429/503)"""
+        if response.status_code not in (429, 503):
+            return
+        seconds = self.parse_retry_after(response.headers.get('Retry-After'))
+        if seconds is None:
+            seconds = 60 if response.status_code == 429 else 0
+        if not seconds:
+            return
+        seconds = min(seconds, self.max_retry_after)
+
+        domain = self.domain_of(url)
+        with self.lock:
+            until = time.monotonic() + seconds
+            self.blocked_until[domain] = max(self.blocked_until.get(domain, 0), until)
+            self.counters['retry_after'] += 1
+        print(f"[WARNING] {domain} pidió esperar {seconds:.0f}s (HTTP {response.status_code})")
+
+    def _load_robots(self, url):
+        """Descarga y parsea robots.txt del host de la URL"""
+        parts = urlsplit(url)
+        robots_url = f"{parts.scheme}://{parts.netloc}/robots.txt"
+        parser = RobotFileParser(robots_url)
+        try:
+            response = self.session.get(robots_url, headers={'User-Agent': self.user_agent},
+                                        timeout=self.timeout)
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.text.splitlines())
+        except Exception as e:
+            print(f"[DEBUG] No se pudo obtener {robots_url}: {e}")
+            parser.allow_all = True
+        return parser
+
+    def _robots_for(self, url):
+        domain = self.domain_of(url)
+        with self.lock:
+            cached = self.robots.get(domain)
+            if cached and time.monotonic() - cached[1] < self.robots_ttl:
+                return cached[0]
+            domain_lock = self.robots_locks.setdefault(domain, threading.Lock())
+
+        # Un solo hilo descarga robots.txt por dominio; el resto espera el resultado
+        with domain_lock:
+            with self.lock:
+                cached = self.robots.get(domain)
+                if cached and time.monotonic() - cached[1] < self.robots_ttl:
+                    return cached[0]
+            parser = self._load_robots(url)
+            with self.lock:
+                self.robots[domain] = (parser, time.monotonic())
+                # Respetar Crawl-delay reduciendo el ritmo del dominio
+                delay = parser.crawl_delay(self.user_agent)
+                if delay:
+                    self._bucket(domain).rate = min(self.rate, 1.0 / float(delay))
+            return parser
+
+    def check_allowed(self, url):
+        """Lanza RobotsDisallowed si robots.txt no permite la URL"""
+        if not self.respect_robots:
+            return
+        if not self._robots_for(url).can_fetch(self.user_agent, url):
+            with self.lock:
+                self.counters['robots_blocked'] += 1
+            raise RobotsDisallowed(f"robots.txt no permite {url}")
+
+    def stats(self):
+        """Contadores del planificador y dominios bloqueados ahora mismo"""
+        with self.lock:
+            now = time.monotonic()
+            stats = dict(self.counters)
+            stats['blocked_domains'] = {
+                domain: round(until - now, 1)
+                for domain, until in self.blocked_until.items() if until > now
+            }
+            stats['domains'] = len(self.buckets)
+        return stats
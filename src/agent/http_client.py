@@ -0,0 +1,84 @@
+"""
+Sesión HTTP compartida con pool de conexiones y keep-alive
+Ruta: src/agent/http_client.py
+"""
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import HTTP_CONFIG
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session(pool_connections=None, pool_maxsize=None, max_retries=None, backoff_factor=None):
+    """
+    Crea una sesión de requests con un pool de conexiones por host
+
+    Las conexiones se mantienen abiertas (keep-alive) y se reutilizan entre
+    peticiones al mismo host. Sólo se reintentan los errores al conectar:
+    un timeout de lectura no se repite (un host colgado costaría varias
+    veces el timeout, también en las llamadas a los proveedores de
+    imágenes) y se propaga como requests.ReadTimeout. Los 429/503 y
+    Retry-After los gestiona el planificador de descargas.
+    """
+    pool_connections = pool_connections or HTTP_CONFIG['pool_connections']
+    pool_maxsize = pool_maxsize or HTTP_CONFIG['pool_maxsize']
+    if max_retries is None:
+        max_retries = HTTP_CONFIG['max_retries']
+    if backoff_factor is None:
+        backoff_factor = HTTP_CONFIG['backoff_factor']
+
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        # False: el error de lectura se relanza tal cual (sin envolverlo en MaxRetryError)
+        read=False,
+        status=0,
+        backoff_factor=backoff_factor,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=False,
+        raise_on_status=False
+    )
+
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+        pool_block=False
+    )
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """
+    Devuelve la sesión HTTP compartida por todo el proceso
+
+    La sesión se crea de forma perezosa y es segura para usarse desde varios
+    hilos: cada petición toma una conexión libre del pool de su host.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def close_session():
+    """Cierra la sesión compartida y sus conexiones abiertas"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,111 @@
+"""
+Copia local de imágenes remotas (og:image) servida desde /generated
+Ruta: src/agent/image_mirror.py
+"""
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import IMAGE_MIRROR_CONFIG, SCRAPING_CONFIG
+from src.agent.http_client import get_session
+
+# Pillow es opcional: sin él se guarda la imagen tal cual (si cabe en el límite)
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+
+class ImageMirrorError(Exception):
+    """La imagen remota no se puede copiar (tipo, tamaño o formato no válidos)"""
+
+
+class ImageMirror:
+    """
+    Descarga imágenes de terceros y las guarda en el almacén de imágenes
+
+    Las copias se redimensionan a max_dimension y se guardan en el
+    ImageStore con la URL remota como clave (proveedor 'mirror'), así que
+    comparten su deduplicación y su expulsión LRU.
+    """
+
+    def __init__(self, image_store, session=None, scheduler=None):
+        self.image_store = image_store
+        self.session = session or get_session()
+        self.scheduler = scheduler
+        self.timeout = SCRAPING_CONFIG['timeout']
+        self.headers = {'User-Agent': SCRAPING_CONFIG['user_agent'], 'Accept': 'image/*'}
+        self.max_bytes = IMAGE_MIRROR_CONFIG['max_bytes']
+        self.max_dimension = IMAGE_MIRROR_CONFIG['max_dimension']
+        self.quality = IMAGE_MIRROR_CONFIG['quality']
+
+    @staticmethod
+    def is_remote(image_url):
+        return bool(image_url) and image_url.startswith(('http://', 'https://'))
+
+    def download(self, url):
+        """Descarga la imagen en streaming sin pasar de max_bytes"""
+        response = self.session.get(url, headers=self.headers, timeout=self.timeout, stream=True)
+        try:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            if content_type and not content_type.startswith('image/'):
+                raise ImageMirrorError(f"no es una imagen ({content_type})")
+            length = response.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > self.max_bytes:
+                raise ImageMirrorError(f"demasiado grande ({int(length)} bytes)")
+
+            data = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                data.extend(chunk)
+                if len(data) > self.max_bytes:
+                    raise ImageMirrorError(f"supera {self.max_bytes} bytes")
+            return bytes(data)
+        finally:
+            response.close()
+
+    def resize(self, data):
+        """Reduce la imagen a max_dimension y la recomprime (sin Pillow se deja igual)"""
+        if Image is None:
+            return data
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                # exif_transpose devuelve una copia sin .format: guardarlo antes
+                source_format = image.format
+                image = ImageOps.exif_transpose(image)
+                if image.width <= self.max_dimension and image.height <= self.max_dimension \
+                        and source_format in ('JPEG', 'PNG', 'WEBP', 'GIF'):
+                    return data
+                image.thumbnail((self.max_dimension, self.max_dimension), Image.LANCZOS)
+                output = io.BytesIO()
+                if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+                    # Con transparencia se guarda en PNG para no perderla
+                    image.convert('RGBA').save(output, 'PNG', optimize=True)
+                else:
+                    image.convert('RGB').save(output, 'JPEG', quality=self.quality, optimize=True)
+                return output.getvalue()
+        except Exception as e:
+            raise ImageMirrorError(f"formato de imagen no válido: {e}")
+
+    def mirror(self, url):
+        """
+        Devuelve la URL local (/generated/...) de una copia de la imagen remota
+
+        Lanza una excepción si no se puede descargar o no es una imagen válida.
+        """
+        cached_url = self.image_store.lookup(url, provider='mirror')
+        if cached_url:
+            return cached_url
+
+        if self.scheduler:
+            self.scheduler.check_allowed(url)
+            with self.scheduler.slot(url):
+                data = self.download(url)
+        else:
+            data = self.download(url)
+
+        local_url = self.image_store.save(url, 'mirror', self.resize(data))
+        print(f"[INFO] Imagen remota copiada: {url} -> {local_url}")
+        return local_url
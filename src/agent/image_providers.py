@@ -0,0 +1,389 @@
+"""
+Proveedores de generación de imágenes con circuit breaker y estadísticas
+Ruta: src/agent/image_providers.py
+"""
+import base64
+import os
+import threading
+import time
+from collections import deque
+import requests
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import IMAGE_API_CONFIG, IMAGE_PROVIDER_CONFIG
+from src.agent.http_client import get_session
+
+
+class ImageProviderError(Exception):
+    """El proveedor respondió pero no devolvió ninguna imagen"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por proveedor
+
+    - closed: se usa con normalidad
+    - open: tras `failure_threshold` fallos seguidos se omite durante `reset_timeout` segundos
+    - half_open: pasado ese tiempo se deja pasar una única petición de prueba;
+      si funciona se cierra y si falla vuelve a abrirse
+    """
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """True si se puede llamar al proveedor ahora"""
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def probe_due(self):
+        """True si el circuito está abierto pero ya toca la petición de prueba"""
+        with self.lock:
+            if self.state == 'open':
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return self.state == 'half_open' and not self.probing
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    print(f"[WARNING] Proveedor {self.name}: circuito abierto tras {self.failures} fallo(s), "
+                          f"se omite durante {self.reset_timeout}s")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class ProviderStats:
+    """
+    Latencia y tasa de éxito de las últimas `window` llamadas
+
+    Las muestras de más de `max_age` segundos se descartan, para que un
+    proveedor que falló en el pasado pueda recuperar su posición.
+    """
+
+    def __init__(self, window, min_samples=1, max_age=None):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.max_age = max_age
+        self.lock = threading.Lock()
+
+    def record(self, seconds, success):
+        with self.lock:
+            self.samples.append((time.monotonic(), seconds, success))
+
+    def recent(self):
+        """Muestras (segundos, éxito) que aún no han caducado"""
+        with self.lock:
+            if self.max_age:
+                cutoff = time.monotonic() - self.max_age
+                while self.samples and self.samples[0][0] < cutoff:
+                    self.samples.popleft()
+            return [(seconds, success) for _, seconds, success in self.samples]
+
+    def snapshot(self):
+        samples = self.recent()
+        if not samples:
+            return {'calls': 0, 'success_rate': None, 'avg_latency': None}
+        successes = [seconds for seconds, success in samples if success]
+        return {
+            'calls': len(samples),
+            'success_rate': round(len(successes) / len(samples), 2),
+            'avg_latency': round(sum(seconds for seconds, _ in samples) / len(samples), 2)
+        }
+
+    def expected_cost(self):
+        """
+        Segundos esperados hasta obtener una imagen con este proveedor
+
+        Latencia media dividida por la tasa de éxito: un proveedor rápido
+        que casi siempre falla sale caro. None si aún no hay `min_samples`
+        muestras recientes.
+        """
+        snapshot = self.snapshot()
+        if snapshot['calls'] < max(self.min_samples, 1):
+            return None
+        return snapshot['avg_latency'] / max(snapshot['success_rate'], 0.05)
+
+
+class ImageProvider:
+    """Proveedor de imágenes: generate(prompt) devuelve los bytes o lanza una excepción"""
+
+    name = 'base'
+
+    def __init__(self, session=None, timeout=None):
+        self.session = session or get_session()
+        self.timeout = timeout or IMAGE_PROVIDER_CONFIG['timeout']
+
+    def is_configured(self):
+        return True
+
+    def generate(self, prompt):
+        raise NotImplementedError
+
+
+def get_image_api_key():
+    """API key configurada para Gemini/REST (acepta también las variables antiguas)"""
+    return (IMAGE_API_CONFIG.get('api_key') or os.getenv('IMAGE_API_KEY2', '')
+            or os.getenv('IMAGE_API_KEY', '') or os.getenv('IMAGE_API_KEY_2', ''))
+
+
+class GeminiProvider(ImageProvider):
+    """Google Gemini mediante la librería oficial google.genai"""
+
+    name = 'gemini'
+
+    def __init__(self, session=None, timeout=None):
+        super().__init__(session, timeout)
+        self.api_key = get_image_api_key()
+        self.service = (IMAGE_API_CONFIG.get('service') or 'gemini').lower()
+        self.client = None
+        self.client_lock = threading.Lock()
+
+    def is_configured(self):
+        if self.service not in ('gemini', 'google', 'google-genai') and not self.api_key.startswith('AIza'):
+            return False
+        try:
+            from google import genai  # noqa: F401
+        except Exception:
+            return False
+        return True
+
+    def get_client(self):
+        """Cliente de genai reutilizado entre llamadas (crearlo es costoso)"""
+        if self.client is None:
+            with self.client_lock:
+                if self.client is None:
+                    from google import genai
+                    # Preferir la API key explícita para evitar problemas con ADC
+                    self.client = genai.Client(api_key=self.api_key) if self.api_key else genai.Client()
+        return self.client
+
+    def generate(self, prompt):
+        from google.genai import types
+
+        response = self.get_client().models.generate_content(
+            model="gemini-2.5-flash-image",
+            contents=[prompt],
+            config=types.GenerateContentConfig(
+                response_modalities=['Image']
+            )
+        )
+
+        # Extraer bytes de la primera imagen retornada
+        if response and getattr(response, 'candidates', None):
+            for part in response.candidates[0].content.parts:
+                if part.inline_data is not None:
+                    return part.inline_data.data
+        raise ImageProviderError('Gemini no devolvió ninguna imagen')
+
+
+class DalleProvider(ImageProvider):
+    """OpenAI DALL-E 3"""
+
+    name = 'dalle'
+
+    def __init__(self, session=None, timeout=None):
+        super().__init__(session, timeout)
+        self.api_key = os.getenv('IMAGE_API_KEY_1', '') or os.getenv('OPENAI_API_KEY', '')
+
+    def is_configured(self):
+        return bool(self.api_key)
+
+    def generate(self, prompt):
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        payload = {
+            'prompt': prompt,
+            'model': 'dall-e-3',
+            'size': '1024x1024',
+            'quality': 'standard',
+            'n': 1
+        }
+        resp = self.session.post("https://api.openai.com/v1/images/generations",
+                                 json=payload, headers=headers, timeout=self.timeout)
+        resp.raise_for_status()
+        j = resp.json()
+        if not j.get('data'):
+            raise ImageProviderError('DALL-E no devolvió ninguna imagen')
+
+        # Descargar la imagen
+        img_resp = self.session.get(j['data'][0]['url'], timeout=self.timeout)
+        img_resp.raise_for_status()
+        return img_resp.content
+
+
+class PollinationsProvider(ImageProvider):
+    """Pollinations.ai (gratuito, sin API key)"""
+
+    name = 'pollinations'
+
+    def generate(self, prompt):
+        # API de Pollinations: https://image.pollinations.ai/prompt/{encoded_prompt}
+        encoded_prompt = requests.utils.quote(prompt)
+        url = f"https://image.pollinations.ai/prompt/{encoded_prompt}?width=1024&height=1024&model=flux"
+        resp = self.session.get(url, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.content
+
+
+class RestProvider(ImageProvider):
+    """Endpoint REST genérico configurado en IMAGE_API_URL"""
+
+    name = 'rest'
+
+    def __init__(self, session=None, timeout=None):
+        super().__init__(session, timeout)
+        self.api_url = IMAGE_API_CONFIG.get('api_url') or ''
+        self.api_key = get_image_api_key()
+
+    def is_configured(self):
+        return bool(self.api_url)
+
+    def generate(self, prompt):
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+
+        payload = {
+            'prompt': prompt,
+            'model': 'gemini-2.5-flash-image',
+            'response_modalities': ['Image']
+        }
+        resp = self.session.post(self.api_url, json=payload, headers=headers, timeout=self.timeout)
+        resp.raise_for_status()
+
+        # La imagen llega en base64 dentro de un JSON o como binario directo
+        if 'application/json' not in resp.headers.get('Content-Type', ''):
+            return resp.content
+        j = resp.json()
+        b64 = None
+        if isinstance(j, dict):
+            # Distintos proveedores usan distintos campos
+            b64 = j.get('image') or j.get('data') or j.get('result')
+        if not b64:
+            raise ImageProviderError('La respuesta REST no contiene ninguna imagen')
+        return base64.b64decode(b64)
+
+
+PROVIDERS = {
+    'gemini': GeminiProvider,
+    'dalle': DalleProvider,
+    'pollinations': PollinationsProvider,
+    'rest': RestProvider
+}
+
+
+class ImageProviderRouter:
+    """
+    Elige en qué orden probar los proveedores de imágenes
+
+    El orden configurado es el punto de partida: un proveedor sin suficientes
+    muestras recientes conserva su posición, y sólo los que tienen datos se
+    reordenan entre sí (en los huecos que ocupan) por coste esperado
+    (latencia / tasa de éxito). Así no se llama a un proveedor de pago sin
+    datos por delante de uno que ya funciona. Los que tienen el circuito
+    abierto se omiten sin esperar, salvo cuando toca su petición de prueba,
+    que va por delante de todos.
+    """
+
+    def __init__(self, order=None, session=None):
+        order = order or IMAGE_PROVIDER_CONFIG['order']
+        self.providers = []
+        for name in order:
+            if name not in PROVIDERS:
+                print(f"[WARNING] Proveedor de imágenes desconocido: {name}")
+                continue
+            provider = PROVIDERS[name](session=session)
+            if provider.is_configured():
+                self.providers.append(provider)
+
+        self.breakers = {
+            provider.name: CircuitBreaker(provider.name, IMAGE_PROVIDER_CONFIG['failure_threshold'],
+                                          IMAGE_PROVIDER_CONFIG['reset_timeout'])
+            for provider in self.providers
+        }
+        self.stats_by_provider = {
+            provider.name: ProviderStats(IMAGE_PROVIDER_CONFIG['stats_window'],
+                                         IMAGE_PROVIDER_CONFIG['stats_min_samples'],
+                                         IMAGE_PROVIDER_CONFIG['stats_max_age'])
+            for provider in self.providers
+        }
+
+    def ordered_providers(self):
+        """Proveedores en el orden en que conviene probarlos ahora"""
+        costs = {provider.name: self.stats_by_provider[provider.name].expected_cost()
+                 for provider in self.providers}
+        measured = sorted((provider for provider in self.providers if costs[provider.name] is not None),
+                          key=lambda provider: costs[provider.name])
+        # Los proveedores con datos ocupan, ordenados por coste, los huecos de los que tienen datos
+        ranked = iter(measured)
+        order = [next(ranked) if costs[provider.name] is not None else provider
+                 for provider in self.providers]
+        # La petición de prueba de un circuito que ya cumplió su espera va primero
+        probes = [provider for provider in order if self.breakers[provider.name].probe_due()]
+        return probes + [provider for provider in order if provider not in probes]
+
+    def generate(self, prompt):
+        """
+        Genera una imagen con el mejor proveedor disponible
+
+        Returns:
+            Tupla (nombre del proveedor, bytes) o None si todos fallan
+        """
+        for provider in self.ordered_providers():
+            breaker = self.breakers[provider.name]
+            if not breaker.allow():
+                print(f"[DEBUG] Proveedor {provider.name} omitido (circuito abierto)")
+                continue
+
+            started = time.monotonic()
+            try:
+                data = provider.generate(prompt)
+                if not data:
+                    raise ImageProviderError('imagen vacía')
+            except Exception as e:
+                self.stats_by_provider[provider.name].record(time.monotonic() - started, False)
+                breaker.record_failure()
+                print(f"[ERROR] Error generando imagen con {provider.name}: {e}")
+                continue
+
+            self.stats_by_provider[provider.name].record(time.monotonic() - started, True)
+            breaker.record_success()
+            return provider.name, data
+
+        return None
+
+    def stats(self):
+        """Estado del circuito y estadísticas de cada proveedor"""
+        return {
+            provider.name: dict(self.stats_by_provider[provider.name].snapshot(),
+                                state=self.breakers[provider.name].state)
+            for provider in self.providers
+        }
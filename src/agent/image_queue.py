@@ -0,0 +1,348 @@
+"""
+Cola persistente de trabajos de imagen procesada en segundo plano
+Ruta: src/agent/image_queue.py
+"""
+import json
+import sqlite3
+import threading
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import CACHE_CONFIG, IMAGE_QUEUE_CONFIG
+
+
+class ImageJobQueue:
+    """
+    Cola durable (SQLite) de trabajos de imagen pendientes
+
+    Cada trabajo tiene un tipo (`kind`, p. ej. 'generate') y la URL del post
+    al que pertenece; sólo puede haber un trabajo por (kind, source_url).
+    Los trabajos que estaban en curso cuando se detuvo el agente vuelven a
+    quedar pendientes con recover(). Los fallidos se conservan
+    `failed_retention_days` días para diagnóstico y después se borran.
+    """
+
+    def __init__(self, db_path=None, max_attempts=None, retry_delay=None, max_pending=None,
+                 failed_retention_days=None):
+        self.db_path = db_path or CACHE_CONFIG['path']
+        self.failed_retention_days = (failed_retention_days if failed_retention_days is not None
+                                      else IMAGE_QUEUE_CONFIG['failed_retention_days'])
+        self.max_attempts = max_attempts or IMAGE_QUEUE_CONFIG['max_attempts']
+        self.retry_delay = retry_delay or IMAGE_QUEUE_CONFIG['retry_delay']
+        self.max_pending = max_pending or IMAGE_QUEUE_CONFIG['max_pending']
+        self.init_database()
+
+    def get_connection(self):
+        """Crea una conexión a la base de datos de caché"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Crea la tabla de trabajos si no existe"""
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self.get_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS image_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                source_url TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                UNIQUE (kind, source_url)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_image_jobs_status ON image_jobs(status, next_attempt_at)')
+        conn.commit()
+        conn.close()
+
+    def enqueue(self, kind, source_url, payload):
+        """
+        Añade un trabajo a la cola
+
+        Returns:
+            True si el trabajo queda pendiente, False si la cola está llena
+        """
+        now = time.time()
+        conn = self.get_connection()
+        try:
+            depth = conn.execute("SELECT COUNT(*) FROM image_jobs WHERE status = 'pending'").fetchone()[0]
+            if depth >= self.max_pending:
+                print(f"[WARNING] Cola de imágenes llena ({depth}), se descarta: {source_url}")
+                return False
+
+            # Un trabajo ya pendiente o en curso se conserva; uno terminado o fallido se reinicia
+            conn.execute('''
+                INSERT INTO image_jobs (kind, source_url, payload, status, attempts, created_at, updated_at, next_attempt_at)
+                VALUES (?, ?, ?, 'pending', 0, ?, ?, ?)
+                ON CONFLICT (kind, source_url) DO UPDATE SET
+                    payload = excluded.payload,
+                    status = 'pending',
+                    attempts = 0,
+                    last_error = NULL,
+                    updated_at = excluded.updated_at,
+                    next_attempt_at = excluded.next_attempt_at
+                WHERE image_jobs.status NOT IN ('pending', 'running')
+            ''', (kind, source_url, json.dumps(payload), now, now, now))
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+
+    def claim(self):
+        """Toma el siguiente trabajo vencido y lo marca en curso (None si no hay)"""
+        now = time.time()
+        conn = self.get_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('''
+                SELECT * FROM image_jobs
+                WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at, id
+                LIMIT 1
+            ''', (now,)).fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            conn.execute('''
+                UPDATE image_jobs SET status = 'running', attempts = attempts + 1, updated_at = ?
+                WHERE id = ?
+            ''', (now, row['id']))
+            conn.commit()
+        finally:
+            conn.close()
+
+        job = dict(row)
+        job['attempts'] += 1
+        job['payload'] = json.loads(job['payload'])
+        return job
+
+    def complete(self, job):
+        """Elimina un trabajo terminado"""
+        conn = self.get_connection()
+        try:
+            conn.execute('DELETE FROM image_jobs WHERE id = ?', (job['id'],))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def fail(self, job, error):
+        """
+        Registra el fallo de un trabajo y lo reprograma con backoff exponencial
+
+        Returns:
+            True si se volverá a intentar, False si agotó los intentos
+        """
+        now = time.time()
+        retry = job['attempts'] < self.max_attempts
+        status = 'pending' if retry else 'failed'
+        next_attempt_at = now + self.retry_delay * (2 ** (job['attempts'] - 1)) if retry else now
+
+        conn = self.get_connection()
+        try:
+            conn.execute('''
+                UPDATE image_jobs SET status = ?, last_error = ?, updated_at = ?, next_attempt_at = ?
+                WHERE id = ?
+            ''', (status, str(error)[:500], now, next_attempt_at, job['id']))
+            if not retry:
+                self._purge_failed(conn, now)
+            conn.commit()
+        finally:
+            conn.close()
+        return retry
+
+    def _purge_failed(self, conn, now):
+        """Borra los trabajos fallidos más antiguos que el periodo de retención"""
+        if not self.failed_retention_days:
+            return 0
+        cutoff = now - self.failed_retention_days * 86400
+        cursor = conn.execute("DELETE FROM image_jobs WHERE status = 'failed' AND updated_at < ?", (cutoff,))
+        if cursor.rowcount:
+            print(f"[INFO] Cola de imágenes: {cursor.rowcount} trabajo(s) fallido(s) antiguo(s) eliminado(s)")
+        return cursor.rowcount
+
+    def recover(self):
+        """Devuelve a pendientes los trabajos interrumpidos por un reinicio y purga los fallidos antiguos"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute("UPDATE image_jobs SET status = 'pending' WHERE status = 'running'")
+            self._purge_failed(conn, time.time())
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def next_due_in(self):
+        """Segundos hasta el próximo trabajo pendiente (None si la cola está vacía)"""
+        conn = self.get_connection()
+        try:
+            row = conn.execute(
+                "SELECT MIN(next_attempt_at) AS next_at FROM image_jobs WHERE status = 'pending'"
+            ).fetchone()
+        finally:
+            conn.close()
+        if row['next_at'] is None:
+            return None
+        return max(0.0, row['next_at'] - time.time())
+
+    def stats(self):
+        """Profundidad de la cola por estado y antigüedad del trabajo pendiente más viejo"""
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) AS count FROM image_jobs GROUP BY status').fetchall()
+            oldest = conn.execute(
+                "SELECT MIN(created_at) AS created_at FROM image_jobs WHERE status = 'pending'"
+            ).fetchone()['created_at']
+        finally:
+            conn.close()
+
+        stats = {'pending': 0, 'running': 0, 'failed': 0}
+        stats.update({row['status']: row['count'] for row in rows})
+        stats['oldest_pending_age'] = round(time.time() - oldest, 1) if oldest else 0
+        return stats
+
+
+class ImageWorkerPool:
+    """
+    Hilos que consumen la cola de imágenes con un límite de concurrencia
+
+    Los manejadores reciben el payload del trabajo y devuelven la URL de la
+    imagen (o None si no se pudo obtener). on_result(job, image_url) se llama
+    al terminar un trabajo o al agotar sus intentos (con image_url=None).
+    """
+
+    def __init__(self, queue, handlers, on_result, workers=None, poll_interval=None):
+        self.queue = queue
+        self.handlers = handlers
+        self.on_result = on_result
+        self.workers = max(1, workers or IMAGE_QUEUE_CONFIG['workers'])
+        self.poll_interval = poll_interval or IMAGE_QUEUE_CONFIG['poll_interval']
+
+        self.lock = threading.Lock()
+        self.condition = threading.Condition()
+        self.threads = []
+        self.stopping = False
+        self.counters = {'completed': 0, 'retried': 0, 'failed': 0, 'busy': 0, 'total_seconds': 0.0}
+
+    def start(self):
+        """Arranca los hilos (idempotente) recuperando los trabajos interrumpidos"""
+        with self.lock:
+            if self.threads:
+                return
+            self.stopping = False
+            recovered = self.queue.recover()
+            if recovered:
+                print(f"[INFO] Recuperados {recovered} trabajo(s) de imagen interrumpidos")
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"image-worker-{index}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        print(f"[INFO] Cola de imágenes iniciada con {self.workers} hilo(s)")
+
+    def stop(self, timeout=5):
+        """Pide a los hilos que terminen tras su trabajo actual"""
+        with self.lock:
+            self.stopping = True
+            threads, self.threads = self.threads, []
+        self.notify(all_workers=True)
+        for thread in threads:
+            thread.join(timeout)
+
+    def notify(self, all_workers=False):
+        """Despierta a un hilo (o a todos) porque hay trabajo nuevo"""
+        with self.condition:
+            if all_workers:
+                self.condition.notify_all()
+            else:
+                self.condition.notify()
+
+    def submit(self, kind, source_url, payload):
+        """Encola un trabajo y despierta a un hilo"""
+        queued = self.queue.enqueue(kind, source_url, payload)
+        if queued:
+            self.notify()
+        return queued
+
+    def _run(self):
+        while not self.stopping:
+            try:
+                job = self.queue.claim()
+            except sqlite3.Error as e:
+                print(f"[ERROR] Error leyendo la cola de imágenes: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    wait = self.queue.next_due_in()
+                except sqlite3.Error:
+                    wait = None
+                wait = self.poll_interval if wait is None else min(max(wait, 0.1), self.poll_interval)
+                with self.condition:
+                    if not self.stopping:
+                        self.condition.wait(wait)
+                continue
+
+            self._process(job)
+
+    def _process(self, job):
+        with self.lock:
+            self.counters['busy'] += 1
+        started = time.monotonic()
+        outcome = None
+        image_url, error = None, None
+        try:
+            try:
+                handler = self.handlers[job['kind']]
+                image_url = handler(job['payload'])
+                if not image_url:
+                    error = 'sin imagen'
+            except Exception as e:
+                error = e
+
+            try:
+                if error is None:
+                    self.queue.complete(job)
+                    outcome = 'completed'
+                elif self.queue.fail(job, error):
+                    print(f"[WARNING] Trabajo de imagen {job['kind']} falló ({error}), "
+                          f"intento {job['attempts']}/{self.queue.max_attempts}: {job['source_url']}")
+                    outcome = 'retried'
+                else:
+                    print(f"[ERROR] Trabajo de imagen {job['kind']} agotó sus intentos: {job['source_url']}")
+                    outcome = 'failed'
+            except sqlite3.Error as e:
+                # La base de datos puede estar bloqueada por el agente: el trabajo sigue
+                # 'running' y recover() lo devuelve a pendientes en el próximo arranque
+                print(f"[ERROR] Error actualizando la cola de imágenes ({job['source_url']}): {e}")
+                outcome = 'completed' if error is None else 'retried'
+        finally:
+            with self.lock:
+                self.counters['busy'] -= 1
+                if outcome:
+                    self.counters[outcome] += 1
+                self.counters['total_seconds'] += time.monotonic() - started
+
+        if outcome != 'retried':
+            try:
+                self.on_result(job, image_url)
+            except Exception as e:
+                print(f"[ERROR] Error actualizando imagen de {job['source_url']}: {e}")
+
+    def stats(self):
+        """Métricas de la cola y de los hilos"""
+        with self.lock:
+            stats = dict(self.counters)
+            stats['workers'] = len(self.threads)
+        processed = stats['completed'] + stats['retried'] + stats['failed']
+        total_seconds = stats.pop('total_seconds')
+        stats['avg_seconds'] = round(total_seconds / processed, 2) if processed else 0
+        stats['queue'] = self.queue.stats()
+        return stats
@@ -0,0 +1,224 @@
+"""
+Almacén de imágenes generadas direccionado por contenido
+Ruta: src/agent/image_store.py
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import CACHE_CONFIG, IMAGE_STORE_CONFIG
+
+
+def detect_extension(data):
+    """Extensión de fichero según la firma de los bytes de la imagen"""
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    return 'jpg'
+
+
+class ImageStore:
+    """
+    Imágenes generadas guardadas en data/generated con nombre = hash del contenido
+
+    - image_prompts: (hash del prompt, proveedor) -> hash del contenido, para
+      reutilizar una imagen antes de llamar a ninguna API
+    - image_files: un fichero por contenido distinto (salidas idénticas se
+      guardan una sola vez), con su tamaño y último uso para la expulsión LRU
+
+    Servir una imagen no actualiza su último uso, así que la expulsión
+    empieza por los ficheros que ningún post referencia; los de posts sólo
+    se borran si aun así se supera max_bytes (y on_evict debe limpiar el post).
+    """
+
+    def __init__(self, directory=None, db_path=None, max_bytes=None, on_evict=None, in_use=None):
+        """
+        Args:
+            on_evict: Función opcional que recibe el nombre de cada fichero
+                expulsado (p. ej. para borrar sus miniaturas y limpiar el post)
+            in_use: Función opcional que devuelve el conjunto de URLs
+                /generated/... que algún post sigue usando
+        """
+        self.on_evict = on_evict
+        self.in_use = in_use
+        self.directory = Path(directory or IMAGE_STORE_CONFIG['dir'])
+        self.db_path = db_path or CACHE_CONFIG['path']
+        self.max_bytes = max_bytes if max_bytes is not None else IMAGE_STORE_CONFIG['max_bytes']
+        self.url_prefix = '/generated/'
+        self.evict_lock = threading.Lock()
+        self.init_database()
+
+    def get_connection(self):
+        """Crea una conexión a la base de datos de caché"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Crea las tablas del índice si no existen"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self.get_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS image_files (
+                content_hash TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS image_prompts (
+                prompt_hash TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (prompt_hash, provider)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_image_files_last_used ON image_files(last_used_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_image_prompts_content ON image_prompts(content_hash)')
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def prompt_hash(prompt):
+        return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+    def public_url(self, filename):
+        return f"{self.url_prefix}{filename}"
+
+    def lookup(self, prompt, provider=None):
+        """
+        Busca una imagen ya generada para el prompt
+
+        Sin proveedor devuelve la de cualquier proveedor (la usada más
+        recientemente). Devuelve la URL pública o None.
+        """
+        query = '''
+            SELECT f.content_hash, f.filename FROM image_prompts p
+            JOIN image_files f ON f.content_hash = p.content_hash
+            WHERE p.prompt_hash = ?
+        '''
+        params = [self.prompt_hash(prompt)]
+        if provider:
+            query += ' AND p.provider = ?'
+            params.append(provider)
+        query += ' ORDER BY f.last_used_at DESC LIMIT 1'
+
+        conn = self.get_connection()
+        try:
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            if not (self.directory / row['filename']).exists():
+                # El fichero se borró fuera del almacén: olvidar la entrada
+                self._forget(conn, row['content_hash'])
+                conn.commit()
+                return None
+            conn.execute('UPDATE image_files SET last_used_at = ? WHERE content_hash = ?',
+                         (time.time(), row['content_hash']))
+            conn.commit()
+        finally:
+            conn.close()
+        return self.public_url(row['filename'])
+
+    def save(self, prompt, provider, data):
+        """Guarda los bytes de una imagen y la asocia al prompt; devuelve su URL pública"""
+        content_hash = hashlib.sha256(data).hexdigest()
+        filename = f"{content_hash[:32]}.{detect_extension(data)}"
+        path = self.directory / filename
+        now = time.time()
+
+        if not path.exists():
+            # Escritura atómica: nunca se sirve un fichero a medio escribir
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        conn = self.get_connection()
+        try:
+            conn.execute('''
+                INSERT INTO image_files (content_hash, filename, size, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (content_hash) DO UPDATE SET last_used_at = excluded.last_used_at
+            ''', (content_hash, filename, len(data), now, now))
+            conn.execute('''
+                INSERT OR REPLACE INTO image_prompts (prompt_hash, provider, content_hash, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (self.prompt_hash(prompt), provider, content_hash, now))
+            conn.commit()
+        finally:
+            conn.close()
+
+        # El post todavía no apunta a la imagen recién guardada: no expulsarla
+        self.evict(keep=filename)
+        return self.public_url(filename)
+
+    def _forget(self, conn, content_hash):
+        conn.execute('DELETE FROM image_prompts WHERE content_hash = ?', (content_hash,))
+        conn.execute('DELETE FROM image_files WHERE content_hash = ?', (content_hash,))
+
+    @staticmethod
+    def filename_of(image_url):
+        """Nombre de fichero de una URL pública /generated/<nombre>"""
+        return image_url.rsplit('/', 1)[-1]
+
+    def evict(self, keep=None):
+        """Borra las imágenes menos usadas hasta quedar por debajo de max_bytes (salvo `keep`)"""
+        if not self.max_bytes:
+            return 0
+        removed = []
+        with self.evict_lock:
+            conn = self.get_connection()
+            try:
+                total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM image_files').fetchone()[0]
+                if total <= self.max_bytes:
+                    return 0
+                rows = conn.execute(
+                    'SELECT content_hash, filename, size FROM image_files ORDER BY last_used_at'
+                ).fetchall()
+                if self.in_use:
+                    # Primero las que no usa ningún post (orden LRU dentro de cada grupo)
+                    used = self.in_use()
+                    rows.sort(key=lambda row: self.public_url(row['filename']) in used)
+                for row in rows:
+                    if total <= self.max_bytes:
+                        break
+                    if row['filename'] == keep:
+                        continue
+                    (self.directory / row['filename']).unlink(missing_ok=True)
+                    self._forget(conn, row['content_hash'])
+                    total -= row['size']
+                    removed.append(row['filename'])
+                conn.commit()
+            finally:
+                conn.close()
+        if removed:
+            print(f"[INFO] Almacén de imágenes: expulsadas {len(removed)} imagen(es) por tamaño")
+            if self.on_evict:
+                for filename in removed:
+                    self.on_evict(filename)
+        return len(removed)
+
+    def stats(self):
+        """Número de ficheros, prompts indexados y bytes ocupados"""
+        conn = self.get_connection()
+        try:
+            files, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM image_files').fetchone()
+            prompts = conn.execute('SELECT COUNT(*) FROM image_prompts').fetchone()[0]
+        finally:
+            conn.close()
+        return {'files': files, 'prompts': prompts, 'bytes': size, 'max_bytes': self.max_bytes}
@@ -2,69 +2,439 @@
 Cliente MCP para comunicarse con el servidor Telegram MCP
 Ruta: src/agent/mcp_client.py
 """
+import asyncio
+import atexit
 import json
+import shlex
 import subprocess
 import shutil
 import os
 import time
 import threading
-from typing import Dict, List, Any, Optional
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
+import sys
 
-class MCPClient:
-    """Cliente para comunicarse con el servidor MCP de Telegram"""
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import MCP_CONFIG
+from src.agent.message_cursor import get_message_id
+
+
+class MCPError(RuntimeError):
+    """El servidor MCP devolvió un error JSON-RPC"""
+
+
+class MCPConnectionError(MCPError):
+    """El proceso del servidor MCP no está disponible o terminó"""
+
+
+class MCPTimeout(MCPError):
+    """El servidor MCP no respondió a tiempo"""
+
+
+class MCPServerSupervisor:
+    """
+    Proceso del servidor MCP de larga duración compartido por todo el agente
+
+    - Arranca el servidor una sola vez y completa el handshake `initialize`
+      de MCP en lugar de esperar un tiempo fijo
+    - Comprueba periódicamente que responde (`ping`) y lo reinicia con
+      backoff exponencial si muere o deja de responder
+    - Expone métricas de arranque, reinicios y salud
     
-    def __init__(self):
-        self.npx_path = shutil.which("npx")
-        if not self.npx_path:
-            raise RuntimeError("npx no está disponible. Instala Node.js primero.")
+    Un hilo lector dedicado reparte las respuestas por su `id` JSON-RPC, así
+    que puede haber muchas llamadas en vuelo a la vez, cada una con su
+    propio timeout y cancelación (API síncrona con Future y API asyncio).
+    """
+    
+    def __init__(self, command: Optional[str] = None):
+        self.command = shlex.split(command or MCP_CONFIG['command'])
+        self.startup_timeout = MCP_CONFIG['startup_timeout']
+        self.request_timeout = MCP_CONFIG['request_timeout']
+        self.health_interval = MCP_CONFIG['health_interval']
+        self.backoff_base = MCP_CONFIG['restart_backoff_base']
+        self.backoff_max = MCP_CONFIG['restart_backoff_max']
         
-        # Cargar variables de entorno
-        from dotenv import load_dotenv
-        load_dotenv()
+        self.process = None
+        self.server_info = None
+        # Se activa al completar el handshake; las llamadas esperan a que esté listo
+        self.ready = threading.Event()
+        self.start_lock = threading.RLock()
+        # Peticiones en vuelo: id JSON-RPC -> (Future, proceso al que se envió)
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.request_id = 0
+        self.consecutive_failures = 0
+        self.next_start_at = 0.0
+        self.stopping = threading.Event()
+        self.health_thread = None
+        self.metrics = {
+            'starts': 0,
+            'restarts': 0,
+            'failed_starts': 0,
+            'last_startup_seconds': None,
+            'total_startup_seconds': 0.0,
+            'health_checks': 0,
+            'health_failures': 0,
+            'started_at': None,
+            'last_error': None
+        }
+    
+    def is_running(self) -> bool:
+        process = self.process
+        return process is not None and process.poll() is None
+    
+    def is_ready(self) -> bool:
+        return self.ready.is_set() and self.is_running()
+    
+    def _spawn(self):
+        """Lanza el proceso y los hilos que leen su stdout y stderr"""
+        executable = shutil.which(self.command[0])
+        if not executable:
+            raise MCPConnectionError(f"{self.command[0]} no está disponible. Instala Node.js primero.")
         
-        self.app_id = os.getenv("TG_APP_ID")
-        self.api_hash = os.getenv("TG_API_HASH")
-        self.phone = os.getenv("TG_PHONE")
+        self.process = subprocess.Popen(
+            [executable] + self.command[1:],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            bufsize=1
+        )
+        threading.Thread(target=self._read_stdout, args=(self.process,),
+                         name='mcp-stdout', daemon=True).start()
+        threading.Thread(target=self._drain_stderr, args=(self.process,),
+                         name='mcp-stderr', daemon=True).start()
+    
+    def _read_stdout(self, process):
+        """
+        Lector dedicado: entrega cada respuesta JSON-RPC a la petición con su `id`
         
-        # Conexión persistente
-        self.process = None
-        self.process_lock = threading.Lock()
-        self.request_id = 1
+        Al cerrarse el proceso fallan todas las peticiones que seguían en vuelo.
+        """
+        for line in process.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"[DEBUG] Salida MCP no JSON: {line[:200]}")
+                continue
+            if not isinstance(message, dict):
+                continue
+            
+            if 'method' in message:
+                self._handle_server_message(process, message)
+                continue
+            
+            with self.pending_lock:
+                entry = self.pending.pop(message.get('id'), None)
+            if entry is None:
+                # Respuesta de una petición cancelada o expirada
+                continue
+            future = entry[0]
+            if future.done():
+                continue
+            if 'error' in message:
+                future.set_exception(MCPError(f"MCP Error: {message['error']}"))
+            else:
+                future.set_result(message.get('result'))
+        
+        self._fail_pending(process, MCPConnectionError("El servidor MCP terminó inesperadamente"))
+    
+    def _handle_server_message(self, process, message: Dict):
+        """Responde a las peticiones que inicia el servidor (ping); ignora notificaciones"""
+        if 'id' not in message:
+            return
+        if message['method'] == 'ping':
+            reply = {"jsonrpc": "2.0", "id": message['id'], "result": {}}
+        else:
+            reply = {"jsonrpc": "2.0", "id": message['id'],
+                     "error": {"code": -32601, "message": f"Método no soportado: {message['method']}"}}
+        try:
+            self._send(reply, process)
+        except MCPConnectionError:
+            pass
+    
+    def _fail_pending(self, process, error: Exception):
+        """Hace fallar las peticiones en vuelo enviadas a un proceso"""
+        with self.pending_lock:
+            failed = [request_id for request_id, (_, owner) in self.pending.items() if owner is process]
+            futures = [self.pending.pop(request_id)[0] for request_id in failed]
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
     
-    def _start_server(self):
-        """Inicia el servidor MCP si no está corriendo"""
-        if self.process is None or self.process.poll() is not None:
+    @staticmethod
+    def _drain_stderr(process):
+        """Consume stderr para que el proceso no se bloquee con el buffer lleno"""
+        for line in process.stderr:
+            if line.strip():
+                print(f"[DEBUG] MCP stderr: {line.rstrip()[:300]}")
+    
+    def _send(self, message: Dict, process=None):
+        process = process or self.process
+        try:
+            with self.write_lock:
+                process.stdin.write(json.dumps(message) + "\n")
+                process.stdin.flush()
+        except (OSError, ValueError, AttributeError) as e:
+            raise MCPConnectionError(f"No se pudo escribir al servidor MCP: {e}")
+    
+    def send_request(self, method: str, params: Optional[Dict] = None) -> Future:
+        """
+        Envía una petición JSON-RPC sin esperar la respuesta
+        
+        Returns:
+            Future que se completa cuando el lector recibe la respuesta con su id
+        """
+        ready = self.is_running() if method == "initialize" else self.is_ready()
+        process = self.process
+        if not ready or process is None:
+            raise MCPConnectionError("El servidor MCP no está en ejecución")
+        
+        future = Future()
+        with self.pending_lock:
+            self.request_id += 1
+            request_id = self.request_id
+            self.pending[request_id] = (future, process)
+        future.request_id = request_id
+        future.method = method
+        
+        try:
+            self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}}, process)
+        except MCPConnectionError:
+            with self.pending_lock:
+                self.pending.pop(request_id, None)
+            raise
+        return future
+    
+    def cancel(self, future: Future, reason: str = "cancelada por el cliente"):
+        """Cancela una petición en vuelo y avisa al servidor (notifications/cancelled)"""
+        with self.pending_lock:
+            entry = self.pending.pop(getattr(future, 'request_id', None), None)
+        future.cancel()
+        if entry is None:
+            return
+        try:
+            self._send({"jsonrpc": "2.0", "method": "notifications/cancelled",
+                        "params": {"requestId": future.request_id, "reason": reason}}, entry[1])
+        except MCPConnectionError:
+            pass
+    
+    def wait(self, future: Future, timeout: Optional[float] = None) -> Any:
+        """Espera la respuesta de una petición; si expira se cancela y lanza MCPTimeout"""
+        timeout = timeout or self.request_timeout
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            self.cancel(future, reason="timeout")
+            raise MCPTimeout(f"Sin respuesta a {future.method} tras {timeout}s")
+    
+    def _request(self, method: str, params: Optional[Dict] = None, timeout: Optional[float] = None) -> Any:
+        """Envía una petición JSON-RPC y espera su respuesta"""
+        return self.wait(self.send_request(method, params), timeout)
+    
+    def start(self):
+        """Arranca el servidor (si no está ya en marcha) y completa el handshake"""
+        with self.start_lock:
+            if self.is_ready():
+                return
+            self._stop_process()
+            
+            # Backoff tras arranques fallidos consecutivos
+            wait = self.next_start_at - time.monotonic()
+            if wait > 0:
+                print(f"[INFO] Esperando {wait:.0f}s antes de reiniciar el servidor MCP")
+                time.sleep(wait)
+            
+            started = time.monotonic()
             try:
-                self.process = subprocess.Popen(
-                    [self.npx_path, "-y", "@chaindead/telegram-mcp"],
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    bufsize=1
-                )
-                # Dar tiempo al servidor para inicializar
-                time.sleep(2)
+                self._spawn()
+                result = self._request("initialize", {
+                    "protocolVersion": MCP_CONFIG['protocol_version'],
+                    "capabilities": {},
+                    "clientInfo": {"name": "telegram-news-aggregator", "version": "1.0"}
+                }, timeout=self.startup_timeout)
+                self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+                self.ready.set()
             except Exception as e:
-                raise RuntimeError(f"Error iniciando servidor MCP: {str(e)}")
+                self._stop_process()
+                self.consecutive_failures += 1
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (self.consecutive_failures - 1)))
+                self.next_start_at = time.monotonic() + delay
+                self.metrics['failed_starts'] += 1
+                self.metrics['last_error'] = str(e)
+                raise MCPConnectionError(f"Error iniciando servidor MCP: {str(e)}")
+            
+            elapsed = time.monotonic() - started
+            self.server_info = (result or {}).get('serverInfo')
+            self.consecutive_failures = 0
+            self.next_start_at = 0.0
+            if self.metrics['starts']:
+                self.metrics['restarts'] += 1
+            self.metrics['starts'] += 1
+            self.metrics['last_startup_seconds'] = round(elapsed, 3)
+            self.metrics['total_startup_seconds'] += elapsed
+            self.metrics['started_at'] = time.time()
+            print(f"[INFO] Servidor MCP listo en {elapsed:.2f}s (pid {self.process.pid})")
+            
+            self._start_health_checks()
+    
+    def ensure_running(self):
+        if not self.is_ready():
+            self.start()
     
-    def _stop_server(self):
-        """Detiene el servidor MCP"""
-        if self.process:
+    def restart(self, reason: str):
+        """Reinicia el proceso del servidor"""
+        print(f"[WARNING] Reiniciando servidor MCP: {reason}")
+        with self.start_lock:
+            self.metrics['last_error'] = reason
+            self._stop_process()
+            self.start()
+    
+    def ping(self, timeout: float = 10) -> bool:
+        """True si el servidor responde al ping de MCP"""
+        self.metrics['health_checks'] += 1
+        try:
+            self._request("ping", timeout=timeout)
+            return True
+        except MCPConnectionError:
+            self.metrics['health_failures'] += 1
+            return False
+        except MCPTimeout:
+            self.metrics['health_failures'] += 1
+            return False
+        except MCPError:
+            # Un servidor que no implementa ping pero responde está vivo
+            return True
+    
+    def _start_health_checks(self):
+        if self.health_thread and self.health_thread.is_alive():
+            return
+        self.stopping.clear()
+        self.health_thread = threading.Thread(target=self._health_loop, name='mcp-health', daemon=True)
+        self.health_thread.start()
+    
+    def _health_loop(self):
+        while not self.stopping.wait(self.health_interval):
+            try:
+                if not self.is_running():
+                    self.restart("el proceso terminó")
+                elif not self.ping():
+                    self.restart("no responde al ping")
+            except Exception as e:
+                print(f"[ERROR] Error en la comprobación de salud del servidor MCP: {e}")
+    
+    def call_tool_async(self, tool_name: str, arguments: Optional[Dict[str, Any]] = None) -> Future:
+        """Lanza una llamada a una herramienta y devuelve su Future sin esperar"""
+        self.ensure_running()
+        return self.send_request("tools/call", {"name": tool_name, "arguments": arguments or {}})
+    
+    def call_tool(self, tool_name: str, arguments: Optional[Dict[str, Any]] = None,
+                  timeout: Optional[float] = None) -> Any:
+        """Llama a una herramienta del servidor (arrancándolo si hace falta)"""
+        return self.wait(self.call_tool_async(tool_name, arguments), timeout)
+    
+    async def acall_tool(self, tool_name: str, arguments: Optional[Dict[str, Any]] = None,
+                         timeout: Optional[float] = None) -> Any:
+        """Versión asyncio de call_tool; cancelar la tarea cancela la petición"""
+        loop = asyncio.get_running_loop()
+        # Arrancar el servidor puede tardar: no bloquear el bucle de eventos
+        await loop.run_in_executor(None, self.ensure_running)
+        future = self.send_request("tools/call", {"name": tool_name, "arguments": arguments or {}})
+        timeout = timeout or self.request_timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self.cancel(future, reason="timeout")
+            raise MCPTimeout(f"Sin respuesta a tools/call ({tool_name}) tras {timeout}s")
+        except asyncio.CancelledError:
+            self.cancel(future)
+            raise
+    
+    def _stop_process(self):
+        """Detiene el proceso actual"""
+        self.ready.clear()
+        process = self.process
+        if process:
+            self.process = None
             try:
-                self.process.terminate()
-                self.process.wait(timeout=5)
-            except:
+                process.terminate()
+                process.wait(timeout=5)
+            except Exception:
                 try:
-                    self.process.kill()
-                except:
+                    process.kill()
+                except Exception:
                     pass
-            self.process = None
+            self._fail_pending(process, MCPConnectionError("El servidor MCP se detuvo"))
+    
+    def stop(self):
+        """Detiene las comprobaciones de salud y el servidor"""
+        self.stopping.set()
+        with self.start_lock:
+            self._stop_process()
+    
+    def stats(self) -> Dict:
+        """Métricas del supervisor"""
+        stats = dict(self.metrics)
+        starts = stats.pop('total_startup_seconds')
+        stats['avg_startup_seconds'] = round(starts / stats['starts'], 3) if stats['starts'] else None
+        stats['running'] = self.is_running()
+        stats['pid'] = self.process.pid if self.is_running() else None
+        stats['uptime_seconds'] = round(time.time() - stats['started_at'], 1) \
+            if stats['running'] and stats['started_at'] else 0
+        stats['consecutive_failures'] = self.consecutive_failures
+        return stats
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def get_supervisor() -> MCPServerSupervisor:
+    """Devuelve el supervisor compartido por todo el proceso (se crea la primera vez)"""
+    global _supervisor
+    if _supervisor is None:
+        with _supervisor_lock:
+            if _supervisor is None:
+                _supervisor = MCPServerSupervisor()
+                atexit.register(_supervisor.stop)
+    return _supervisor
+
+
+def shutdown_supervisor():
+    """Detiene el servidor MCP compartido"""
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is not None:
+            _supervisor.stop()
+            _supervisor = None
+
+
+class MCPClient:
+    """Cliente para comunicarse con el servidor MCP de Telegram"""
+    
+    def __init__(self):
+        # Cargar variables de entorno (el servidor hereda TG_APP_ID, TG_API_HASH, TG_PHONE)
+        from dotenv import load_dotenv
+        load_dotenv()
+        
+        self.app_id = os.getenv("TG_APP_ID")
+        self.api_hash = os.getenv("TG_API_HASH")
+        self.phone = os.getenv("TG_PHONE")
+        
+        # Proceso del servidor compartido entre clientes y verificaciones
+        self.supervisor = get_supervisor()
     
     def call_tool(self, tool_name: str, arguments: Dict[str, Any] = None) -> Any:
         """
-        Llama a una herramienta MCP usando conexión persistente
+        Llama a una herramienta MCP usando el servidor compartido
         
         Args:
             tool_name: Nombre de la herramienta (tg_me, tg_dialogs, tg_dialog, etc.)
@@ -76,69 +446,26 @@ class MCPClient:
         if arguments is None:
             arguments = {}
         
-        with self.process_lock:
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    # Iniciar servidor si es necesario
-                    self._start_server()
-                    
-                    # Construir el comando MCP
-                    mcp_request = {
-                        "jsonrpc": "2.0",
-                        "id": self.request_id,
-                        "method": "tools/call",
-                        "params": {
-                            "name": tool_name,
-                            "arguments": arguments
-                        }
-                    }
-                    
-                    self.request_id += 1
-                    
-                    # Enviar el request
-                    request_json = json.dumps(mcp_request) + "\n"
-                    self.process.stdin.write(request_json)
-                    self.process.stdin.flush()
-                    
-                    # Leer respuesta con timeout
-                    response = None
-                    start_time = time.time()
-                    while time.time() - start_time < 30:  # 30 segundos timeout
-                        if self.process.poll() is not None:
-                            # Proceso terminó, reiniciar
-                            break
-                        
-                        line = self.process.stdout.readline()
-                        if line.strip():
-                            try:
-                                response = json.loads(line)
-                                break
-                            except json.JSONDecodeError:
-                                continue
-                    
-                    if response:
-                        if 'result' in response:
-                            return response['result']
-                        elif 'error' in response:
-                            raise RuntimeError(f"MCP Error: {response['error']}")
-                    
-                    # Si llegamos aquí, intentar reiniciar el servidor
-                    self._stop_server()
-                    if attempt < max_retries - 1:
-                        time.sleep(1)  # Esperar antes de reintentar
-                    
-                except Exception as e:
-                    self._stop_server()
-                    if attempt == max_retries - 1:
-                        raise RuntimeError(f"Error llamando a herramienta MCP después de {max_retries} intentos: {str(e)}")
-                    time.sleep(1)
-            
-            return None
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                return self.supervisor.call_tool(tool_name, arguments)
+            except MCPConnectionError as e:
+                # El proceso murió: el siguiente intento lo vuelve a arrancar
+                if attempt == max_retries - 1:
+                    raise RuntimeError(f"Error llamando a herramienta MCP después de {max_retries} intentos: {str(e)}")
+                print(f"[WARNING] Servidor MCP no disponible (intento {attempt + 1}/{max_retries}): {e}")
+        
+        return None
+    
+    def call_tool_async(self, tool_name: str, arguments: Dict[str, Any] = None) -> Future:
+        """Lanza una llamada sin esperar: varias pueden estar en vuelo a la vez"""
+        return self.supervisor.call_tool_async(tool_name, arguments or {})
     
-    def __del__(self):
-        """Destructor para asegurar que el servidor se detenga"""
-        self._stop_server()
+    async def acall_tool(self, tool_name: str, arguments: Dict[str, Any] = None,
+                         timeout: Optional[float] = None) -> Any:
+        """Versión asyncio de call_tool"""
+        return await self.supervisor.acall_tool(tool_name, arguments or {}, timeout=timeout)
     
     def get_me(self) -> Dict:
         """Obtiene información de la cuenta actual"""
@@ -152,19 +479,70 @@ class MCPClient:
         result = self.call_tool("tg_dialogs", args)
         return result if result else []
     
-    def get_dialog_messages(self, dialog_id: str, limit: int = 100) -> List[Dict]:
+    def list_dialogs(self, unread_only: bool = False) -> List[Dict]:
+        """Lista de diálogos ya parseada (dicts con name, title, unread...)"""
+        result = self.get_dialogs(unread_only)
+        if self.is_error_result(result):
+            raise RuntimeError(f"tg_dialogs devolvió un error: {result}")
+        return self.parse_content_list(result, 'dialogs')
+    
+    @staticmethod
+    def is_error_result(result: Any) -> bool:
+        return not result or (isinstance(result, dict) and bool(result.get('isError')))
+    
+    @staticmethod
+    def parse_content_list(result: Any, key: str) -> List[Dict]:
+        """Extrae la lista `key` ('messages', 'dialogs'...) de la respuesta de una herramienta"""
+        # Parsear la respuesta: muchas respuestas vienen como dict {'content': [{ 'text': '<json>' }, ...]}
+        try:
+            if isinstance(result, dict) and 'content' in result:
+                # Buscar primer elemento de tipo text que contenga JSON con la clave buscada
+                for item in result['content']:
+                    if item.get('type') == 'text' and item.get('text'):
+                        text = item.get('text')
+                        try:
+                            data = json.loads(text)
+                            if isinstance(data, dict) and key in data:
+                                return data[key] or []
+                        except Exception:
+                            # no JSON, puede ser un error en texto
+                            continue
+                # Si no encontramos JSON con la clave, devolver empty list
+                return []
+
+            # Si el resultado ya es una lista, devolverla
+            if isinstance(result, list):
+                return result
+
+            return []
+        except Exception as e:
+            print(f"[ERROR] Error parseando respuesta MCP ({key}): {e}")
+            return []
+    
+    @classmethod
+    def parse_dialog_messages(cls, result: Any) -> List[Dict]:
+        """Extrae la lista de mensajes de una respuesta de tg_dialog"""
+        return cls.parse_content_list(result, 'messages')
+    
+    def get_dialog_messages(self, dialog_id: str, limit: int = 100, offset: Optional[int] = None) -> List[Dict]:
         """
         Obtiene mensajes de un diálogo específico
         
         Args:
             dialog_id: ID del diálogo (ej: "chat-123456" o "@username")
             limit: Número máximo de mensajes a obtener
+            offset: Si se indica, sólo mensajes con id menor (página anterior)
+        
+        Raises:
+            MCPError si el servidor no devuelve la página con ninguna de las variantes
         """
-        print(f"[INFO] Obteniendo mensajes del diálogo: {dialog_id} (limit={limit})...")
+        print(f"[INFO] Obteniendo mensajes del diálogo: {dialog_id} (limit={limit}, offset={offset})...")
 
-        # El servidor Go espera HistoryArguments{Name: ...}
+        # El servidor Go espera HistoryArguments{Name: ..., Offset: ...}
         # Intentamos primero con la clave 'dialogId' (formato: cht[...], chn[...] o username)
         args = {"dialogId": dialog_id, "limit": limit}
+        if offset:
+            args["offset"] = offset
         result = None
 
         try:
@@ -173,39 +551,65 @@ class MCPClient:
             print(f"[DEBUG] Error llamando tg_dialog con 'dialogId': {e}")
 
         # Si falla o el servidor responde con isError, intentar fallback con 'name'
-        if not result or (isinstance(result, dict) and result.get('isError')):
+        if self.is_error_result(result):
             try:
                 print("[DEBUG] Intentando tg_dialog con clave 'name' como fallback")
-                result = self.call_tool("tg_dialog", {"name": dialog_id, "limit": limit})
+                args["name"] = args.pop("dialogId")
+                result = self.call_tool("tg_dialog", args)
             except Exception as e:
                 print(f"[DEBUG] Error llamando tg_dialog con 'name': {e}")
-                return []
+                raise MCPError(f"No se pudieron obtener los mensajes de {dialog_id}: {e}")
+            if self.is_error_result(result):
+                raise MCPError(f"tg_dialog devolvió un error para {dialog_id}")
 
-        # Parsear la respuesta: muchas respuestas vienen como dict {'content': [{ 'text': '<json>' }, ...]}
-        try:
-            if isinstance(result, dict) and 'content' in result:
-                # Buscar primer elemento de tipo text que contenga JSON con key 'messages'
-                for item in result['content']:
-                    if item.get('type') == 'text' and item.get('text'):
-                        text = item.get('text')
-                        try:
-                            data = json.loads(text)
-                            if isinstance(data, dict) and 'messages' in data:
-                                return data['messages']
-                        except Exception:
-                            # no JSON, puede ser un error en texto
-                            continue
-                # Si no encontramos JSON con messages, devolver empty list
-                return []
-
-            # Si el resultado ya es una lista, devolverla
-            if isinstance(result, list):
-                return result
-
-            return []
-        except Exception as e:
-            print(f"[ERROR] Error parseando respuesta de tg_dialog: {e}")
-            return []
+        return self.parse_dialog_messages(result)
+    
+    def get_new_messages(self, dialog_id: str, after_id: Optional[int] = None,
+                         page_size: int = 50, max_pages: int = 20,
+                         before_id: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Obtiene sólo los mensajes posteriores a `after_id`, del más antiguo al más reciente
+        
+        tg_dialog devuelve el historial desde el final hacia atrás, así que se
+        piden páginas de `page_size` con `offset` = id más antiguo recibido
+        hasta llegar al cursor (o a `max_pages`). Sin cursor se lee una página.
+        Con `before_id` se empieza por los mensajes anteriores a ese id.
+        
+        Returns:
+            Tupla (mensajes, id desde el que seguir): el segundo valor es None
+            si se llegó al cursor, o el id más antiguo leído si se agotó
+            `max_pages` y quedan mensajes anteriores por leer
+        
+        Raises:
+            MCPError si falla alguna página (no se devuelve una lectura a medias)
+        """
+        collected = {}
+        unnumbered = []
+        offset = before_id
+        resume_before = None
+        for page in range(max_pages):
+            messages = self.get_dialog_messages(dialog_id, limit=page_size, offset=offset)
+            ids = []
+            for message in messages:
+                message_id = get_message_id(message)
+                if message_id is None:
+                    # Sin id no se puede paginar: procesarlo tal cual
+                    unnumbered.append(message)
+                    continue
+                ids.append(message_id)
+                if after_id is None or message_id > after_id:
+                    collected[message_id] = message
+            
+            if after_id is None or not ids or len(messages) < page_size or min(ids) <= after_id:
+                break
+            if page == max_pages - 1:
+                resume_before = min(ids)
+                print(f"[WARNING] {dialog_id}: más de {max_pages * page_size} mensajes nuevos, "
+                      f"los anteriores al id {resume_before} se leerán en la próxima verificación")
+                break
+            offset = min(ids)
+        
+        return unnumbered + [collected[message_id] for message_id in sorted(collected)], resume_before
     
     def send_message(self, dialog_id: str, message: str) -> Dict:
         """Envía un mensaje a un diálogo"""
@@ -0,0 +1,103 @@
+"""
+Cursor por diálogo con el último mensaje de Telegram procesado
+Ruta: src/agent/message_cursor.py
+"""
+import json
+import os
+import tempfile
+import threading
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import TELEGRAM_CONFIG
+
+
+def get_message_id(message):
+    """ID numérico de un mensaje de Telegram (None si no lo tiene)"""
+    if not isinstance(message, dict):
+        return None
+    try:
+        return int(message.get('id'))
+    except (TypeError, ValueError):
+        return None
+
+
+class MessageCursorStore:
+    """
+    Fichero JSON {dialog_id: último id de mensaje procesado}
+
+    Permite pedir al servidor MCP sólo los mensajes posteriores al cursor
+    en lugar de descargar siempre los últimos N y filtrarlos por fecha.
+
+    Si una lectura agota las páginas antes de llegar al cursor, el cursor
+    avanza igualmente y el tramo sin leer se guarda como hueco (low, high):
+    mensajes con low < id < high que se leen en las próximas verificaciones.
+    Los huecos se guardan bajo la clave GAPS_KEY del mismo fichero.
+    """
+
+    GAPS_KEY = '_gaps'
+
+    def __init__(self, path=None):
+        self.path = Path(path or TELEGRAM_CONFIG['cursor_file'])
+        self.lock = threading.Lock()
+        self.gaps = {}
+        self.cursors = self.load()
+
+    def load(self):
+        """Lee los cursores guardados (vacío si el fichero no existe o está dañado)"""
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            gaps = data.pop(self.GAPS_KEY, {})
+            cursors = {str(key): int(value) for key, value in data.items()}
+            self.gaps = {str(key): [(int(low), int(high)) for low, high in value] for key, value in gaps.items()}
+            return cursors
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"[WARNING] No se pudieron leer los cursores de mensajes: {e}")
+            return {}
+
+    def get(self, dialog_id):
+        """Último id procesado del diálogo o None si nunca se ha leído"""
+        with self.lock:
+            return self.cursors.get(dialog_id)
+
+    def set(self, dialog_id, message_id):
+        """Avanza el cursor del diálogo (nunca retrocede) y lo guarda en disco"""
+        with self.lock:
+            current = self.cursors.get(dialog_id)
+            if current is not None and message_id <= current:
+                return
+            self.cursors[dialog_id] = message_id
+            self.save()
+
+    def get_gaps(self, dialog_id):
+        """Tramos (low, high) de mensajes del diálogo que quedan por leer"""
+        with self.lock:
+            return list(self.gaps.get(dialog_id, []))
+
+    def set_gaps(self, dialog_id, gaps):
+        """Sustituye los tramos pendientes del diálogo y los guarda si cambiaron"""
+        gaps = [(low, high) for low, high in gaps if high - low > 1]
+        with self.lock:
+            if gaps == self.gaps.get(dialog_id, []):
+                return
+            if gaps:
+                self.gaps[dialog_id] = gaps
+            else:
+                self.gaps.pop(dialog_id, None)
+            self.save()
+
+    def save(self):
+        # Escritura atómica: un corte a mitad no deja el fichero dañado
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = dict(self.cursors)
+        if self.gaps:
+            data[self.GAPS_KEY] = {key: [list(gap) for gap in value] for key, value in self.gaps.items()}
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
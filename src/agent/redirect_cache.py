@@ -0,0 +1,135 @@
+"""
+Resolución de enlaces acortados con caché persistente de redirecciones
+Ruta: src/agent/redirect_cache.py
+"""
+import sqlite3
+import time
+from urllib.parse import urlsplit
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import CACHE_CONFIG, REDIRECT_CONFIG, SCRAPING_CONFIG
+from src.agent.http_client import get_session
+
+
+class RedirectCache:
+    """
+    Mapea URLs cortas (t.co, bit.ly, ...) a su URL final
+
+    La URL final se guarda tal cual la devuelve el servidor (no canónica):
+    es la que después se descarga.
+
+    Las resoluciones se guardan en la base de datos de caché con un TTL, de
+    modo que un mismo enlace corto sólo recorre su cadena de redirecciones
+    una vez y la deduplicación puede hacerse antes de descargar la página.
+    """
+
+    def __init__(self, db_path=None, ttl=None, shorteners=None):
+        self.db_path = db_path or CACHE_CONFIG['path']
+        self.ttl = ttl if ttl is not None else REDIRECT_CONFIG['ttl']
+        self.shorteners = set(shorteners if shorteners is not None else REDIRECT_CONFIG['shorteners'])
+        self.timeout = SCRAPING_CONFIG['timeout']
+        self.headers = {'User-Agent': SCRAPING_CONFIG['user_agent']}
+        self.session = get_session()
+        self.init_database()
+
+    def get_connection(self):
+        """Crea una conexión a la base de datos de caché"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Crea la tabla de redirecciones si no existe"""
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self.get_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS redirects (
+                short_url TEXT PRIMARY KEY,
+                final_url TEXT NOT NULL,
+                resolved_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def is_short_url(self, url):
+        """True si la URL pertenece a un acortador conocido"""
+        host = (urlsplit(url).hostname or '').lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        return host in self.shorteners
+
+    def get(self, url):
+        """Devuelve la URL final cacheada o None si no existe o caducó"""
+        conn = self.get_connection()
+        try:
+            row = conn.execute(
+                'SELECT final_url, resolved_at FROM redirects WHERE short_url = ?', (url,)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        if row is None or time.time() - row['resolved_at'] > self.ttl:
+            return None
+        return row['final_url']
+
+    def store(self, url, final_url):
+        """Guarda la resolución url -> final_url"""
+        if url == final_url:
+            return
+        conn = self.get_connection()
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO redirects (short_url, final_url, resolved_at)
+                VALUES (?, ?, ?)
+            ''', (url, final_url, time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def follow(self, url):
+        """Recorre la cadena de redirecciones sin descargar el cuerpo de la página"""
+        response = self.session.head(url, headers=self.headers, timeout=self.timeout, allow_redirects=True)
+        if response.status_code >= 400:
+            # Algunos acortadores no aceptan HEAD (405): GET en streaming y cerrar sin leer
+            response = self.session.get(url, headers=self.headers, timeout=self.timeout,
+                                        allow_redirects=True, stream=True)
+            response.close()
+        response.raise_for_status()
+        return response.url
+
+    def resolve(self, url):
+        """
+        Devuelve la URL final de un enlace
+
+        Consulta primero la caché; sólo los dominios acortadores se resuelven
+        por red. Si la resolución falla se devuelve la URL original.
+        """
+        cached = self.get(url)
+        if cached:
+            return cached
+        if not self.is_short_url(url):
+            return url
+
+        try:
+            final_url = self.follow(url)
+        except Exception as e:
+            print(f"[WARNING] No se pudo resolver el enlace corto {url}: {str(e)}")
+            return url
+
+        print(f"[INFO] Enlace corto resuelto: {url} -> {final_url}")
+        self.store(url, final_url)
+        return final_url
+
+    def purge_expired(self):
+        """Elimina las resoluciones caducadas"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute('DELETE FROM redirects WHERE resolved_at < ?', (time.time() - self.ttl,))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
@@ -0,0 +1,172 @@
+"""
+Caché persistente de respuestas HTTP con peticiones condicionales
+Ruta: src/agent/response_cache.py
+"""
+import json
+import sqlite3
+import threading
+import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import CACHE_CONFIG
+from src.agent.url_utils import canonicalize_url
+
+
+class ResponseCache:
+    """
+    Guarda ETag, Last-Modified y los metadatos extraídos de cada URL
+
+    Al volver a procesar una URL se envían If-None-Match / If-Modified-Since;
+    si el servidor responde 304 se reutiliza la extracción guardada sin
+    descargar ni parsear la página.
+    """
+
+    def __init__(self, db_path=None, ttl=None, max_entries=None):
+        self.db_path = db_path or CACHE_CONFIG['path']
+        self.ttl = ttl if ttl is not None else CACHE_CONFIG['ttl']
+        self.max_entries = max_entries if max_entries is not None else CACHE_CONFIG['max_entries']
+        self.stats_lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self.init_database()
+
+    def get_connection(self):
+        """Crea una conexión a la base de datos de caché"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Crea la tabla de caché si no existe"""
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self.get_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                metadata TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_http_cache_access ON http_cache(last_access)')
+        conn.commit()
+        conn.close()
+
+    def _count(self, counter, amount=1):
+        with self.stats_lock:
+            self.counters[counter] += amount
+
+    def get(self, url):
+        """Devuelve la entrada vigente de una URL o None"""
+        key = canonicalize_url(url)
+        now = time.time()
+        conn = self.get_connection()
+        try:
+            row = conn.execute('SELECT * FROM http_cache WHERE url = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row['stored_at'] > self.ttl:
+                conn.execute('DELETE FROM http_cache WHERE url = ?', (key,))
+                conn.commit()
+                self._count('evictions')
+                return None
+
+            conn.execute('UPDATE http_cache SET last_access = ? WHERE url = ?', (now, key))
+            conn.commit()
+            entry = dict(row)
+            entry['metadata'] = json.loads(entry['metadata'])
+            return entry
+        finally:
+            conn.close()
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Cabeceras de revalidación para una entrada cacheada"""
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record_hit(self):
+        """Registra una revalidación con 304"""
+        self._count('hits')
+
+    def record_miss(self):
+        """Registra una URL que hubo que descargar y extraer de nuevo"""
+        self._count('misses')
+
+    def store(self, url, response_headers, metadata):
+        """Guarda los validadores de la respuesta y los metadatos extraídos"""
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        if not etag and not last_modified:
+            # Sin validadores no hay forma de revalidar
+            return False
+
+        now = time.time()
+        conn = self.get_connection()
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO http_cache (url, etag, last_modified, metadata, stored_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (canonicalize_url(url), etag, last_modified, json.dumps(metadata, ensure_ascii=False), now, now))
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._count('stores')
+        self.evict()
+        return True
+
+    def touch(self, url):
+        """Renueva el tiempo de vida de una entrada tras un 304"""
+        conn = self.get_connection()
+        try:
+            conn.execute('UPDATE http_cache SET stored_at = ? WHERE url = ?', (time.time(), canonicalize_url(url)))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def evict(self):
+        """Elimina entradas caducadas y las menos usadas si se supera max_entries"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute('DELETE FROM http_cache WHERE stored_at < ?', (time.time() - self.ttl,))
+            removed = cursor.rowcount
+
+            total = conn.execute('SELECT COUNT(*) FROM http_cache').fetchone()[0]
+            if total > self.max_entries:
+                cursor = conn.execute('''
+                    DELETE FROM http_cache WHERE url IN (
+                        SELECT url FROM http_cache ORDER BY last_access ASC LIMIT ?
+                    )
+                ''', (total - self.max_entries,))
+                removed += cursor.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+
+        if removed:
+            self._count('evictions', removed)
+        return removed
+
+    def stats(self):
+        """Contadores de aciertos/fallos y tamaño actual de la caché"""
+        conn = self.get_connection()
+        try:
+            entries = conn.execute('SELECT COUNT(*) FROM http_cache').fetchone()[0]
+        finally:
+            conn.close()
+
+        with self.stats_lock:
+            stats = dict(self.counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['entries'] = entries
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
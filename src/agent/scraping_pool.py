@@ -0,0 +1,107 @@
+"""
+Pool concurrente para descargar y procesar URLs
+Ruta: src/agent/scraping_pool.py
+"""
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+
+class ScrapingPool:
+    """
+    Ejecuta trabajos de scraping en paralelo con un límite global de hilos
+    y un límite de peticiones simultáneas por host.
+
+    Los trabajos de un host saturado (o sin turno en el planificador de
+    descargas) esperan en su cola sin ocupar hilos, de modo que el resto de
+    dominios sigue avanzando.
+    """
+
+    def __init__(self, worker, max_workers=8, per_host_limit=2, scheduler=None):
+        """
+        Args:
+            worker: Función que recibe (url, *args) y procesa una URL
+            max_workers: Número máximo de URLs procesándose a la vez
+            per_host_limit: Número máximo de URLs del mismo host a la vez
+            scheduler: FetchScheduler opcional para no lanzar trabajos de
+                dominios que todavía no tienen turno
+        """
+        self.worker = worker
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.scheduler = scheduler
+
+    @staticmethod
+    def get_host(url):
+        """Obtiene el host de una URL normalizado para agrupar trabajos"""
+        host = urlparse(url).netloc.lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        return host
+
+    def run(self, jobs, worker=None):
+        """
+        Procesa una lista de trabajos y espera a que terminen todos
+
+        Args:
+            jobs: Lista de tuplas (url, *args) que se pasan al worker
+            worker: Función alternativa al worker del pool para esta ejecución
+
+        Returns:
+            Lista de resultados en el mismo orden que los trabajos
+            (None si el trabajo lanzó una excepción)
+        """
+        worker = worker or self.worker
+        results = [None] * len(jobs)
+        if not jobs:
+            return results
+
+        # Colas por host manteniendo el orden de llegada
+        queues = OrderedDict()
+        for index, job in enumerate(jobs):
+            queues.setdefault(self.get_host(job[0]), deque()).append(index)
+
+        running_per_host = {host: 0 for host in queues}
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while queues or in_flight:
+                # Lanzar trabajos en round-robin entre hosts con capacidad libre
+                next_ready = None
+                launched = True
+                while launched and len(in_flight) < self.max_workers:
+                    launched = False
+                    for host in list(queues):
+                        if len(in_flight) >= self.max_workers:
+                            break
+                        if running_per_host[host] >= self.per_host_limit:
+                            continue
+                        if self.scheduler:
+                            delay = self.scheduler.ready_in(jobs[queues[host][0]][0])
+                            if delay > 0:
+                                next_ready = delay if next_ready is None else min(next_ready, delay)
+                                continue
+                        index = queues[host].popleft()
+                        if not queues[host]:
+                            del queues[host]
+                        future = executor.submit(worker, *jobs[index])
+                        in_flight[future] = (index, host)
+                        running_per_host[host] += 1
+                        launched = True
+
+                if not in_flight:
+                    # Ningún dominio tiene turno todavía: esperar al primero que lo tenga
+                    time.sleep(next_ready or 0.05)
+                    continue
+
+                done, _ = wait(list(in_flight), timeout=next_ready, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, host = in_flight.pop(future)
+                    running_per_host[host] -= 1
+                    try:
+                        results[index] = future.result()
+                    except Exception as e:
+                        print(f"[ERROR] Error procesando URL {jobs[index][0]}: {str(e)}")
+
+        return results
@@ -3,9 +3,10 @@ Agente principal para monitorear y procesar mensajes de Telegram
 Ruta: src/agent/telegram_agent.py
 """
 import re
+import threading
 import time
-import json
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 import sys
@@ -13,21 +14,67 @@ import sys
 # Agregar el directorio raíz al path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
-from config import TELEGRAM_CONFIG, DATABASE_CONFIG
+from config import TELEGRAM_CONFIG, DATABASE_CONFIG, SCRAPING_CONFIG, IMAGE_QUEUE_CONFIG, IMAGE_MIRROR_CONFIG
 from src.agent.content_processor import ContentProcessor
+from src.agent.fetch_scheduler import FetchThrottled
+from src.agent.scraping_pool import ScrapingPool
+from src.agent.http_client import get_session
+from src.agent.url_utils import canonicalize_url, trim_trailing_punctuation, SeenUrlIndex
+from src.agent.redirect_cache import RedirectCache
+from src.agent.image_queue import ImageJobQueue, ImageWorkerPool
+from src.agent.image_mirror import ImageMirror
+from src.agent.message_cursor import MessageCursorStore, get_message_id
+from src.agent.dialog_scheduler import DialogScheduler, parse_dialogs
+from src.agent.change_detector import DialogChangeDetector
 from src.backend.database import Database
+from src.backend.agent_metrics import write_metrics
 
 
 class TelegramAgent:
     """Agente para monitorear grupos de Telegram y procesar URLs"""
     
     def __init__(self):
-        self.group_name = TELEGRAM_CONFIG['group_name']
         self.check_interval = TELEGRAM_CONFIG['check_interval']
+        # Diálogos vigilados, cada uno con su intervalo y prioridad
+        self.dialog_scheduler = DialogScheduler(parse_dialogs(
+            TELEGRAM_CONFIG['dialogs'] or TELEGRAM_CONFIG['group_name'], self.check_interval
+        ))
         self.last_check_file = Path(TELEGRAM_CONFIG['last_check_file'])
-        self.content_processor = ContentProcessor()
+        # Último mensaje procesado por diálogo: sólo se piden los posteriores
+        self.cursors = MessageCursorStore()
+        # Consulta de actividad previa: sólo se lee el historial de los diálogos con cambios
+        self.change_detector = DialogChangeDetector()
         self.db = Database()
+        self.content_processor = ContentProcessor(db=self.db)
+        # Índice de URLs canónicas ya guardadas: evita volver a descargarlas
+        self.seen_urls = SeenUrlIndex()
+        self.seen_urls.warm(self.db)
+        # URLs aplazadas por el límite de peticiones de su dominio (se reintentan en la próxima verificación)
+        self.deferred_jobs = []
+        self.deferred_lock = threading.Lock()
+        # Caché de enlaces cortos (t.co, bit.ly...) -> URL final
+        self.redirect_cache = RedirectCache()
+        self.redirect_cache.purge_expired()
         self.backend_url = "http://localhost:5000/api/posts"
+        # Sesión compartida: las llamadas al backend reutilizan la conexión local
+        self.session = get_session()
+        # Cliente MCP: se crea en la primera verificación y comparte el servidor supervisado
+        self.mcp = None
+        self.scraping_pool = ScrapingPool(
+            self.process_url_job,
+            max_workers=SCRAPING_CONFIG['max_workers'],
+            per_host_limit=SCRAPING_CONFIG['per_host_limit'],
+            scheduler=self.content_processor.scheduler
+        )
+        # Imágenes generadas en segundo plano: los posts se guardan sin esperar a la API
+        self.image_workers = None
+        if IMAGE_QUEUE_CONFIG['enabled']:
+            self.content_processor.defer_images = True
+            self.image_workers = ImageWorkerPool(
+                ImageJobQueue(),
+                handlers={'generate': self.generate_post_image, 'mirror': self.mirror_post_image},
+                on_result=self.update_post_image
+            )
         
         # Expresión regular para detectar URLs
         self.url_pattern = re.compile(
@@ -48,100 +95,120 @@ class TelegramAgent:
             f.write(timestamp)
     
     def extract_urls(self, text):
-        """Extrae todas las URLs de un texto"""
+        """Extrae todas las URLs de un texto (sin la puntuación final del mensaje)"""
         if not text:
             return []
-        return self.url_pattern.findall(text)
+        return [url for url in (trim_trailing_punctuation(url) for url in self.url_pattern.findall(text)) if url]
+    
+    @staticmethod
+    def url_key(url):
+        """Clave de deduplicación de una URL (su forma canónica)"""
+        try:
+            return canonicalize_url(url)
+        except ValueError:
+            return url
+    
+    def unique_urls(self, urls):
+        """
+        Elimina las URLs repetidas (misma forma canónica) manteniendo el orden
+        
+        Se devuelven las URLs tal cual aparecen en el mensaje: son las que se
+        descargan; la forma canónica sólo se usa como clave.
+        """
+        unique = []
+        keys = set()
+        for url in urls:
+            try:
+                key = canonicalize_url(url)
+            except ValueError as e:
+                print(f"[WARNING] URL no válida {url}: {e}")
+                continue
+            if key not in keys:
+                keys.add(key)
+                unique.append(url)
+        return unique
+    
+    def get_mcp(self):
+        """Cliente MCP (se crea la primera vez y comparte el servidor supervisado)"""
+        if self.mcp is None:
+            from src.agent.mcp_client import MCPClient
+            self.mcp = MCPClient()
+        return self.mcp
     
-    def get_telegram_messages(self):
-        """Obtiene mensajes del grupo de Telegram usando las herramientas MCP"""
-        print(f"[INFO] Obteniendo mensajes del grupo: {self.group_name}")
+    def get_telegram_messages(self, dialog_id, after_id=None, before_id=None):
+        """
+        Obtiene los mensajes de un diálogo posteriores a `after_id` usando las herramientas MCP
+        
+        Returns:
+            Tupla (mensajes, id desde el que seguir si quedaron mensajes sin leer o None)
+        """
+        print(f"[INFO] Obteniendo mensajes del diálogo: {dialog_id}")
+        if after_id is not None:
+            print(f"[INFO] Último mensaje procesado en {dialog_id}: {after_id}")
         
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                from src.agent.mcp_client import MCPClient
-                mcp = MCPClient()
-                
-                # Obtener mensajes del diálogo
-                messages = mcp.get_dialog_messages(dialog_id=self.group_name, limit=50)
+                # Sólo los mensajes nuevos, paginando hasta alcanzar el cursor
+                messages, resume_before = self.get_mcp().get_new_messages(
+                    dialog_id, after_id,
+                    page_size=TELEGRAM_CONFIG['page_size'],
+                    max_pages=TELEGRAM_CONFIG['max_pages'],
+                    before_id=before_id
+                )
 
                 if not messages:
-                    print(f"[INFO] No se recibieron mensajes (respuesta vacía)")
-                    return []
-
-                # Si la librería devolvía una lista de dicts (messages ya parseados), OK
-                if isinstance(messages, list):
-                    print(f"[INFO] Obtenidos {len(messages)} mensajes (lista)")
-                    print(f"[DEBUG] Primer mensaje: {messages[0] if messages else 'None'}")
-                    return messages
+                    print(f"[INFO] No se recibieron mensajes de {dialog_id} (respuesta vacía)")
+                    return [], resume_before
 
-                # Si por alguna razón viene un dict (compatibilidad), intentar extraer
-                if isinstance(messages, dict):
-                    print("[DEBUG] Respuesta tipo dict recibida, intentando extraer 'messages'...")
-                    # Buscar contenido de mensajes en keys conocidas
-                    if 'messages' in messages:
-                        return messages['messages']
-                    # Fallback: buscar 'content' -> text JSON
-                    content = messages.get('content')
-                    if content and isinstance(content, list):
-                        for item in content:
-                            if item.get('type') == 'text' and item.get('text'):
-                                try:
-                                    parsed = json.loads(item.get('text'))
-                                    if isinstance(parsed, dict) and 'messages' in parsed:
-                                        return parsed['messages']
-                                except Exception:
-                                    continue
-                    return []
-                
-                return messages
+                print(f"[INFO] Obtenidos {len(messages)} mensajes de {dialog_id}")
+                print(f"[DEBUG] Primer mensaje: {messages[0]}")
+                return messages, resume_before
                 
             except Exception as e:
-                print(f"[ERROR] Error obteniendo mensajes (intento {attempt + 1}/{max_retries}): {str(e)}")
+                print(f"[ERROR] Error obteniendo mensajes de {dialog_id} (intento {attempt + 1}/{max_retries}): {str(e)}")
                 if attempt < max_retries - 1:
                     print(f"[INFO] Reintentando en 5 segundos...")
                     time.sleep(5)
                 else:
-                    print(f"[ERROR] Fallaron todos los intentos, retornando lista vacía")
-                    return []
+                    print(f"[ERROR] Fallaron todos los intentos para {dialog_id}")
+                    raise
     
-    def process_message(self, message):
-        """Procesa un mensaje individual buscando URLs"""
-        # Si el mensaje es un string, extraer URLs directamente del texto
-        if isinstance(message, str):
-            text = message
-            urls = self.extract_urls(text)
-            
-            if not urls:
-                return
-            
-            print(f"[INFO] Encontradas {len(urls)} URL(s) en mensaje de texto")
-            
-            for url in urls:
-                try:
-                    print(f"[INFO] Procesando URL: {url}")
-                    post_data = self.content_processor.process_url(url, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-                    
-                    if post_data:
-                        self.save_post(post_data)
-                        print(f"[SUCCESS] Post guardado: {post_data['title']}")
-                    else:
-                        print(f"[WARNING] No se pudo procesar la URL: {url}")
-                        
-                except Exception as e:
-                    print(f"[ERROR] Error procesando URL {url}: {str(e)}")
-            return
+    def fetch_dialog(self, dialog_id, last_check_dt):
+        """
+        Lee los mensajes nuevos de un diálogo (y los tramos pendientes) y extrae sus trabajos de URL
         
-        # Si es un diccionario, procesar normalmente
-        text = message.get('text', '')
-        urls = self.extract_urls(text)
+        Si alguna página falla se lanza la excepción y el cursor no se mueve.
         
-        if not urls:
-            return
+        Returns:
+            Tupla (mensajes nuevos, trabajos (url, fecha), id del último mensaje
+            recibido, tramos (low, high) que siguen sin leer)
+        """
+        after_id = self.cursors.get(dialog_id)
+        # Con cursor el servidor ya sólo devuelve mensajes nuevos; sin él se filtra por fecha
+        if after_id is not None:
+            last_check_dt = None
         
-        print(f"[INFO] Encontradas {len(urls)} URL(s) en mensaje {message.get('id', 'N/A')}")
-        print(f"[DEBUG] Mensaje completo: {message}")
+        received, resume_before = self.get_telegram_messages(dialog_id, after_id)
+        gaps = [(after_id, resume_before)] if after_id is not None and resume_before is not None else []
+        # Continuar los tramos que una lectura anterior dejó sin leer por max_pages
+        for low, high in self.cursors.get_gaps(dialog_id):
+            older, resume_before = self.get_telegram_messages(dialog_id, low, before_id=high)
+            received = older + received
+            if resume_before is not None:
+                gaps.append((low, resume_before))
+        
+        message_ids = [message_id for message_id in map(get_message_id, received) if message_id is not None]
+        messages = [message for message in received if self.should_process_message(message, last_check_dt)]
+        jobs = []
+        for message in messages:
+            jobs.extend(self.collect_url_jobs(message))
+        return messages, jobs, max(message_ids, default=None), gaps
+    
+    def get_message_date(self, message):
+        """Obtiene la fecha de un mensaje como string 'YYYY-MM-DD HH:MM:SS'"""
+        if isinstance(message, str):
+            return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
         # Fecha del mensaje de Telegram (string 'YYYY-MM-DD HH:MM:SS' esperado)
         message_timestamp = message.get('when')
@@ -149,32 +216,157 @@ class TelegramAgent:
         if message_timestamp:
             try:
                 message_dt = datetime.strptime(message_timestamp, '%Y-%m-%d %H:%M:%S')
-                message_date = message_dt.strftime('%Y-%m-%d %H:%M:%S')
+                return message_dt.strftime('%Y-%m-%d %H:%M:%S')
             except (ValueError, TypeError) as e:
                 print(f"[WARNING] Error convirtiendo timestamp {message_timestamp}: {e}")
-                message_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        print(f"[WARNING] No se encontró 'when' en el mensaje")
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    def collect_url_jobs(self, message):
+        """Extrae de un mensaje la lista de trabajos (url, fecha) a procesar"""
+        # Si el mensaje es un string, extraer URLs directamente del texto
+        if isinstance(message, str):
+            urls = self.extract_urls(message)
+            if urls:
+                print(f"[INFO] Encontradas {len(urls)} URL(s) en mensaje de texto")
         else:
-            print(f"[WARNING] No se encontró 'when' en el mensaje")
-            message_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            urls = self.extract_urls(message.get('text', ''))
+            if urls:
+                print(f"[INFO] Encontradas {len(urls)} URL(s) en mensaje {message.get('id', 'N/A')}")
+                print(f"[DEBUG] Mensaje completo: {message}")
         
-        for url in urls:
-            try:
-                print(f"[INFO] Procesando URL: {url}")
-                post_data = self.content_processor.process_url(url, message_date)
-                
-                if post_data:
-                    self.save_post(post_data)
-                    print(f"[SUCCESS] Post guardado: {post_data['title']}")
-                else:
-                    print(f"[WARNING] No se pudo procesar la URL: {url}")
-                    
-            except Exception as e:
-                print(f"[ERROR] Error procesando URL {url}: {str(e)}")
+        if not urls:
+            return []
+        
+        message_date = self.get_message_date(message)
+        return [(url, message_date) for url in self.unique_urls(urls)]
+    
+    def process_url_job(self, url, message_date):
+        """Procesa una URL y guarda el post resultante (se ejecuta en el pool)"""
+        try:
+            print(f"[INFO] Procesando URL: {url}")
+            post_data = self.content_processor.process_url(url, message_date)
+            
+            if post_data:
+                # La página redirigió a otra URL: recordarla para deduplicar antes de descargar
+                fetched_url = post_data.pop('fetched_url', url)
+                if fetched_url != url:
+                    self.redirect_cache.store(url, fetched_url)
+                self.seen_urls.add(post_data['source_url'])
+                self.save_post(post_data)
+                print(f"[SUCCESS] Post guardado: {post_data['title']}")
+                if post_data.get('image_status') == 'pending':
+                    self.enqueue_image(post_data)
+                elif self.image_workers and IMAGE_MIRROR_CONFIG['enabled'] \
+                        and ImageMirror.is_remote(post_data.get('image_url')):
+                    self.image_workers.submit('mirror', post_data['source_url'],
+                                              {'image_url': post_data['image_url']})
+                return post_data
+            
+            print(f"[WARNING] No se pudo procesar la URL: {url}")
+            return None
+        
+        except FetchThrottled as e:
+            print(f"[INFO] URL aplazada a la próxima verificación ({e}): {url}")
+            with self.deferred_lock:
+                self.deferred_jobs.append((url, message_date))
+            return None
+        except Exception as e:
+            print(f"[ERROR] Error procesando URL {url}: {str(e)}")
+            # El cursor del diálogo ya pasó de este mensaje: dejarla en la caché negativa para reintentarla
+            self.content_processor.failure_store.record(url, e, message_date)
+            return None
+    
+    def enqueue_image(self, post_data):
+        """Encola la generación de la imagen de un post guardado sin imagen"""
+        payload = {'title': post_data['title'], 'summary': post_data['summary']}
+        if not self.image_workers.submit('generate', post_data['source_url'], payload):
+            self.db.update_post_image(post_data['source_url'], '', 'failed')
+    
+    def generate_post_image(self, payload):
+        """Manejador de la cola: genera la imagen de un post (se ejecuta en segundo plano)"""
+        return self.content_processor.generate_image(payload['title'], payload['summary'])
+    
+    def mirror_post_image(self, payload):
+        """Manejador de la cola: copia en local la imagen remota de un post"""
+        return self.content_processor.mirror_image(payload['image_url'])
+    
+    def update_post_image(self, job, image_url):
+        """Guarda en el post la imagen generada o copiada (o lo marca como fallido)"""
+        if job['kind'] == 'mirror' and not image_url:
+            # Si la copia falla el post conserva la imagen remota
+            return
+        image_status = 'ready' if image_url else 'failed'
+        # De una copia se guarda la URL remota: si el almacén la expulsa, el post vuelve a ella
+        original_image_url = job['payload']['image_url'] if job['kind'] == 'mirror' else None
+        if self.db.update_post_image(job['source_url'], image_url, image_status, original_image_url) and image_url:
+            print(f"[SUCCESS] Imagen añadida al post: {job['source_url']}")
+    
+    def resolve_url_jobs(self, jobs):
+        """Sustituye los enlaces cortos por su URL final (caché o red, en paralelo)"""
+        resolved = self.scraping_pool.run([(url,) for url, _ in jobs], worker=self.redirect_cache.resolve)
+        return [(final_url or url, message_date)
+                for (url, message_date), final_url in zip(jobs, resolved)]
+    
+    def process_url_jobs(self, jobs):
+        """Procesa en paralelo una lista de trabajos (url, fecha)"""
+        if not jobs:
+            return []
+        jobs = self.resolve_url_jobs(jobs)
+        
+        # Aplazar URLs que fallaron hace poco (caché negativa con backoff)
+        failure_store = self.content_processor.failure_store
+        waiting = failure_store.ineligible_urls(url for url, _ in jobs)
+        if waiting:
+            print(f"[INFO] Aplazadas {len(waiting)} URL(s) que fallaron recientemente")
+            jobs = [job for job in jobs if job[0] not in waiting]
+        
+        # Descartar URLs ya ingeridas (o repetidas en este lote) antes de descargar nada
+        pending = [job for job in jobs if self.seen_urls.add(self.url_key(job[0]))]
+        skipped = len(jobs) - len(pending)
+        if skipped:
+            print(f"[INFO] Omitidas {skipped} URL(s) ya procesadas")
+        if not pending:
+            return []
+        
+        print(f"[INFO] Procesando {len(pending)} URL(s) con {self.scraping_pool.max_workers} hilos "
+              f"(máx. {self.scraping_pool.per_host_limit} por host)")
+        results = self.scraping_pool.run(pending)
+        
+        # Las URLs que fallaron quedan en la caché negativa (o aplazadas si su dominio
+        # estaba limitado) y retry_failed_urls las reintenta aunque el cursor ya avanzó
+        for job, result in zip(pending, results):
+            if result is None:
+                self.seen_urls.discard(self.url_key(job[0]))
+        return results
+    
+    def retry_failed_urls(self):
+        """
+        Vuelve a procesar las URLs aplazadas y las de la caché negativa que ya son elegibles
+        
+        Sin esto una URL que falló sólo se reintentaría si alguien la volviera
+        a publicar: el cursor del diálogo ya pasó de su mensaje.
+        """
+        with self.deferred_lock:
+            jobs, self.deferred_jobs = self.deferred_jobs, []
+        due = self.content_processor.failure_store.due_for_retry()
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        jobs += [(url, release_date or now) for url, release_date in due]
+        if not jobs:
+            return []
+        print(f"[INFO] Reintentando {len(jobs)} URL(s) que fallaron o se aplazaron")
+        return self.process_url_jobs(jobs)
+    
+    def process_message(self, message):
+        """Procesa un mensaje individual buscando URLs"""
+        self.process_url_jobs(self.collect_url_jobs(message))
     
     def save_post(self, post_data):
         """Guarda un post en la base de datos a través del API"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 self.backend_url,
                 json=post_data,
                 headers={'Content-Type': 'application/json'},
@@ -199,6 +391,8 @@ class TelegramAgent:
     def run_once(self):
         """Ejecuta una verificación única del grupo"""
         print(f"\n[INFO] Iniciando verificación - {datetime.now()}")
+        if self.image_workers:
+            self.image_workers.start()
         
         # Obtener timestamp de la última verificación
         last_check = self.get_last_check_timestamp()
@@ -211,23 +405,45 @@ class TelegramAgent:
                 print(f"[WARNING] Error parseando timestamp: {e}")
                 last_check_dt = None
         
-        # Obtener mensajes de Telegram
-        messages = self.get_telegram_messages()
+        # Reintentar las URLs que fallaron y cuyo backoff ya terminó
+        self.retry_failed_urls()
         
-        if not messages:
-            print("[INFO] No hay mensajes nuevos")
+        # Leer a la vez (hasta el límite global) los diálogos a los que les toca
+        due = self.dialog_scheduler.due()
+        if not due:
+            print("[INFO] Ningún diálogo pendiente de lectura")
             return
         
-        print(f"[INFO] Procesando {len(messages)} mensajes")
-        
-        # Procesar cada mensaje
-        processed_count = 0
-        for message in messages:
-            if self.should_process_message(message, last_check_dt):
-                self.process_message(message)
-                processed_count += 1
+        started = time.monotonic()
+        error = None
+        try:
+            processed_count = self.read_dialogs(due, last_check_dt, started)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Ningún diálogo puede quedarse marcado en curso: due() no lo volvería a devolver
+            self.dialog_scheduler.release(due, time.monotonic() - started,
+                                          error or RuntimeError('Verificación interrumpida'))
+        if processed_count is None:
+            self.save_metrics()
+            return
         
         print(f"[INFO] Procesados {processed_count} mensajes nuevos")
+        if self.mcp:
+            mcp_stats = self.mcp.supervisor.stats()
+            print(f"[INFO] Servidor MCP: {mcp_stats['starts']} arranque(s), {mcp_stats['restarts']} reinicio(s), "
+                  f"último arranque {mcp_stats['last_startup_seconds']}s, activo {mcp_stats['uptime_seconds']}s")
+        if self.image_workers:
+            queue_stats = self.image_workers.stats()
+            print(f"[INFO] Cola de imágenes: {queue_stats['queue']['pending']} pendientes, "
+                  f"{queue_stats['busy']} en curso, {queue_stats['completed']} generadas, "
+                  f"{queue_stats['failed']} fallidas (media {queue_stats['avg_seconds']}s)")
+            for name, provider_stats in self.content_processor.image_providers.stats().items():
+                print(f"[INFO] Proveedor {name}: {provider_stats['state']}, "
+                      f"éxito {provider_stats['success_rate']}, latencia media {provider_stats['avg_latency']}s")
+        
+        self.save_metrics()
         
         # Guardar timestamp de esta verificación
         current_timestamp = datetime.now().isoformat()
@@ -235,6 +451,77 @@ class TelegramAgent:
         
         print(f"[INFO] Verificación completada")
     
+    def read_dialogs(self, due, last_check_dt, started):
+        """
+        Lee los diálogos vencidos con actividad y procesa sus URLs
+        
+        Returns:
+            Número de mensajes procesados, o None si ningún diálogo tenía actividad
+        """
+        # Una sola consulta de diálogos decide qué historiales merece la pena leer
+        selected = self.change_detector.select(self.get_mcp(), due, self.cursors)
+        for dialog_id in due:
+            if dialog_id not in selected:
+                self.dialog_scheduler.record_poll(dialog_id, time.monotonic() - started, skipped=True)
+        if not selected:
+            print("[INFO] No hay mensajes nuevos")
+            return None
+        due = selected
+        print(f"[INFO] Leyendo {len(due)} diálogo(s): {', '.join(due)}")
+        
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=len(due)) as executor:
+            futures = {dialog_id: executor.submit(self.fetch_dialog, dialog_id, last_check_dt) for dialog_id in due}
+            for dialog_id, future in futures.items():
+                try:
+                    fetched[dialog_id] = future.result()
+                except Exception as e:
+                    self.dialog_scheduler.record_poll(dialog_id, time.monotonic() - started, error=e)
+        
+        # Reunir las URLs de todos los diálogos y procesarlas en paralelo
+        processed_count = sum(len(messages) for messages, _, _, _ in fetched.values())
+        jobs = [job for _, dialog_jobs, _, _ in fetched.values() for job in dialog_jobs]
+        if processed_count:
+            print(f"[INFO] Procesando {processed_count} mensajes")
+        else:
+            print("[INFO] No hay mensajes nuevos")
+        self.process_url_jobs(jobs)
+        
+        for dialog_id, (messages, dialog_jobs, newest_id, gaps) in fetched.items():
+            # Avanzar el cursor hasta el último mensaje recibido: las URLs que fallaron
+            # no se pierden, siguen en la caché negativa o aplazadas (retry_failed_urls),
+            # y los mensajes que no cupieron en max_pages quedan como tramos pendientes
+            if newest_id is not None:
+                self.cursors.set(dialog_id, newest_id)
+            self.cursors.set_gaps(dialog_id, gaps)
+            self.change_detector.mark_fetched(dialog_id)
+            self.dialog_scheduler.record_poll(
+                dialog_id, time.monotonic() - started, messages=len(messages), urls=len(dialog_jobs),
+                message_dates=[message.get('when') for message in messages if isinstance(message, dict)]
+            )
+        return processed_count
+    
+    def save_metrics(self):
+        """Escribe las métricas por diálogo (y del servidor MCP) para /api/agent/metrics"""
+        metrics = {
+            'updated_at': datetime.now().isoformat(),
+            'dialogs': self.dialog_scheduler.stats(),
+            'change_detection': self.change_detector.stats(),
+            'mcp': self.mcp.supervisor.stats() if self.mcp else None
+        }
+        try:
+            write_metrics(metrics)
+        except OSError as e:
+            print(f"[WARNING] No se pudieron guardar las métricas del agente: {e}")
+        return metrics
+    
+    def next_check_in(self):
+        """Segundos hasta que venza el próximo diálogo (como mucho check_interval)"""
+        wait = self.dialog_scheduler.seconds_until_next()
+        if wait is None:
+            return self.check_interval
+        return min(self.check_interval, max(1.0, wait))
+    
     def should_process_message(self, message, last_check_dt):
         """Determina si un mensaje debe procesarse basado en la fecha"""
         if last_check_dt is None:
@@ -261,8 +548,10 @@ class TelegramAgent:
     def run(self):
         """Ejecuta el agente en modo continuo"""
         print(f"[INFO] Agente de Telegram iniciado")
-        print(f"[INFO] Monitoreando grupo: {self.group_name}")
-        print(f"[INFO] Intervalo de verificación: {self.check_interval}s")
+        for dialog_id, dialog_stats in self.dialog_scheduler.stats().items():
+            print(f"[INFO] Monitoreando diálogo: {dialog_id} "
+                  f"(cada {dialog_stats['interval']:.0f}s, prioridad {dialog_stats['priority']})")
+        print(f"[INFO] Diálogos leídos a la vez como máximo: {self.dialog_scheduler.max_concurrent}")
         print(f"[INFO] Presiona Ctrl+C para detener")
         
         consecutive_errors = 0
@@ -273,8 +562,9 @@ class TelegramAgent:
                 try:
                     self.run_once()
                     consecutive_errors = 0  # Reset error counter on success
-                    print(f"[INFO] Esperando {self.check_interval}s hasta la próxima verificación...")
-                    time.sleep(self.check_interval)
+                    wait = self.next_check_in()
+                    print(f"[INFO] Esperando {wait:.0f}s hasta la próxima verificación...")
+                    time.sleep(wait)
                     
                 except Exception as e:
                     consecutive_errors += 1
@@ -290,6 +580,10 @@ class TelegramAgent:
                 
         except KeyboardInterrupt:
             print("\n[INFO] Agente detenido por el usuario")
+            if self.image_workers:
+                self.image_workers.stop()
+            from src.agent.mcp_client import shutdown_supervisor
+            shutdown_supervisor()
         except Exception as e:
             print(f"\n[ERROR] Error crítico: {str(e)}")
             raise
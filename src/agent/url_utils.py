@@ -0,0 +1,146 @@
+"""
+Canonicalización de URLs e índice de URLs ya procesadas
+Ruta: src/agent/url_utils.py
+"""
+import hashlib
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import URL_CONFIG
+
+# Caracteres que la expresión regular de URLs suele arrastrar del texto del mensaje
+TRAILING_PUNCTUATION = '.,;:!?)]}\'"'
+
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+# Cierres que sólo se recortan si no tienen su apertura dentro de la URL
+CLOSING_BRACKETS = {')': '(', ']': '[', '}': '{'}
+
+
+def trim_trailing_punctuation(url):
+    """
+    Quita la puntuación del texto que la expresión regular arrastra al final de una URL
+
+    Un cierre sólo se recorta si no está emparejado dentro de la URL:
+    'https://es.wikipedia.org/wiki/Foo_(bar)' se conserva entero, pero
+    '(ver https://example.com/a).' queda en 'https://example.com/a'.
+    """
+    while url and url[-1] in TRAILING_PUNCTUATION:
+        last = url[-1]
+        opener = CLOSING_BRACKETS.get(last)
+        if opener and url.count(opener) >= url.count(last):
+            break
+        url = url[:-1]
+    return url
+
+
+def is_tracking_param(name, rules=None):
+    """True si el parámetro de query es de tracking según las reglas"""
+    rules = rules or URL_CONFIG
+    lowered = name.lower()
+    if lowered in rules['tracking_params']:
+        return True
+    return any(lowered.startswith(prefix) for prefix in rules['tracking_prefixes'])
+
+
+def canonicalize_url(url, rules=None):
+    """
+    Devuelve la forma canónica de una URL
+
+    Es sólo una clave de deduplicación (índice de URLs vistas y source_url
+    de los posts): puede no apuntar al mismo recurso que la URL original
+    (sin 'www.', sin barra final, query recodificada), así que nunca se
+    usa para descargar.
+
+    - Esquema y host en minúsculas, sin puerto por defecto ni 'www.'
+    - Sin fragmento ni parámetros de tracking (utm_*, fbclid, ...)
+    - Query ordenada y sin barra final en la ruta
+
+    Las reglas se pueden ajustar en URL_CONFIG.
+    """
+    rules = rules or URL_CONFIG
+    url = url.strip()
+    parts = urlsplit(url)
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').rstrip('.')
+    if rules['strip_www'] and host.startswith('www.'):
+        host = host[4:]
+
+    netloc = f"[{host}]" if ':' in host else host
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and str(port) != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else '')
+        netloc = f"{userinfo}@{netloc}"
+
+    path = parts.path or '/'
+    if rules['strip_trailing_slash'] and len(path) > 1:
+        path = path.rstrip('/') or '/'
+
+    query_items = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not is_tracking_param(name, rules)]
+    if rules['sort_query']:
+        query_items.sort()
+    query = urlencode(query_items, doseq=True)
+
+    fragment = '' if rules['strip_fragment'] else parts.fragment
+    return urlunsplit((scheme, netloc, path, query, fragment))
+
+
+class SeenUrlIndex:
+    """
+    Conjunto en memoria de URLs canónicas ya ingeridas
+
+    Guarda un hash de 64 bits por URL en lugar de la cadena completa, lo que
+    permite mantener millones de URLs con poca memoria. Se precarga desde la
+    tabla de posts al arrancar.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = set()
+
+    @staticmethod
+    def _key(url):
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big')
+
+    def warm(self, db):
+        """Carga las URLs de todos los posts guardados (canonicalizadas)"""
+        keys = {self._key(canonicalize_url(url)) for url in db.get_all_source_urls()}
+        with self.lock:
+            self.keys.update(keys)
+        print(f"[INFO] Índice de URLs vistas cargado: {len(self.keys)} URLs")
+        return len(keys)
+
+    def __contains__(self, url):
+        key = self._key(url)
+        with self.lock:
+            return key in self.keys
+
+    def __len__(self):
+        with self.lock:
+            return len(self.keys)
+
+    def add(self, url):
+        """Marca una URL canónica como vista; devuelve False si ya lo estaba"""
+        key = self._key(url)
+        with self.lock:
+            if key in self.keys:
+                return False
+            self.keys.add(key)
+            return True
+
+    def discard(self, url):
+        """Olvida una URL (p.ej. si su procesamiento falló y debe reintentarse)"""
+        with self.lock:
+            self.keys.discard(self._key(url))
@@ -0,0 +1,34 @@
+"""
+Fichero de métricas que escribe el agente y sirve el backend
+Ruta: src/backend/agent_metrics.py
+"""
+import json
+import os
+import tempfile
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import TELEGRAM_CONFIG
+
+
+def write_metrics(metrics, path=None):
+    """Guarda las métricas del agente en JSON para que el backend las sirva"""
+    path = Path(path or TELEGRAM_CONFIG['metrics_file'])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Escritura atómica: el backend nunca lee un fichero a medias
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_metrics(path=None):
+    """Lee las últimas métricas escritas por el agente (None si aún no hay)"""
+    path = Path(path or TELEGRAM_CONFIG['metrics_file'])
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -2,15 +2,17 @@
 Servidor Flask con API REST
 Ruta: src/backend/app.py
 """
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, jsonify, request, send_from_directory, abort
 from flask_cors import CORS
 from pathlib import Path
 import sys
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
-from config import FLASK_CONFIG
+from config import FLASK_CONFIG, DATABASE_CONFIG, IMAGE_STORE_CONFIG
 from src.backend.database import Database
+from src.backend.image_derivatives import ImageDerivatives
+from src.backend.agent_metrics import read_metrics
 
 
 def create_app():
@@ -23,6 +25,16 @@ def create_app():
     # Instanciar base de datos
     db = Database()
     
+    # Miniaturas WebP/JPEG de las imágenes generadas
+    derivatives = ImageDerivatives()
+    
+    def with_thumbnail(post):
+        """Añade al post la URL de su miniatura (o la imagen original si es remota) y quita las columnas internas"""
+        for field in Database.INTERNAL_FIELDS:
+            post.pop(field, None)
+        post['thumbnail_url'] = derivatives.thumbnail_url(post.get('image_url')) or post.get('image_url') or ''
+        return post
+    
     # Ruta para servir el frontend
     @app.route('/')
     def index():
@@ -35,41 +47,63 @@ def create_app():
     # Servir imágenes generadas (data/generated)
     @app.route('/generated/<path:filename>')
     def generated_images(filename):
-        # data/generated está en la raíz del proyecto
-        generated_dir = Path(__file__).resolve().parent.parent.parent / 'data' / 'generated'
-        return send_from_directory(generated_dir, filename)
+        # Los nombres son hashes del contenido: la imagen nunca cambia bajo la misma URL
+        generated_dir = Path(IMAGE_STORE_CONFIG['dir'])
+        return send_from_directory(generated_dir, filename, max_age=30 * 24 * 3600)
+    
+    # Miniaturas del tamaño de las tarjetas: WebP si el navegador lo acepta, JPEG si no
+    @app.route('/thumbnails/<path:filename>')
+    def thumbnail_images(filename):
+        accept_webp = 'image/webp' in request.headers.get('Accept', '')
+        variant = derivatives.resolve(filename, accept_webp)
+        if variant is None:
+            abort(404)
+        response = send_from_directory(variant[0], variant[1], max_age=30 * 24 * 3600)
+        response.vary.add('Accept')
+        return response
     
     # ==================== ENDPOINTS DEL API ====================
     
     @app.route('/api/posts', methods=['GET'])
     def get_posts():
-        """Obtiene todos los posts con paginación opcional"""
+        """
+        Obtiene los posts que cumplen todos los filtros, con paginación opcional (cursor o limit/offset)
+        
+        Filtros combinables: search, provider, type, from y to (fecha de
+        publicación YYYY-MM-DD, ambos incluidos).
+        """
         try:
-            # Parámetros de paginación
+            # Parámetros de paginación: `cursor` es el next_cursor de la página anterior
             limit = request.args.get('limit', type=int)
             offset = request.args.get('offset', default=0, type=int)
+            cursor = request.args.get('cursor')
+            if cursor and limit is None:
+                limit = DATABASE_CONFIG['page_size']
             
-            # Filtros opcionales
-            provider = request.args.get('provider')
-            content_type = request.args.get('type')
-            search = request.args.get('search')
-            
-            # Aplicar filtros
-            if search:
-                posts = db.search_posts(search)
-            elif provider:
-                posts = db.get_posts_by_provider(provider)
-            elif content_type:
-                posts = db.get_posts_by_type(content_type)
-            else:
-                posts = db.get_all_posts(limit=limit, offset=offset)
+            # Todos los filtros se resuelven en una sola consulta
+            posts = db.query_posts(
+                search=request.args.get('search'),
+                provider=request.args.get('provider'),
+                content_type=request.args.get('type'),
+                date_from=request.args.get('from'),
+                date_to=request.args.get('to'),
+                limit=limit,
+                cursor=cursor,
+                offset=offset
+            )
             
             return jsonify({
                 'success': True,
-                'posts': posts,
-                'count': len(posts)
+                'posts': [with_thumbnail(post) for post in posts],
+                'count': len(posts),
+                'next_cursor': db.next_cursor(posts, limit)
             }), 200
             
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         except Exception as e:
             return jsonify({
                 'success': False,
@@ -85,7 +119,7 @@ def create_app():
             if post:
                 return jsonify({
                     'success': True,
-                    'post': post
+                    'post': with_thumbnail(post)
                 }), 200
             else:
                 return jsonify({
@@ -121,7 +155,7 @@ def create_app():
             if post:
                 return jsonify({
                     'success': True,
-                    'post': post,
+                    'post': with_thumbnail(post),
                     'message': 'Post creado exitosamente'
                 }), 201
             else:
@@ -176,6 +210,21 @@ def create_app():
                 'error': str(e)
             }), 500
     
+    @app.route('/api/agent/metrics', methods=['GET'])
+    def get_agent_metrics():
+        """Métricas por diálogo de la última verificación del agente"""
+        metrics = read_metrics()
+        if metrics is None:
+            return jsonify({
+                'success': False,
+                'error': 'El agente todavía no ha publicado métricas'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'metrics': metrics
+        }), 200
+    
     @app.route('/api/health', methods=['GET'])
     def health_check():
         """Endpoint de salud del API"""
@@ -0,0 +1,117 @@
+"""
+Pool de conexiones SQLite con WAL y PRAGMAs configurables
+Ruta: src/backend/connection_pool.py
+"""
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import DATABASE_CONFIG
+
+JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+class ConnectionPool:
+    """
+    Conexiones SQLite reutilizadas entre peticiones e hilos
+
+    Abrir una conexión y aplicar sus PRAGMAs en cada consulta es caro, así
+    que las conexiones libres se guardan en una pila (la más reciente, con
+    la caché de páginas caliente, se reutiliza primero). Si todas están en
+    uso se abre una conexión extra que se cierra al devolverla.
+
+    La base de datos se pone en modo WAL: los lectores (Flask) leen la
+    última versión confirmada sin esperar al escritor (el agente).
+    """
+
+    def __init__(self, db_path=None, pool_size=None):
+        self.db_path = str(db_path or DATABASE_CONFIG['path'])
+        self.pool_size = max(1, pool_size or DATABASE_CONFIG['pool_size'])
+        self.journal_mode = DATABASE_CONFIG['journal_mode'].upper()
+        self.synchronous = DATABASE_CONFIG['synchronous'].upper()
+        if self.journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"DATABASE_JOURNAL_MODE no válido: {self.journal_mode}")
+        if self.synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"DATABASE_SYNCHRONOUS no válido: {self.synchronous}")
+
+        self.idle = queue.LifoQueue(maxsize=self.pool_size)
+        self.lock = threading.Lock()
+        self.counters = {'opened': 0, 'reused': 0, 'overflow': 0}
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        # El modo de journal es persistente: basta con fijarlo una vez
+        conn = self.connect()
+        mode = conn.execute(f'PRAGMA journal_mode = {self.journal_mode}').fetchone()[0]
+        if mode.upper() != self.journal_mode:
+            print(f"[WARNING] SQLite no aceptó journal_mode={self.journal_mode} (usa {mode})")
+        self.release(conn)
+
+    def connect(self):
+        """Abre una conexión nueva con los PRAGMAs de DATABASE_CONFIG"""
+        busy_timeout = DATABASE_CONFIG['busy_timeout']
+        conn = sqlite3.connect(self.db_path, timeout=busy_timeout / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA busy_timeout = {int(busy_timeout)}')
+        conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        # Valor negativo: tamaño en KiB en lugar de número de páginas
+        conn.execute(f"PRAGMA cache_size = {-int(DATABASE_CONFIG['cache_size_kb'])}")
+        conn.execute(f"PRAGMA mmap_size = {int(DATABASE_CONFIG['mmap_size'])}")
+        conn.execute('PRAGMA temp_store = MEMORY')
+        with self.lock:
+            self.counters['opened'] += 1
+        return conn
+
+    def acquire(self):
+        """Toma una conexión libre o abre una nueva"""
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            return self.connect()
+        with self.lock:
+            self.counters['reused'] += 1
+        return conn
+
+    def release(self, conn):
+        """Devuelve una conexión al pool (deshaciendo cualquier transacción abierta)"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        try:
+            self.idle.put_nowait(conn)
+        except queue.Full:
+            with self.lock:
+                self.counters['overflow'] += 1
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as conn: ... (la conexión vuelve al pool al salir)"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Cierra las conexiones libres"""
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats['idle'] = self.idle.qsize()
+        stats['pool_size'] = self.pool_size
+        return stats
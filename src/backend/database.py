@@ -2,6 +2,9 @@
 Gestión de la base de datos SQLite
 Ruta: src/backend/database.py
 """
+import hashlib
+import html
+import json
 import sqlite3
 from datetime import datetime
 from pathlib import Path
@@ -10,25 +13,49 @@ import sys
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
 from config import DATABASE_CONFIG
+from src.backend.connection_pool import ConnectionPool
+from src.backend.post_query import PostQuery, next_cursor
 
 
 class Database:
     """Clase para gestionar operaciones de la base de datos"""
     
+    # Campos de un post que se escriben al insertarlo o actualizarlo (además de source_url)
+    POST_FIELDS = ('title', 'summary', 'image_url', 'release_date', 'provider', 'type', 'image_status')
+    # Campos que cuentan como contenido del post para content_hash: la fecha del
+    # mensaje y el estado de la imagen cambian en cada reenvío sin cambiar el artículo
+    HASH_FIELDS = ('title', 'summary', 'image_url', 'provider', 'type')
+    # Columnas de uso interno que no se exponen en la API
+    INTERNAL_FIELDS = ('content_hash', 'original_image_url')
+    
     def __init__(self):
+        self.fts_enabled = False
+        # INSERT ... ON CONFLICT DO UPDATE ... RETURNING requiere SQLite 3.35
+        self.upsert_enabled = sqlite3.sqlite_version_info >= (3, 35, 0)
+        self.skip_unchanged = DATABASE_CONFIG['skip_unchanged']
         self.db_path = DATABASE_CONFIG['path']
+        # Conexiones reutilizadas entre llamadas (WAL + PRAGMAs de DATABASE_CONFIG)
+        self.pool = ConnectionPool(self.db_path)
         self.init_database()
     
     def get_connection(self):
-        """Crea una conexión a la base de datos"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """
+        Toma una conexión del pool
+        
+        Uso: `with self.get_connection() as conn:`; al salir del bloque la
+        conexión vuelve al pool con cualquier transacción pendiente deshecha.
+        """
+        return self.pool.connection()
     
     def init_database(self):
         """Inicializa la base de datos y crea las tablas si no existen"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.get_connection() as conn, conn:
+            self.create_schema(conn.cursor())
+        
+        print(f"[INFO] Base de datos inicializada: {self.db_path}")
+    
+    def create_schema(self, cursor):
+        """Crea tablas, migraciones e índices"""
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS posts (
@@ -40,221 +67,402 @@ class Database:
                 release_date TEXT NOT NULL,
                 provider TEXT,
                 type TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                image_status TEXT DEFAULT 'ready',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                content_hash TEXT,
+                original_image_url TEXT
             )
         ''')
         
+        # Migrar bases de datos anteriores a las columnas image_status, content_hash y original_image_url
+        cursor.execute('PRAGMA table_info(posts)')
+        columns = {row['name'] for row in cursor.fetchall()}
+        if 'image_status' not in columns:
+            cursor.execute("ALTER TABLE posts ADD COLUMN image_status TEXT DEFAULT 'ready'")
+        if 'content_hash' not in columns:
+            cursor.execute('ALTER TABLE posts ADD COLUMN content_hash TEXT')
+        if 'original_image_url' not in columns:
+            cursor.execute('ALTER TABLE posts ADD COLUMN original_image_url TEXT')
+        
         # Crear índices para mejorar el rendimiento
         cursor.execute('''
             CREATE INDEX IF NOT EXISTS idx_release_date ON posts(release_date DESC)
         ''')
         
+        # Orden del listado y paginación por cursor (created_at, id)
         cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_provider ON posts(provider)
+            CREATE INDEX IF NOT EXISTS idx_created_at ON posts(created_at DESC, id DESC)
         ''')
         
+        # Filtros por proveedor y tipo ya ordenados por (created_at, id): la página
+        # se lee directamente del índice sin ordenar todas las filas del filtro
+        # (elegidos con scripts/benchmark_queries.py)
         cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_type ON posts(type)
+            CREATE INDEX IF NOT EXISTS idx_provider_created ON posts(provider, created_at DESC, id DESC)
         ''')
         
-        conn.commit()
-        conn.close()
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_type_created ON posts(type, created_at DESC, id DESC)
+        ''')
         
-        print(f"[INFO] Base de datos inicializada: {self.db_path}")
+        # Los índices simples anteriores quedan cubiertos por los compuestos
+        cursor.execute('DROP INDEX IF EXISTS idx_provider')
+        cursor.execute('DROP INDEX IF EXISTS idx_type')
+        
+        self.fts_enabled = self.create_search_index(cursor)
     
-    def insert_post(self, post_data):
-        """Inserta un nuevo post en la base de datos, o actualiza si ya existe"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def create_search_index(self, cursor):
+        """
+        Índice FTS5 de título, resumen y proveedor sincronizado por triggers
         
+        El tokenizador ignora mayúsculas y tildes ("economia" encuentra
+        "Economía") y los índices de prefijo aceleran las búsquedas mientras
+        se escribe. Devuelve False si SQLite no tiene FTS5 (se usa LIKE).
+        """
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'"
+        ).fetchone()
         try:
             cursor.execute('''
-                INSERT INTO posts (title, summary, source_url, image_url, release_date, provider, type)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                post_data['title'],
-                post_data['summary'],
-                post_data['source_url'],
-                post_data.get('image_url', ''),
-                post_data['release_date'],
-                post_data.get('provider', ''),
-                post_data.get('type', '')
-            ))
-            
-            conn.commit()
-            post_id = cursor.lastrowid
-            
-            # Obtener el post recién creado
-            cursor.execute('SELECT * FROM posts WHERE id = ?', (post_id,))
-            post = dict(cursor.fetchone())
+                CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+                    title, summary, provider,
+                    content='posts', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2',
+                    prefix='2 3'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"[WARNING] FTS5 no disponible, la búsqueda usará LIKE: {e}")
+            return False
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+                INSERT INTO posts_fts (rowid, title, summary, provider)
+                VALUES (new.id, new.title, new.summary, new.provider);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+                INSERT INTO posts_fts (posts_fts, rowid, title, summary, provider)
+                VALUES ('delete', old.id, old.title, old.summary, old.provider);
+            END
+        ''')
+        # Sólo cambios en columnas indexadas (no al actualizar la imagen)
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE OF title, summary, provider ON posts BEGIN
+                INSERT INTO posts_fts (posts_fts, rowid, title, summary, provider)
+                VALUES ('delete', old.id, old.title, old.summary, old.provider);
+                INSERT INTO posts_fts (rowid, title, summary, provider)
+                VALUES (new.id, new.title, new.summary, new.provider);
+            END
+        ''')
+        
+        if not exists:
+            # Indexar los posts que ya existían antes del índice
+            cursor.execute("INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')")
+            print("[INFO] Índice de búsqueda FTS5 creado")
+        return True
+    
+    def post_values(self, post_data):
+        """Valores de POST_FIELDS del post con los mismos valores por defecto que la tabla"""
+        return {
+            'title': post_data['title'],
+            'summary': post_data['summary'],
+            'image_url': post_data.get('image_url', ''),
+            'release_date': post_data['release_date'],
+            'provider': post_data.get('provider', ''),
+            'type': post_data.get('type', ''),
+            'image_status': post_data.get('image_status', 'ready')
+        }
+    
+    def content_hash(self, values):
+        """Huella del contenido de un post (HASH_FIELDS): igual si el artículo no cambió"""
+        payload = json.dumps([values[field] for field in self.HASH_FIELDS], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def insert_post(self, post_data):
+        """
+        Inserta un nuevo post en la base de datos, o actualiza si ya existe
+        
+        Una sola sentencia INSERT ... ON CONFLICT(source_url) DO UPDATE ...
+        RETURNING: un post repetido se actualiza en la misma transacción y
+        conexión, sin excepción ni lectura adicional. Con `skip_unchanged`
+        la actualización sólo se hace si la huella del contenido recibido
+        (content_hash) difiere de la del último guardado: reenviar el mismo
+        artículo en otro mensaje no escribe nada (ni en la tabla, ni en el
+        índice de búsqueda ni en el WAL) y conserva su fecha de publicación.
+        """
+        if not self.upsert_enabled:
+            return self.insert_post_legacy(post_data)
+        
+        values = self.post_values(post_data)
+        values['source_url'] = post_data['source_url']
+        values['content_hash'] = self.content_hash(values)
+        columns = ['source_url'] + list(self.POST_FIELDS) + ['content_hash']
+        placeholders = ', '.join(':' + column for column in columns)
+        if self.skip_unchanged:
+            # Sin filas que insertar no se reserva id ni se toca sqlite_sequence,
+            # así que un post sin cambios no deja ninguna página en el WAL
+            source = f'''
+                SELECT {placeholders}
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM posts WHERE source_url = :source_url AND content_hash = :content_hash
+                )
+            '''
+        else:
+            source = f'VALUES ({placeholders})'
+        
+        try:
+            with self.get_connection() as conn:
+                with conn:
+                    row = conn.execute(f'''
+                        INSERT INTO posts ({', '.join(columns)})
+                        {source}
+                        ON CONFLICT(source_url) DO UPDATE SET
+                            {', '.join(f'{column} = excluded.{column}' for column in columns[1:])},
+                            original_image_url = NULL
+                        RETURNING *
+                    ''', values).fetchone()
+                
+                if row is None:
+                    # Sin cambios: no se escribió nada, se devuelve el post guardado
+                    print(f"[INFO] Post sin cambios, no se reescribe: {post_data['source_url']}")
+                    row = conn.execute('SELECT * FROM posts WHERE source_url = ?',
+                                       (post_data['source_url'],)).fetchone()
+                return dict(row) if row else None
             
-            conn.close()
-            return post
+        except Exception as e:
+            print(f"[ERROR] Error insertando post: {str(e)}")
+            return None
+    
+    def insert_post_legacy(self, post_data):
+        """Inserción para SQLite < 3.35: INSERT y, si el post ya existe, update_post"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                with conn:
+                    values = self.post_values(post_data)
+                    cursor.execute('''
+                        INSERT INTO posts (title, summary, source_url, image_url, release_date, provider, type,
+                                           image_status, content_hash)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (
+                        values['title'],
+                        values['summary'],
+                        post_data['source_url'],
+                        values['image_url'],
+                        values['release_date'],
+                        values['provider'],
+                        values['type'],
+                        values['image_status'],
+                        self.content_hash(values)
+                    ))
+                post_id = cursor.lastrowid
+                
+                # Obtener el post recién creado
+                cursor.execute('SELECT * FROM posts WHERE id = ?', (post_id,))
+                return dict(cursor.fetchone())
             
         except sqlite3.IntegrityError:
             # Si ya existe, actualizar
-            conn.close()
             print(f"[INFO] Post duplicado, intentando actualizar: {post_data['source_url']}")
             return self.update_post(post_data)
         except Exception as e:
-            conn.close()
             print(f"[ERROR] Error insertando post: {str(e)}")
             return None
     
     def update_post(self, post_data):
         """Actualiza un post existente en la base de datos"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-                UPDATE posts 
-                SET title = ?, summary = ?, image_url = ?, release_date = ?, provider = ?, type = ?
-                WHERE source_url = ?
-            ''', (
-                post_data['title'],
-                post_data['summary'],
-                post_data.get('image_url', ''),
-                post_data['release_date'],
-                post_data.get('provider', ''),
-                post_data.get('type', ''),
-                post_data['source_url']
-            ))
-            
-            conn.commit()
-            
-            if cursor.rowcount > 0:
-                # Obtener el post actualizado
-                cursor.execute('SELECT * FROM posts WHERE source_url = ?', (post_data['source_url'],))
-                post = dict(cursor.fetchone())
-                conn.close()
-                return post
-            else:
-                conn.close()
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                with conn:
+                    values = self.post_values(post_data)
+                    cursor.execute('''
+                        UPDATE posts 
+                        SET title = ?, summary = ?, image_url = ?, release_date = ?, provider = ?, type = ?,
+                            image_status = ?, content_hash = ?, original_image_url = NULL
+                        WHERE source_url = ?
+                    ''', (
+                        values['title'],
+                        values['summary'],
+                        values['image_url'],
+                        values['release_date'],
+                        values['provider'],
+                        values['type'],
+                        values['image_status'],
+                        self.content_hash(values),
+                        post_data['source_url']
+                    ))
+                
+                if cursor.rowcount > 0:
+                    # Obtener el post actualizado
+                    cursor.execute('SELECT * FROM posts WHERE source_url = ?', (post_data['source_url'],))
+                    return dict(cursor.fetchone())
+                
                 print(f"[WARNING] No se pudo actualizar post: {post_data['source_url']}")
                 return None
             
         except Exception as e:
-            conn.close()
             print(f"[ERROR] Error actualizando post: {str(e)}")
             return None
     
-    def get_all_posts(self, limit=None, offset=0):
-        """Obtiene todos los posts ordenados por fecha de creación"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def update_post_image(self, source_url, image_url, image_status='ready', original_image_url=None):
+        """
+        Actualiza la imagen y su estado de un post existente
+        
+        Args:
+            original_image_url: URL remota de la que se copió la imagen local;
+                si se expulsa la copia, el post vuelve a esa URL
+        """
+        with self.get_connection() as conn, conn:
+            cursor = conn.execute(
+                'UPDATE posts SET image_url = ?, image_status = ?, original_image_url = ? WHERE source_url = ?',
+                (image_url or '', image_status, original_image_url, source_url)
+            )
+            return cursor.rowcount > 0
+    
+    def images_in_use(self, prefix='/generated/'):
+        """URLs de imágenes locales (/generated/...) que algún post usa"""
+        with self.get_connection() as conn:
+            rows = conn.execute('SELECT DISTINCT image_url FROM posts WHERE image_url LIKE ?',
+                                (prefix + '%',)).fetchall()
+        return {row['image_url'] for row in rows}
+    
+    def release_image(self, image_url):
+        """
+        Quita de los posts una imagen local que se ha borrado del almacén
+        
+        Las copias de imágenes remotas vuelven a su URL original; las
+        generadas se quedan sin imagen (estado 'evicted').
+        """
+        with self.get_connection() as conn, conn:
+            cursor = conn.execute('''
+                UPDATE posts SET
+                    image_url = COALESCE(original_image_url, ''),
+                    image_status = CASE WHEN COALESCE(original_image_url, '') != '' THEN 'ready' ELSE 'evicted' END,
+                    original_image_url = NULL
+                WHERE image_url = ?
+            ''', (image_url,))
+            return cursor.rowcount
+    
+    def query_posts(self, search=None, provider=None, content_type=None, date_from=None,
+                    date_to=None, limit=None, cursor=None, offset=0):
+        """
+        Posts que cumplen todos los filtros indicados, en una sola consulta
         
-        query = 'SELECT * FROM posts ORDER BY created_at DESC'
+        Sin búsqueda se ordenan por fecha de creación (más recientes primero)
+        con los índices compuestos (provider|type, created_at, id); con
+        búsqueda, por relevancia BM25 y cada post incluye `snippet` y
+        `title_highlight` (coincidencias en <mark>, ya escapados) y su
+        `search_score` (menor es más relevante).
         
-        if limit:
-            query += f' LIMIT {limit} OFFSET {offset}'
+        El cursor continúa justo después del último post de la página
+        anterior: el coste de una página no depende de lo profunda que sea,
+        a diferencia de OFFSET.
         
-        cursor.execute(query)
-        posts = [dict(row) for row in cursor.fetchall()]
+        Raises:
+            ValueError si el cursor o alguna fecha no son válidos
+        """
+        query = (PostQuery(self.fts_enabled)
+                 .search(search)
+                 .provider(provider)
+                 .content_type(content_type)
+                 .released_between(date_from, date_to)
+                 .page(limit, cursor, offset))
+        sql, params = query.build()
         
-        conn.close()
+        with self.get_connection() as conn:
+            posts = [dict(row) for row in conn.execute(sql, params).fetchall()]
+        
+        if query.ranked:
+            for post in posts:
+                post['snippet'] = self.mark_matches(post['snippet'])
+                post['title_highlight'] = self.mark_matches(post['title_highlight'])
         return posts
     
+    @staticmethod
+    def next_cursor(posts, limit):
+        """Cursor de la página siguiente (None si esta página es la última)"""
+        return next_cursor(posts, limit)
+    
+    def get_all_posts(self, limit=None, offset=0, cursor=None):
+        """Obtiene todos los posts ordenados por fecha de creación"""
+        return self.query_posts(limit=limit, cursor=cursor, offset=offset)
+    
+    def get_all_source_urls(self):
+        """Obtiene las URLs de origen de todos los posts"""
+        with self.get_connection() as conn:
+            return [row['source_url'] for row in conn.execute('SELECT source_url FROM posts')]
+    
     def get_post_by_id(self, post_id):
         """Obtiene un post específico por su ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM posts WHERE id = ?', (post_id,))
-        row = cursor.fetchone()
-        
-        conn.close()
+        with self.get_connection() as conn:
+            row = conn.execute('SELECT * FROM posts WHERE id = ?', (post_id,)).fetchone()
         
         if row:
             return dict(row)
         return None
     
-    def get_posts_by_provider(self, provider):
+    def get_post_by_source_url(self, source_url):
+        """Obtiene un post por su URL de origen"""
+        with self.get_connection() as conn:
+            row = conn.execute('SELECT * FROM posts WHERE source_url = ?', (source_url,)).fetchone()
+        return dict(row) if row else None
+    
+    def get_posts_by_provider(self, provider, limit=None, cursor=None):
         """Obtiene posts filtrados por proveedor"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'SELECT * FROM posts WHERE provider = ? ORDER BY created_at DESC',
-            (provider,)
-        )
-        posts = [dict(row) for row in cursor.fetchall()]
-        
-        conn.close()
-        return posts
+        return self.query_posts(provider=provider, limit=limit, cursor=cursor)
     
-    def get_posts_by_type(self, content_type):
+    def get_posts_by_type(self, content_type, limit=None, cursor=None):
         """Obtiene posts filtrados por tipo de contenido"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'SELECT * FROM posts WHERE type = ? ORDER BY created_at DESC',
-            (content_type,)
-        )
-        posts = [dict(row) for row in cursor.fetchall()]
-        
-        conn.close()
-        return posts
+        return self.query_posts(content_type=content_type, limit=limit, cursor=cursor)
     
-    def search_posts(self, query):
-        """Busca posts por título o resumen"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        search_query = f'%{query}%'
-        cursor.execute('''
-            SELECT * FROM posts 
-            WHERE title LIKE ? OR summary LIKE ?
-            ORDER BY created_at DESC
-        ''', (search_query, search_query))
-        
-        posts = [dict(row) for row in cursor.fetchall()]
-        
-        conn.close()
-        return posts
+    def mark_matches(self, text):
+        """Escapa el HTML del fragmento y resalta las coincidencias con <mark>"""
+        if text is None:
+            return ''
+        return (html.escape(text)
+                .replace(PostQuery.MATCH_START, '<mark>')
+                .replace(PostQuery.MATCH_END, '</mark>'))
+    
+    def search_posts(self, query, limit=None, cursor=None):
+        """Busca posts por título, resumen o proveedor ordenados por relevancia (BM25)"""
+        return self.query_posts(search=query, limit=limit, cursor=cursor)
     
     def delete_post(self, post_id):
         """Elimina un post por su ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM posts WHERE id = ?', (post_id,))
-        conn.commit()
-        
-        deleted = cursor.rowcount > 0
-        conn.close()
-        
-        return deleted
+        with self.get_connection() as conn, conn:
+            cursor = conn.execute('DELETE FROM posts WHERE id = ?', (post_id,))
+            return cursor.rowcount > 0
     
     def get_stats(self):
         """Obtiene estadísticas generales de la base de datos"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         stats = {}
         
-        # Total de posts
-        cursor.execute('SELECT COUNT(*) as total FROM posts')
-        stats['total_posts'] = cursor.fetchone()['total']
-        
-        # Posts por proveedor
-        cursor.execute('''
-            SELECT provider, COUNT(*) as count 
-            FROM posts 
-            GROUP BY provider 
-            ORDER BY count DESC
-        ''')
-        stats['by_provider'] = [dict(row) for row in cursor.fetchall()]
-        
-        # Posts por tipo
-        cursor.execute('''
-            SELECT type, COUNT(*) as count 
-            FROM posts 
-            GROUP BY type 
-            ORDER BY count DESC
-        ''')
-        stats['by_type'] = [dict(row) for row in cursor.fetchall()]
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Total de posts
+            cursor.execute('SELECT COUNT(*) as total FROM posts')
+            stats['total_posts'] = cursor.fetchone()['total']
+            
+            # Posts por proveedor
+            cursor.execute('''
+                SELECT provider, COUNT(*) as count 
+                FROM posts 
+                GROUP BY provider 
+                ORDER BY count DESC
+            ''')
+            stats['by_provider'] = [dict(row) for row in cursor.fetchall()]
+            
+            # Posts por tipo
+            cursor.execute('''
+                SELECT type, COUNT(*) as count 
+                FROM posts 
+                GROUP BY type 
+                ORDER BY count DESC
+            ''')
+            stats['by_type'] = [dict(row) for row in cursor.fetchall()]
         
-        conn.close()
-        return stats
\ No newline at end of file
+        return stats
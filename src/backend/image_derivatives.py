@@ -0,0 +1,110 @@
+"""
+Miniaturas y variantes WebP de las imágenes servidas en /generated
+Ruta: src/backend/image_derivatives.py
+"""
+import os
+import tempfile
+import threading
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from config import IMAGE_STORE_CONFIG, IMAGE_DERIVATIVE_CONFIG
+
+# Pillow es opcional: sin él se sirven las imágenes originales
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+
+class ImageDerivatives:
+    """
+    Genera y cachea en disco miniaturas del tamaño de las tarjetas del dashboard
+
+    Por cada imagen original se guardan dos variantes recortadas a
+    width x height (como object-fit: cover): WebP para los navegadores que lo
+    aceptan y JPEG para el resto. Se crean al generar la imagen o en la
+    primera petición.
+    """
+
+    FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+
+    def __init__(self, source_dir=None, cache_dir=None):
+        self.source_dir = Path(source_dir or IMAGE_STORE_CONFIG['dir'])
+        self.cache_dir = Path(cache_dir or IMAGE_DERIVATIVE_CONFIG['dir'])
+        self.size = (IMAGE_DERIVATIVE_CONFIG['width'], IMAGE_DERIVATIVE_CONFIG['height'])
+        self.quality = IMAGE_DERIVATIVE_CONFIG['quality']
+        self.lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def available(self):
+        return Image is not None
+
+    @staticmethod
+    def thumbnail_url(image_url):
+        """URL de la miniatura de una imagen local (None para imágenes remotas)"""
+        if not image_url or not image_url.startswith('/generated/'):
+            return None
+        return '/thumbnails/' + image_url[len('/generated/'):]
+
+    def variant_name(self, filename, extension):
+        return f"{Path(filename).stem}.{self.size[0]}x{self.size[1]}.{extension}"
+
+    def source_path(self, filename):
+        """Ruta de la imagen original o None si no existe o sale del directorio"""
+        path = (self.source_dir / filename).resolve()
+        if self.source_dir.resolve() not in path.parents or not path.is_file():
+            return None
+        return path
+
+    def create(self, filename):
+        """Crea (si faltan) todas las variantes de una imagen original"""
+        if not self.available:
+            return False
+        source = self.source_path(filename)
+        if source is None:
+            return False
+
+        with self.lock:
+            missing = [ext for ext in self.FORMATS
+                       if not (self.cache_dir / self.variant_name(filename, ext)).exists()]
+            if not missing:
+                return True
+            try:
+                with Image.open(source) as image:
+                    thumb = ImageOps.fit(ImageOps.exif_transpose(image).convert('RGB'),
+                                         self.size, Image.LANCZOS)
+            except Exception as e:
+                print(f"[WARNING] No se pudo crear la miniatura de {filename}: {e}")
+                return False
+
+            for extension in missing:
+                # Escritura atómica: nunca se sirve una miniatura a medio escribir
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    thumb.save(f, self.FORMATS[extension], quality=self.quality, optimize=True)
+                os.replace(tmp_path, self.cache_dir / self.variant_name(filename, extension))
+        return True
+
+    def resolve(self, filename, accept_webp):
+        """
+        Fichero a servir para /thumbnails/<filename>
+
+        Returns:
+            Tupla (directorio, nombre) con la variante adecuada, o la imagen
+            original si no se pudo crear la miniatura; None si no existe
+        """
+        if self.source_path(filename) is None:
+            return None
+        if self.create(filename):
+            extension = 'webp' if accept_webp else 'jpg'
+            return self.cache_dir, self.variant_name(filename, extension)
+        return self.source_dir, filename
+
+    def remove(self, filename):
+        """Borra las variantes de una imagen (cuando el original se expulsa)"""
+        for extension in self.FORMATS:
+            (self.cache_dir / self.variant_name(filename, extension)).unlink(missing_ok=True)
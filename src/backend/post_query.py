@@ -0,0 +1,204 @@
+"""
+Constructor de consultas de posts con filtros combinables y paginación por cursor
+Ruta: src/backend/post_query.py
+"""
+import base64
+import json
+import re
+from datetime import datetime, timedelta
+
+
+def encode_cursor(values):
+    """Token opaco de paginación con los valores de la última fila de una página"""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, types):
+    """
+    Valores de un token de paginación
+
+    Args:
+        types: Tipos esperados de cada valor, p. ej. (str, int)
+
+    Raises:
+        ValueError si el token no es válido
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Cursor de paginación no válido: {e}")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Cursor de paginación no válido")
+    for value, expected in zip(values, types):
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise ValueError("Cursor de paginación no válido")
+    return values
+
+
+def build_match_query(query):
+    """
+    Convierte el texto del usuario en una consulta FTS5 segura
+
+    Cada palabra se busca como prefijo ("econ" encuentra "economía") y
+    todas deben aparecer. Las comillas evitan que la sintaxis de FTS5
+    (AND, NEAR, *, :) del texto del usuario se interprete.
+    """
+    terms = re.findall(r'\w+', query or '', re.UNICODE)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def parse_date_bound(value, end=False):
+    """
+    Límite de fecha de publicación comparable con release_date
+
+    Acepta 'YYYY-MM-DD' o 'YYYY-MM-DD HH:MM:SS'. Para el límite final una
+    fecha sin hora incluye el día completo (se devuelve el día siguiente
+    para comparar con <).
+    """
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            parsed = datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            continue
+        if fmt == '%Y-%m-%d':
+            if end:
+                return (parsed + timedelta(days=1)).strftime('%Y-%m-%d'), '<'
+            return parsed.strftime('%Y-%m-%d'), '>='
+        return parsed.strftime('%Y-%m-%d %H:%M:%S'), '<=' if end else '>='
+    raise ValueError(f"Fecha no válida (formato YYYY-MM-DD): {value}")
+
+
+class PostQuery:
+    """
+    Consulta de posts que combina búsqueda, proveedor, tipo, rango de fechas
+    y paginación en una sola sentencia SQL
+
+    Uso:
+        sql, params = PostQuery().provider('elpais.com').content_type('news') \\
+            .released_between('2025-01-01', None).page(20, cursor).build()
+
+    Sin búsqueda se ordena por (created_at, id) descendente, servido por los
+    índices compuestos (provider|type, created_at, id); con búsqueda se
+    ordena por relevancia BM25 sobre el índice FTS5 con los mismos filtros.
+    """
+
+    # Peso de cada columna del índice de búsqueda en el ranking BM25 (title, summary, provider)
+    SEARCH_WEIGHTS = (10.0, 4.0, 1.0)
+    # Marcadores internos de coincidencia: se sustituyen por <mark> tras escapar el HTML
+    MATCH_START, MATCH_END = '\x02', '\x03'
+
+    def __init__(self, fts_enabled=True):
+        self.fts_enabled = fts_enabled
+        self.clauses = []
+        self.params = []
+        self.match = None
+        self.limit = None
+        self.cursor = None
+        self.offset = 0
+
+    def where(self, clause, *params):
+        """Añade una condición arbitraria sobre la tabla `p` (posts)"""
+        self.clauses.append(clause)
+        self.params.extend(params)
+        return self
+
+    def provider(self, provider):
+        return self.where('p.provider = ?', provider) if provider else self
+
+    def content_type(self, content_type):
+        return self.where('p.type = ?', content_type) if content_type else self
+
+    def released_between(self, date_from=None, date_to=None):
+        """Rango de fecha de publicación (ambos extremos incluidos, opcionales)"""
+        if date_from:
+            value, operator = parse_date_bound(date_from)
+            self.where(f'p.release_date {operator} ?', value)
+        if date_to:
+            value, operator = parse_date_bound(date_to, end=True)
+            self.where(f'p.release_date {operator} ?', value)
+        return self
+
+    def search(self, text):
+        """Búsqueda de texto (FTS5 por relevancia, o LIKE si no hay FTS5)"""
+        if not text:
+            return self
+        match = build_match_query(text)
+        if self.fts_enabled and match:
+            self.match = match
+            return self
+        like = f'%{text}%'
+        return self.where('(p.title LIKE ? OR p.summary LIKE ?)', like, like)
+
+    def page(self, limit=None, cursor=None, offset=0):
+        """
+        Tamaño de página y posición (cursor o desplazamiento); sin límite se devuelven todos
+
+        Raises:
+            ValueError si limit < 1 u offset < 0
+        """
+        if limit is not None and limit < 1:
+            raise ValueError(f"limit debe ser mayor que 0: {limit}")
+        if offset and offset < 0:
+            raise ValueError(f"offset no puede ser negativo: {offset}")
+        self.limit = limit
+        self.cursor = cursor
+        self.offset = offset or 0
+        return self
+
+    @property
+    def ranked(self):
+        return self.match is not None
+
+    def build(self):
+        """Devuelve (sql, params) de la consulta"""
+        clauses, params = list(self.clauses), list(self.params)
+        tail_params = [-1 if self.limit is None else self.limit, self.offset]
+
+        if not self.ranked:
+            if self.cursor:
+                created_at, post_id = decode_cursor(self.cursor, (str, int))
+                clauses.append('(p.created_at, p.id) < (?, ?)')
+                params += [created_at, post_id]
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+            sql = f'''
+                SELECT p.* FROM posts p
+                {where}
+                ORDER BY p.created_at DESC, p.id DESC
+                LIMIT ? OFFSET ?
+            '''
+            return sql, params + tail_params
+
+        keyset, keyset_params = '', []
+        if self.cursor:
+            score, post_id = decode_cursor(self.cursor, ((int, float), int))
+            keyset = 'WHERE search_score > ? OR (search_score = ? AND id < ?)'
+            keyset_params = [score, score, post_id]
+        filters = ''.join(f' AND {clause}' for clause in clauses)
+        sql = f'''
+            SELECT * FROM (
+                SELECT p.*,
+                       snippet(posts_fts, -1, ?, ?, '…', 16) AS snippet,
+                       highlight(posts_fts, 0, ?, ?) AS title_highlight,
+                       bm25(posts_fts, ?, ?, ?) AS search_score
+                FROM posts_fts
+                JOIN posts p ON p.id = posts_fts.rowid
+                WHERE posts_fts MATCH ?{filters}
+            )
+            {keyset}
+            ORDER BY search_score, id DESC
+            LIMIT ? OFFSET ?
+        '''
+        markers = [self.MATCH_START, self.MATCH_END] * 2
+        return sql, markers + list(self.SEARCH_WEIGHTS) + [self.match] + params + keyset_params + tail_params
+
+
+def next_cursor(posts, limit):
+    """Cursor de la página siguiente (None si esta página es la última)"""
+    if not limit or len(posts) < limit:
+        return None
+    last = posts[-1]
+    if 'search_score' in last:
+        return encode_cursor((last['search_score'], last['id']))
+    return encode_cursor((last['created_at'], last['id']))
@@ -7,20 +7,22 @@
 const CONFIG = {
     apiBaseUrl: 'http://localhost:5000/api',
     refreshInterval: 30000, // 30 segundos
+    pageSize: 30, // posts por página (el resto se pide con "Cargar más")
     animationDelay: 50 // ms entre animaciones de cards
 };
 
 // Estado de la aplicación
 const AppState = {
     posts: [],
-    filteredPosts: [],
-    providers: new Set(),
-    types: new Set(),
+    nextCursor: null,
+    requestId: 0, // descarta respuestas de peticiones ya superadas
     stats: null,
     filters: {
         search: '',
         provider: '',
-        type: ''
+        type: '',
+        from: '',
+        to: ''
     }
 };
 
@@ -32,7 +34,10 @@ const Elements = {
     searchInput: null,
     providerFilter: null,
     typeFilter: null,
+    dateFrom: null,
+    dateTo: null,
     clearFiltersBtn: null,
+    loadMoreBtn: null,
     totalPosts: null,
     totalProviders: null,
     lastUpdate: null
@@ -69,7 +74,10 @@ function cacheElements() {
     Elements.searchInput = document.getElementById('searchInput');
     Elements.providerFilter = document.getElementById('providerFilter');
     Elements.typeFilter = document.getElementById('typeFilter');
+    Elements.dateFrom = document.getElementById('dateFrom');
+    Elements.dateTo = document.getElementById('dateTo');
     Elements.clearFiltersBtn = document.getElementById('clearFilters');
+    Elements.loadMoreBtn = document.getElementById('loadMore');
     Elements.totalPosts = document.getElementById('totalPosts');
     Elements.totalProviders = document.getElementById('totalProviders');
     Elements.lastUpdate = document.getElementById('lastUpdate');
@@ -81,7 +89,7 @@ function cacheElements() {
 function setupEventListeners() {
     // Búsqueda con debounce
     Elements.searchInput.addEventListener('input', debounce((e) => {
-        AppState.filters.search = e.target.value.toLowerCase();
+        AppState.filters.search = e.target.value.trim();
         applyFilters();
     }, 300));
     
@@ -97,41 +105,91 @@ function setupEventListeners() {
         applyFilters();
     });
     
+    // Rango de fechas de publicación
+    Elements.dateFrom.addEventListener('change', (e) => {
+        AppState.filters.from = e.target.value;
+        applyFilters();
+    });
+    
+    Elements.dateTo.addEventListener('change', (e) => {
+        AppState.filters.to = e.target.value;
+        applyFilters();
+    });
+    
     // Limpiar filtros
     Elements.clearFiltersBtn.addEventListener('click', clearFilters);
+    
+    // Página siguiente
+    Elements.loadMoreBtn.addEventListener('click', loadMorePosts);
+}
+
+/**
+ * Construye la URL de /posts con los filtros activos (los resuelve el servidor)
+ */
+function buildPostsUrl(limit, cursor) {
+    const params = new URLSearchParams();
+    
+    Object.entries(AppState.filters).forEach(([key, value]) => {
+        if (value) {
+            params.set(key, value);
+        }
+    });
+    
+    params.set('limit', limit);
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    
+    return `${CONFIG.apiBaseUrl}/posts?${params.toString()}`;
+}
+
+/**
+ * Pide una página de posts al API
+ * 
+ * Devuelve null si mientras tanto se lanzó otra petición (p. ej. el
+ * usuario cambió un filtro), para no pintar resultados obsoletos.
+ */
+async function fetchPosts(limit, cursor) {
+    const requestId = ++AppState.requestId;
+    const response = await fetch(buildPostsUrl(limit, cursor));
+    
+    if (!response.ok) {
+        throw new Error(`Error HTTP: ${response.status}`);
+    }
+    
+    const data = await response.json();
+    
+    if (requestId !== AppState.requestId || !data.success) {
+        return null;
+    }
+    return data;
 }
 
 /**
  * Carga los posts desde el API
+ * 
+ * Con `keepLoaded` (recarga automática) se vuelven a pedir tantos posts
+ * como haya ya cargados para no perder las páginas que el usuario abrió.
  */
-async function loadPosts() {
+async function loadPosts({ keepLoaded = false } = {}) {
     try {
-        showLoading(true);
-        
-        // Cargar posts
-        const postsResponse = await fetch(`${CONFIG.apiBaseUrl}/posts`);
-        
-        if (!postsResponse.ok) {
-            throw new Error(`Error HTTP: ${postsResponse.status}`);
+        if (!keepLoaded) {
+            showLoading(true);
         }
         
-        const postsData = await postsResponse.json();
+        const limit = keepLoaded ? Math.max(CONFIG.pageSize, AppState.posts.length) : CONFIG.pageSize;
+        const postsData = await fetchPosts(limit);
         
-        if (postsData.success) {
+        if (postsData) {
             AppState.posts = postsData.posts;
-            AppState.filteredPosts = [...AppState.posts];
-            
-            // Extraer proveedores y tipos únicos
-            extractFilters();
+            AppState.nextCursor = postsData.next_cursor;
             
-            // Actualizar UI
-            updateFilterOptions();
             renderPosts();
             
             console.log(`[INFO] ${AppState.posts.length} posts cargados`);
         }
         
-        // Cargar estadísticas
+        // Cargar estadísticas (también dan las opciones de los filtros)
         await loadStats();
         
     } catch (error) {
@@ -142,6 +200,30 @@ async function loadPosts() {
     }
 }
 
+/**
+ * Añade la página siguiente de posts
+ */
+async function loadMorePosts() {
+    if (!AppState.nextCursor) return;
+    
+    try {
+        Elements.loadMoreBtn.disabled = true;
+        const postsData = await fetchPosts(CONFIG.pageSize, AppState.nextCursor);
+        
+        if (postsData) {
+            AppState.posts = AppState.posts.concat(postsData.posts);
+            AppState.nextCursor = postsData.next_cursor;
+            
+            appendPosts(postsData.posts);
+        }
+    } catch (error) {
+        console.error('[ERROR] Error cargando más posts:', error);
+    } finally {
+        Elements.loadMoreBtn.disabled = false;
+        updateLoadMore();
+    }
+}
+
 /**
  * Carga las estadísticas desde el API
  */
@@ -158,6 +240,7 @@ async function loadStats() {
         if (data.success) {
             AppState.stats = data.stats;
             updateStats();
+            updateFilterOptions();
         }
     } catch (error) {
         console.error('[ERROR] Error cargando estadísticas:', error);
@@ -165,75 +248,40 @@ async function loadStats() {
 }
 
 /**
- * Extrae proveedores y tipos únicos de los posts
+ * Rellena un select con las opciones dadas conservando la selección actual
  */
-function extractFilters() {
-    AppState.providers.clear();
-    AppState.types.clear();
+function fillSelect(select, placeholder, values) {
+    const selected = select.value;
     
-    AppState.posts.forEach(post => {
-        if (post.provider) {
-            AppState.providers.add(post.provider);
-        }
-        if (post.type) {
-            AppState.types.add(post.type);
-        }
+    select.innerHTML = `<option value="">${placeholder}</option>`;
+    values.sort().forEach(value => {
+        const option = document.createElement('option');
+        option.value = value;
+        option.textContent = value;
+        select.appendChild(option);
     });
+    
+    select.value = values.includes(selected) ? selected : '';
 }
 
 /**
- * Actualiza las opciones de los filtros
+ * Actualiza las opciones de los filtros con los proveedores y tipos de toda la base de datos
  */
 function updateFilterOptions() {
-    // Actualizar filtro de proveedores
-    Elements.providerFilter.innerHTML = '<option value="">Todos los proveedores</option>';
-    Array.from(AppState.providers).sort().forEach(provider => {
-        const option = document.createElement('option');
-        option.value = provider;
-        option.textContent = provider;
-        Elements.providerFilter.appendChild(option);
-    });
+    if (!AppState.stats) return;
     
-    // Actualizar filtro de tipos
-    Elements.typeFilter.innerHTML = '<option value="">Todos los tipos</option>';
-    Array.from(AppState.types).sort().forEach(type => {
-        const option = document.createElement('option');
-        option.value = type;
-        option.textContent = type;
-        Elements.typeFilter.appendChild(option);
-    });
+    const providers = (AppState.stats.by_provider || []).map(row => row.provider).filter(Boolean);
+    const types = (AppState.stats.by_type || []).map(row => row.type).filter(Boolean);
+    
+    fillSelect(Elements.providerFilter, 'Todos los proveedores', providers);
+    fillSelect(Elements.typeFilter, 'Todos los tipos', types);
 }
 
 /**
- * Aplica los filtros activos
+ * Aplica los filtros activos (nueva consulta al servidor desde la primera página)
  */
 function applyFilters() {
-    AppState.filteredPosts = AppState.posts.filter(post => {
-        // Filtro de búsqueda
-        if (AppState.filters.search) {
-            const searchLower = AppState.filters.search;
-            const matchesSearch = 
-                post.title.toLowerCase().includes(searchLower) ||
-                post.summary.toLowerCase().includes(searchLower) ||
-                (post.provider && post.provider.toLowerCase().includes(searchLower));
-            
-            if (!matchesSearch) return false;
-        }
-        
-        // Filtro de proveedor
-        if (AppState.filters.provider && post.provider !== AppState.filters.provider) {
-            return false;
-        }
-        
-        // Filtro de tipo
-        if (AppState.filters.type && post.type !== AppState.filters.type) {
-            return false;
-        }
-        
-        return true;
-    });
-    
-    renderPosts();
+    loadPosts();
 }
 
 /**
@@ -243,15 +291,18 @@ function clearFilters() {
     AppState.filters = {
         search: '',
         provider: '',
-        type: ''
+        type: '',
+        from: '',
+        to: ''
     };
     
     Elements.searchInput.value = '';
     Elements.providerFilter.value = '';
     Elements.typeFilter.value = '';
+    Elements.dateFrom.value = '';
+    Elements.dateTo.value = '';
     
-    AppState.filteredPosts = [...AppState.posts];
-    renderPosts();
+    loadPosts();
 }
 
 /**
@@ -259,20 +310,35 @@ function clearFilters() {
  */
 function renderPosts() {
     Elements.postsContainer.innerHTML = '';
+    updateLoadMore();
     
-    if (AppState.filteredPosts.length === 0) {
+    if (AppState.posts.length === 0) {
         showEmptyState(true);
         return;
     }
     
     showEmptyState(false);
-    
-    AppState.filteredPosts.forEach((post, index) => {
+    appendPosts(AppState.posts);
+}
+
+/**
+ * Añade cards al final del contenedor
+ */
+function appendPosts(posts) {
+    posts.forEach((post, index) => {
+        // La animación escalonada empieza en la primera card nueva
         const postCard = createPostCard(post, index);
         Elements.postsContainer.appendChild(postCard);
     });
 }
 
+/**
+ * Muestra el botón "Cargar más" sólo si hay página siguiente
+ */
+function updateLoadMore() {
+    Elements.loadMoreBtn.style.display = AppState.nextCursor ? 'inline-block' : 'none';
+}
+
 /**
  * Crea un card de post
  */
@@ -288,10 +354,19 @@ function createPostCard(post, index) {
     if (post.image_url) {
         const img = document.createElement('img');
         img.className = 'post-image';
+        img.loading = 'lazy';
+        img.decoding = 'async';
         // Construir URL completa si es relativa
-        img.src = post.image_url.startsWith('/') ? `${window.location.origin}${post.image_url}` : post.image_url;
+        const toAbsolute = (url) => url.startsWith('/') ? `${window.location.origin}${url}` : url;
+        // Preferir la miniatura del tamaño de la tarjeta; si falla, la imagen original
+        const thumbnailUrl = post.thumbnail_url || post.image_url;
+        img.src = toAbsolute(thumbnailUrl);
         img.alt = post.title;
         img.onerror = () => {
+            if (thumbnailUrl !== post.image_url && img.src !== toAbsolute(post.image_url)) {
+                img.src = toAbsolute(post.image_url);
+                return;
+            }
             img.style.display = 'none';
             imageContainer.appendChild(createImagePlaceholder(post.type));
         };
@@ -332,7 +407,12 @@ function createPostCard(post, index) {
     // Título
     const title = document.createElement('h3');
     title.className = 'post-title';
-    title.textContent = post.title;
+    if (post.title_highlight) {
+        // Título con las coincidencias de la búsqueda en <mark> (el servidor ya lo escapa)
+        title.innerHTML = post.title_highlight;
+    } else {
+        title.textContent = post.title;
+    }
     
     // Resumen
     const summary = document.createElement('p');
@@ -452,7 +532,7 @@ function showError(message) {
 function setupAutoRefresh() {
     setInterval(() => {
         console.log('[INFO] Recargando datos automáticamente...');
-        loadPosts();
+        loadPosts({ keepLoaded: true });
     }, CONFIG.refreshInterval);
 }
 